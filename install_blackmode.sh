@@ -83,8 +83,9 @@ fi
 # Parse command-line arguments
 update_interval=""
 dot_option=""
+run_mode="daemon"
 
-while getopts "i:d:h" opt; do
+while getopts "i:d:m:h" opt; do
     case $opt in
         i)
             update_interval="$OPTARG"
@@ -92,12 +93,16 @@ while getopts "i:d:h" opt; do
         d)
             dot_option="$OPTARG"
             ;;
+        m)
+            run_mode="$OPTARG"
+            ;;
         h)
-            echo "Usage: $0 [-i interval] [-d dot_option]"
+            echo "Usage: $0 [-i interval] [-d dot_option] [-m mode]"
             echo ""
             echo "Options:"
             echo "  -i interval    Update interval in minutes (1-60, e.g., 5)"
             echo "  -d dot_option  Red dot option: 's' to skip, 'p' to pick location"
+            echo "  -m mode        'daemon' (default) keeps a resident renderer, 'cron' runs update_background.sh from cron"
             echo "  -h             Show this help message"
             echo ""
             echo "If options are not provided, the script will run interactively."
@@ -118,6 +123,11 @@ done
 # Shift past the parsed options
 shift $((OPTIND-1))
 
+if [ "$run_mode" != "daemon" ] && [ "$run_mode" != "cron" ]; then
+    echo "Error: -m must be 'daemon' or 'cron'"
+    exit 1
+fi
+
 # Change to the script's directory so relative paths work
 cd "$SCRIPT_DIR" || {
     echo "Error: Cannot change to script directory: $SCRIPT_DIR"
@@ -217,30 +227,20 @@ LOG_FILE="\$FRAME_DIR/update_background.log"
 # Log the start of the update
 echo "\$(date): Starting background update" >> "\$LOG_FILE"
 
-# Create timestamped filename
-TIMESTAMP=\$(date +%Y%m%d_%H%M%S)
-NEW_FRAME="\$FRAME_DIR/frame_\${TIMESTAMP}.png"
-
 # Generate new frame
 echo "Generating new frame..." >> "\$LOG_FILE"
-$SCRIPT_DIR/venv/bin/python3 $SCRIPT_DIR/src/black_mode.py --base-globe $SCRIPT_DIR/src/images/base_globe_with_dot.png --overlay $SCRIPT_DIR/src/images/stationary_overlay.png --temp-dir "\$FRAME_DIR" --update-interval $update_interval >> "\$LOG_FILE" 2>&1
-
-# Log the current frame
-echo "Current frame exists: \$(test -f "\$FRAME_DIR/current_frame.png" && echo 'yes' || echo 'no')" >> "\$LOG_FILE"
-echo "Current frame size: \$(ls -l "\$FRAME_DIR/current_frame.png" 2>/dev/null || echo 'not found')" >> "\$LOG_FILE"
-
-# Copy the current frame to a new timestamped file
-cp "\$FRAME_DIR/current_frame.png" "\$NEW_FRAME"
-echo "Created new frame: \$NEW_FRAME" >> "\$LOG_FILE"
-
-# Update the symlink
-ln -sf "\$NEW_FRAME" "\$FRAME_DIR/current_frame.png"
-echo "Updated symlink" >> "\$LOG_FILE"
+$SCRIPT_DIR/venv/bin/python3 $SCRIPT_DIR/src/black_mode.py --base-globe $SCRIPT_DIR/src/images/base_globe_with_dot.png --overlay $SCRIPT_DIR/src/images/stationary_overlay.png --temp-dir "\$FRAME_DIR" --update-interval $update_interval --cache-dir "\${XDG_CACHE_HOME:-\$HOME/.cache}/randall-clock/frames" --output-format png-fast --rgb --no-debug-frames >> "\$LOG_FILE" 2>&1
+status=\$?
+if [ "\$status" -eq 75 ]; then
+    # Another render (or the daemon) holds the frame store lock; leave the background alone
+    echo "\$(date): Render already in progress, skipping" >> "\$LOG_FILE"
+    exit 0
+fi
 
 # Update the background using feh
 export DISPLAY=:0
 export XAUTHORITY=/home/henry/.Xauthority
-feh --image-bg black --bg-max "\$NEW_FRAME"
+feh --image-bg black --bg-max "\$FRAME_DIR/current_frame.png"
 echo "Updated background using feh" >> "\$LOG_FILE"
 
 echo "\$(date): Background update complete" >> "\$LOG_FILE"
@@ -258,8 +258,11 @@ temp_crontab=$(mktemp)
 # (we're replacing @reboot with systemd user service which runs after graphical session)
 crontab -l 2>/dev/null | grep -v "update_background.sh" | grep -v "@reboot.*install_blackmode.sh" > "$temp_crontab"
 
-# Add our new cron jobs (periodic update job only, @reboot entries are preserved above)
-echo "*/$update_interval * * * * $SCRIPT_DIR/update_background.sh" >> "$temp_crontab"
+# Add our new cron jobs (periodic update job only, @reboot entries are preserved above).
+# In daemon mode the resident renderer handles every tick, so no periodic job is added.
+if [ "$run_mode" = "cron" ]; then
+    echo "*/$update_interval * * * * $SCRIPT_DIR/update_background.sh" >> "$temp_crontab"
+fi
 
 # Install the new crontab
 crontab "$temp_crontab"
@@ -267,15 +270,53 @@ crontab "$temp_crontab"
 # Clean up
 rm "$temp_crontab"
 
-# Set up systemd user service for running at login (replaces @reboot cron)
-echo "Setting up systemd user service for login..."
 mkdir -p ~/.config/systemd/user
 
-# Remove old service if it exists
-systemctl --user stop randall-clock-setup.service 2>/dev/null
-systemctl --user disable randall-clock-setup.service 2>/dev/null
+if [ "$run_mode" = "daemon" ]; then
+    # Set up the resident render daemon (keeps decoded images in memory between ticks)
+    echo "Setting up systemd user service for the render daemon..."
+
+    # The daemon renders at login itself, so the oneshot login service is no longer needed
+    systemctl --user stop randall-clock-setup.service 2>/dev/null
+    systemctl --user disable randall-clock-setup.service 2>/dev/null
+    systemctl --user stop randall-clock-daemon.service 2>/dev/null
+
+    cat > ~/.config/systemd/user/randall-clock-daemon.service << EOF
+[Unit]
+Description=Randall Clock Desktop Background render daemon
+After=graphical-session.target
+
+[Service]
+Type=simple
+Environment=DISPLAY=:0
+Environment=XAUTHORITY=%h/.Xauthority
+ExecStartPre=/bin/mkdir -p /tmp/randall-clock
+ExecStart=$SCRIPT_DIR/venv/bin/python3 $SCRIPT_DIR/src/black_mode.py --daemon --render-ahead --base-globe $SCRIPT_DIR/src/images/base_globe_with_dot.png --overlay $SCRIPT_DIR/src/images/stationary_overlay.png --temp-dir /tmp/randall-clock --update-interval $update_interval --cache-dir %C/randall-clock/frames --output-format ppm --publish-command "feh --image-bg black --bg-max {path}"
+Restart=on-failure
+RestartSec=10
+StandardOutput=journal
+StandardError=journal
+
+[Install]
+WantedBy=default.target
+EOF
 
-cat > ~/.config/systemd/user/randall-clock-setup.service << EOF
+    systemctl --user daemon-reload
+    systemctl --user enable randall-clock-daemon.service
+    systemctl --user start randall-clock-daemon.service
+    echo "Render daemon enabled. Control it with:"
+    echo "  $SCRIPT_DIR/venv/bin/python3 $SCRIPT_DIR/src/black_mode.py --control status|render|shutdown"
+else
+    # Set up systemd user service for running at login (replaces @reboot cron)
+    echo "Setting up systemd user service for login..."
+
+    # Remove old services if they exist
+    systemctl --user stop randall-clock-daemon.service 2>/dev/null
+    systemctl --user disable randall-clock-daemon.service 2>/dev/null
+    systemctl --user stop randall-clock-setup.service 2>/dev/null
+    systemctl --user disable randall-clock-setup.service 2>/dev/null
+
+    cat > ~/.config/systemd/user/randall-clock-setup.service << EOF
 [Unit]
 Description=Setup Randall Clock Desktop Background at Login
 After=graphical-session.target
@@ -292,15 +333,16 @@ StandardError=journal
 WantedBy=default.target
 EOF
 
-# Enable and start the service
-systemctl --user daemon-reload
-systemctl --user enable randall-clock-setup.service
-systemctl --user start randall-clock-setup.service
-echo "Systemd user service enabled. It will run update_background.sh on each login."
+    # Enable and start the service
+    systemctl --user daemon-reload
+    systemctl --user enable randall-clock-setup.service
+    systemctl --user start randall-clock-setup.service
+    echo "Systemd user service enabled. It will run update_background.sh on each login."
 
-# Set the initial background
-"$SCRIPT_DIR/update_background.sh"
+    # Set the initial background
+    "$SCRIPT_DIR/update_background.sh"
+fi
 
 echo "Installation complete!"
 echo "The background will update every $update_interval minute(s)."
-echo "You can find the current frame at: /tmp/randall-clock/current_frame.png" 
\ No newline at end of file
+echo "You can find the current frame at: /tmp/randall-clock/current_frame.png (current_frame.ppm in daemon mode)" 
\ No newline at end of file
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import os
+import logging
+import numpy as np
+from PIL import Image
+
+DEFAULT_ASSET_CACHE_DIR = os.path.expanduser('~/.cache/randall-clock/assets')
+
+
+class DecodedAssetCache:
+    """Decoded globe, overlay and mask arrays stored as raw uint8 ``.npy`` files.
+
+    Entries are named ``<kind>-<key>.npy``, where the key is derived from the content
+    digests of the source PNGs, so an edited asset gets a new entry instead of a stale
+    one. Hits are memory-mapped rather than read: a cold start maps the arrays in well
+    under a millisecond instead of inflating the PNGs, and pages that are never written
+    stay shared with the page cache. Only the newest ``keep`` entries of each kind are
+    kept.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_ASSET_CACHE_DIR, keep=2):
+        self.cache_dir = cache_dir
+        self.keep = keep
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, kind, key):
+        return os.path.join(self.cache_dir, f"{kind}-{key[:16]}.npy")
+
+    def array(self, kind, key, build, mmap_mode='r'):
+        """The cached array for (kind, key), building and storing it with build() on a miss.
+
+        mmap_mode ``'r'`` maps the entry read-only; ``'c'`` maps it copy-on-write, for
+        arrays the caller modifies in place (only the touched pages are copied).
+        """
+        path = self.path(kind, key)
+        try:
+            array = np.load(path, mmap_mode=mmap_mode)
+        except (FileNotFoundError, ValueError):
+            pass
+        else:
+            self.hits += 1
+            return array
+        self.misses += 1
+        array = np.ascontiguousarray(build(), dtype=np.uint8)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not store decoded {kind} in {self.cache_dir}: {e}")
+            return array
+        logging.info(f"Cached decoded {kind} {array.shape} as {path}")
+        self.prune(kind)
+        return np.load(path, mmap_mode=mmap_mode)
+
+    def image(self, kind, key, build, mode='RGBA'):
+        """Like array(), as a PIL image sharing the mapped memory (copied by PIL on first write)."""
+        array = self.array(kind, key, lambda: np.asarray(build().convert(mode)))
+        height, width = array.shape[:2]
+        return Image.frombuffer(mode, (width, height), array, 'raw', mode, 0, 1)
+
+    def prune(self, kind):
+        """Delete all but the newest keep entries of a kind."""
+        prefix = f"{kind}-"
+        entries = sorted(
+            (os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+             if name.startswith(prefix) and name.endswith('.npy')),
+            key=os.path.getmtime
+        )
+        for path in entries[:max(len(entries) - self.keep, 0)]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        return {'directory': self.cache_dir, 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import csv
+import logging
+import numpy as np
+from PIL import Image
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from frame_store import FrameStore
+
+USER_NAME = re.compile(r'^[\w.-]+$')
+
+
+def load_users(path):
+    """Read a ``name,lat,lon`` CSV (the [LOCATIONS] file format) into {name: (lat, lon)}."""
+    users = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            name = row['name'].strip()
+            if not USER_NAME.match(name):
+                raise ValueError(f"User name {name!r} in {path} must only use letters, digits, '.', '-' and '_'")
+            if name in users:
+                raise ValueError(f"User {name!r} appears twice in {path}")
+            users[name] = (float(row['lat']), float(row['lon']))
+    if not users:
+        raise ValueError(f"No users in {path}; expected name,lat,lon rows")
+    return users
+
+
+def stamp_patch(frame, mask, sprite, x, y):
+    """The sprite stamped at (x, y) on a copy of the frame box it covers, clipped to mask.
+
+    Returns ((left, top), RGBA array) or None when the dot lies outside the frame. Only the
+    box is copied and blended, so the frame itself is left untouched.
+    """
+    left, top, right, bottom = sprite.bbox(int(round(x)), int(round(y)))
+    height, width = frame.shape[:2]
+    left, top, right, bottom = max(left, 0), max(top, 0), min(right, width), min(bottom, height)
+    if left >= right or top >= bottom:
+        return None
+    region = Image.fromarray(frame[top:bottom, left:right])
+    sprite.stamp(region, x - left, y - top)
+    # The dot must not spill onto the overlay, as a dot baked into the globe cannot
+    patch = np.where(mask[top:bottom, left:right, None], np.asarray(region), frame[top:bottom, left:right])
+    return (left, top), patch
+
+
+class BatchFrame:
+    """One rendered instant shared by many users: the frame without dots plus each user's dot patch."""
+
+    def __init__(self, base, patches):
+        self.base = base
+        self.patches = patches
+
+    @property
+    def names(self):
+        return list(self.patches)
+
+    def frame(self, name):
+        """A user's full frame: a copy of the shared frame with their dot patch pasted in."""
+        pixels = self.base.copy()
+        patch = self.patches[name]
+        if patch is not None:
+            (left, top), region = patch
+            pixels[top:top + region.shape[0], left:left + region.shape[1]] = region
+        return Image.fromarray(pixels, 'RGBA')
+
+
+class MultiUserRenderer:
+    """Render frames for many users with different dot locations from one rotation per tick.
+
+    Wraps BlackModeGenerator.render_batch with the renderer interface the daemon and
+    generate_next_frame use; ``render_at`` returns a BatchFrame, which UserFrameStores
+    fans out to one frame store per user. The generator's own globe should carry no dots.
+    """
+
+    def __init__(self, generator, users):
+        self.generator = generator
+        self.output = generator.output
+        self.spans = generator.spans
+        self.frame_cache = None
+        self.dots = generator.project_dots(users)
+        logging.info(f"Rendering {len(self.dots)} users from one rotation per tick")
+
+    @property
+    def rotation_engine(self):
+        return self.generator.rotation_engine
+
+    @property
+    def roi(self):
+        return self.generator.roi
+
+    def calculate_rotation(self, instant=None):
+        return self.generator.calculate_rotation(instant)
+
+    def render_at(self, instant):
+        return self.generator.render_batch(instant, self.dots)
+
+    def generate_next_frame(self, update_interval, frame_store):
+        """Publish every user's frame for the current interval boundary and stage the next ones."""
+        now = datetime.now().astimezone()
+        aligned_time = now.replace(minute=(now.minute // update_interval) * update_interval, second=0, microsecond=0)
+        current_paths = frame_store.publish(self.render_at(aligned_time), aligned_time)
+        next_paths = frame_store.stage(self.render_at(aligned_time + timedelta(minutes=update_interval)))
+        logging.info(f"Saved current frames (aligned to {aligned_time}) for {len(current_paths)} users")
+        return current_paths, next_paths
+
+
+class UserFrameStores:
+    """FrameStore interface over one store per user under ``<directory>/users/<name>``.
+
+    ``publish`` and ``stage`` take a BatchFrame and build, encode and write each user's
+    frame on a pool of workers (PIL releases the GIL while encoding), so at most
+    ``workers`` full frames exist at once. Paths are lists in user order. Locking goes
+    through the main store, as with OutputFrameStores.
+    """
+
+    def __init__(self, lock_store, names, keep=2, workers=None):
+        self.lock_store = lock_store
+        self.encoder = lock_store.encoder
+        self.spans = lock_store.spans
+        self.names = list(names)
+        self.stores = [
+            FrameStore(os.path.join(lock_store.directory, 'users', name), lock_store.encoder, keep, lock_store.spans)
+            for name in self.names
+        ]
+        self.current_path = [store.current_path for store in self.stores]
+        self.next_path = [store.next_path for store in self.stores]
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='user-encode')
+
+    def acquire(self):
+        self.lock_store.acquire()
+
+    def release(self):
+        self.lock_store.release()
+
+    def _fan_out(self, write):
+        return list(self._executor.map(write, self.stores, self.names))
+
+    def stage(self, batch):
+        return self._fan_out(lambda store, name: store.stage(batch.frame(name)))
+
+    def publish(self, batch, instant=None):
+        return self._fan_out(lambda store, name: store.publish(batch.frame(name), instant))
+
+    def promote(self, staged_paths, instant=None):
+        return [store.promote(path, instant) for store, path in zip(self.stores, staged_paths)]
+
+    def footprint(self):
+        return {'users': [store.footprint() for store in self.stores]}
+
+    def describe_footprint(self):
+        return f"{len(self.stores)} users; " + '; '.join(store.describe_footprint() for store in self.stores[:3]) + \
+            ('; ...' if len(self.stores) > 3 else '')
@@ -1,38 +1,67 @@
 #!/usr/bin/env python3
 
 import os
+import sys
+import json
 import math
-from PIL import Image, ImageDraw, ImageOps
+import contextlib
+from PIL import Image
 import numpy as np
 from datetime import datetime, timezone, timedelta
 import configparser
 import logging
-
-# Set up logging
-logging.basicConfig(
-    filename='/tmp/randall-clock/black_mode.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s'
-)
+from frame_cache import FrameCache, file_digest, config_digest, quantize_angle
+from rotation import ROTATION_ENGINES, create_rotation_engine
+from compositor import FrameCompositor
+from frame_output import OUTPUT_FORMATS, FrameEncoder
+from frame_store import FrameStore, FrameStoreLocked
+from red_dot import default_sprite
+from spans import SpanRecorder, profiled
+from asset_cache import DEFAULT_ASSET_CACHE_DIR, DecodedAssetCache
 
 class BlackModeGenerator:
-    def __init__(self, base_globe_path, overlay_path, temp_dir, use_red_dot=False):
+    def __init__(self, base_globe_path, overlay_path, temp_dir, use_red_dot=False, save_debug=True,
+                 frame_cache=None, angle_quantum=0.25, rotation_engine='pil', output=None, spans=None,
+                 asset_cache=None):
         self.base_globe_path = base_globe_path
         self.overlay_path = overlay_path
         self.temp_dir = temp_dir
         self.use_red_dot = use_red_dot
+        self.save_debug = save_debug
+        self.frame_cache = frame_cache
+        self.angle_quantum = angle_quantum
+        self.rotation_engine_name = rotation_engine
+        self.output = output or FrameEncoder()
+        # Stage timings (asset load, mask build, rotate, composite, dot); see spans.SpanRecorder
+        self.spans = spans or SpanRecorder()
+        # Decoded globe, mask and static canvas are mapped from here instead of decoding the PNGs
+        self.asset_cache = asset_cache
+        self.vertical_offset = 10  # Adjust this value to move the globe up or down
+        self.red_dots = []
+        self._canvas_mask = None  # globe mask as a bool array, built on the first render_batch
         
         # Create temp directory if it doesn't exist
         os.makedirs(temp_dir, exist_ok=True)
         
-        # Load base images
-        self.globe = Image.open(base_globe_path).convert('RGBA')
-        self.overlay = Image.open(overlay_path).convert('RGBA')
+        # Content hashes identify the assets in frame cache and decoded asset cache keys
+        if frame_cache is not None or asset_cache is not None:
+            self.globe_hash = file_digest(base_globe_path)
+            self.overlay_hash = file_digest(overlay_path)
+        
+        # Load the globe
+        with self.spans.span('asset_load', asset='globe'):
+            if asset_cache is not None:
+                self.globe = asset_cache.image('globe', self.globe_hash, lambda: Image.open(base_globe_path))
+            else:
+                self.globe = Image.open(base_globe_path).convert('RGBA')
         
         # Create a mask for the globe (assuming the globe is the non-transparent part)
-        globe_array = np.array(self.globe)
-        mask_array = (globe_array[..., 3] > 0).astype(np.uint8) * 255
-        self.globe_mask = Image.fromarray(mask_array, 'L')
+        with self.spans.span('mask_build', mask='globe'):
+            if asset_cache is not None:
+                mask_array = asset_cache.array('globe_mask', self.globe_hash, self._alpha_mask)
+            else:
+                mask_array = self._alpha_mask()
+            self.globe_mask = Image.fromarray(mask_array, 'L')
         
         # Get globe center from config
         config = configparser.ConfigParser()
@@ -42,12 +71,38 @@ class BlackModeGenerator:
         self.globe_center_x = int(config['BLACK_GLOBE']['center_x'])
         self.globe_center_y = int(config['BLACK_GLOBE']['center_y'])
         
+        # Mark the configured [LOCATIONS] before the globe is extracted for rotation
+        from projection import load_locations
+        self.geometry = None
+        self.locations, lats, lons = load_locations(config, os.path.dirname(config_path))
+        if self.locations:
+            self._stamp_locations(lats, lons)
+        self._build_rotation_engine()
+        
+        # Load the overlay last so its decode does not overlap the globe extraction
+        with self.spans.span('asset_load', asset='overlay'):
+            if asset_cache is not None:
+                # Copy-on-write: frames only ever write the pages inside the globe mask
+                static = asset_cache.array('static', config_digest(globe=self.globe_hash, overlay=self.overlay_hash),
+                                           self._static_overlay, mmap_mode='c')
+            else:
+                static = self._static_overlay()
+        with self.spans.span('mask_build', mask='static_canvas'):
+            self._build_static_canvas(static)
+        del static
+        
         logging.info(f"Initialized BlackModeGenerator with base_globe={base_globe_path}, overlay={overlay_path}, temp_dir={temp_dir}")
     
-    def calculate_rotation(self):
-        """Calculate the rotation angle based on current time."""
-        # Get current UTC time
-        now = datetime.now(timezone.utc)
+    def calculate_rotation(self, instant=None):
+        """Calculate the rotation angle for an instant (default: now).
+        
+        Naive datetimes are interpreted as local time.
+        """
+        # Get the instant in UTC
+        if instant is None:
+            now = datetime.now(timezone.utc)
+        else:
+            now = instant.astimezone(timezone.utc)
         
         # Calculate total seconds since midnight UTC
         total_seconds = now.hour * 3600 + now.minute * 60 + now.second
@@ -63,49 +118,106 @@ class BlackModeGenerator:
         logging.info(f"Calculated rotation angle: {rotation} degrees for time {now}")
         return rotation
     
+    def globe_only(self):
+        """The globe (with its dots) on a transparent background outside the globe mask."""
+        # The mask is 0 or 255, so pasting through it equals clearing outside it, with no inverted copy
+        globe_only = Image.new('RGBA', self.globe.size)
+        globe_only.paste(self.globe, (0, 0), self.globe_mask)
+        return globe_only
+    
+    def _build_rotation_engine(self):
+        """Extract the globe and (re)build the rotation engine; needed whenever self.globe changes."""
+        with self.spans.span('engine_build', engine=self.rotation_engine_name):
+            self.rotation_engine = create_rotation_engine(
+                self.rotation_engine_name,
+                self.globe_only(),
+                (self.globe.width//2, self.globe.height//2)
+            )
+    
+    def _alpha_mask(self):
+        """The globe mask as a uint8 array: 255 wherever the globe is not fully transparent."""
+        alpha_array = np.asarray(self.globe.getchannel('A'))
+        return (alpha_array > 0).astype(np.uint8) * 255
+    
+    def _static_overlay(self):
+        """Decode the overlay and keep it only where the globe mask is empty, as an RGBA array."""
+        static = Image.open(self.overlay_path).convert('RGBA')
+        # In place, the decoded overlay is not reused
+        static.paste((0,0,0,0), (0, 0) + static.size, self.globe_mask)
+        return np.asarray(static)
+    
+    def _build_static_canvas(self, static):
+        """Pre-composite everything that does not move: the overlay outside the globe mask.
+        
+        Only pixels inside the globe mask change between frames, and the full overlay is
+        not kept once this is built. Every frame is composited into the same preallocated
+        canvas, so a returned frame is only valid until the next render; callers that keep
+        frames longer must copy them.
+        """
+        self.roi = self.globe_mask.getbbox() or (0, 0, 0, 0)
+        self.compositor = FrameCompositor(static, np.asarray(self.globe_mask) > 0, self.vertical_offset)
+    
+    @property
+    def cache_namespace(self):
+        """Frame cache namespace covering every input that affects a rendered frame except the angle."""
+        return config_digest(
+            globe=self.globe_hash,
+            overlay=self.overlay_hash,
+            use_red_dot=self.use_red_dot,
+            red_dots=self.red_dots,
+            vertical_offset=self.vertical_offset,
+            rotation_engine=self.rotation_engine_name,
+        )
+    
     def generate_frame(self, hour, minute):
-        """Generate a frame for the specified time."""
-        logging.info(f"Generating frame for {hour:02d}:{minute:02d}")
+        """Generate a frame for the specified local time today."""
+        instant = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0).astimezone()
+        return self.render_at(instant)
+    
+    def render_at(self, instant):
+        """Render the frame for an exact instant; the result depends only on the instant and the assets."""
+        local = instant.astimezone()
+        hour, minute = local.hour, local.minute
+        logging.info(f"Generating frame for {local.isoformat()}")
         
         # Calculate rotation angle
-        rotation = self.calculate_rotation()
+        rotation = self.calculate_rotation(instant)
         
-        # Extract globe using mask
-        globe_only = Image.composite(self.globe, Image.new('RGBA', self.globe.size, (0,0,0,0)), self.globe_mask)
+        # Serve from the frame cache when this angle has been rendered before
+        if self.frame_cache is not None:
+            rotation = quantize_angle(rotation, self.angle_quantum)
+            cached = self.frame_cache.get(self.cache_namespace, rotation)
+            if cached is not None:
+                logging.info(f"Frame cache hit for rotation {rotation:.4f}")
+                return cached
         
-        # Create a transparent background for rotation
-        rotated_globe = Image.new('RGBA', self.globe.size, (0,0,0,0))
-        
-        # Rotate the globe with transparent background
-        rotated_globe.paste(
-            globe_only.rotate(rotation, resample=Image.BICUBIC, center=(self.globe.width//2, self.globe.height//2), expand=False),
-            (0, 0)
-        )
+        # Rotate the extracted globe with transparent background (only the box around the disk)
+        with self.spans.span('rotate'):
+            rotated_globe = self.rotation_engine.rotate_array(rotation)
         
         # DEBUG: Save the rotated globe before compositing
-        debug_path = os.path.join(self.temp_dir, f"debug_rotated_globe_{hour:02d}h{minute:02d}m.png")
-        rotated_globe.save(debug_path)
-        logging.info(f"Saved debug rotated globe to {debug_path}")
-        
-        # Create a transparent background
-        final = Image.new('RGBA', self.overlay.size, (0,0,0,0))
+        if self.save_debug:
+            debug_path = os.path.join(self.temp_dir, f"debug_rotated_globe_{hour:02d}h{minute:02d}m.png")
+            Image.fromarray(rotated_globe, 'RGBA').save(debug_path, compress_level=1)
+            logging.info(f"Saved debug rotated globe to {debug_path}")
         
-        # Paste the rotated globe with a small vertical offset to move it down
-        vertical_offset = 10  # Adjust this value to move the globe up or down
-        final.paste(rotated_globe, (0, vertical_offset), rotated_globe)
+        # Place the globe (moved down by the vertical offset) inside the mask in one pass
+        with self.spans.span('composite'):
+            final = self.compositor.compose(rotated_globe, self.rotation_engine.box)
         
-        # Create a mask for the overlay (inverse of the globe mask)
-        overlay_mask = ImageOps.invert(self.globe_mask)
-        
-        # Apply the overlay using the mask
-        final.paste(self.overlay, (0, 0), overlay_mask)
+        if self.frame_cache is not None:
+            self.frame_cache.put(self.cache_namespace, rotation, final)
         
         return final
     
-    def generate_next_frame(self, update_interval=1):
-        """Generate the next frame based on current time, aligned to the update interval."""
+    def generate_next_frame(self, update_interval=1, frame_store=None):
+        """Generate the next frame based on current time, aligned to the update interval.
+        
+        The current frame is published to frame_store (default: the temp dir without a ring)
+        and the next one is staged as next_frame.
+        """
         # Get current local time
-        now = datetime.now()
+        now = datetime.now().astimezone()
         logging.info(f"Generating frames for current time: {now} with interval: {update_interval} minutes")
         
         # Calculate the time aligned to the update interval
@@ -114,53 +226,96 @@ class BlackModeGenerator:
         aligned_minute = (now.minute // update_interval) * update_interval
         aligned_time = now.replace(minute=aligned_minute, second=0, microsecond=0)
         
-        # Generate frame for the aligned time
-        current_frame = self.generate_frame(aligned_time.hour, aligned_time.minute)
+        frame_store = frame_store or FrameStore(self.temp_dir, self.output, keep=0, spans=self.spans)
+        
+        # Generate and publish the frame for the aligned time (before the next render reuses the canvas)
+        current_frame = self.render_at(aligned_time)
+        current_path = frame_store.publish(current_frame, aligned_time)
         
         # Generate next frame (next interval boundary)
         next_time = aligned_time + timedelta(minutes=update_interval)
-        next_frame = self.generate_frame(next_time.hour, next_time.minute)
-        
-        # Save frames
-        current_path = os.path.join(self.temp_dir, f"current_frame.png")
-        next_path = os.path.join(self.temp_dir, f"next_frame.png")
-        
-        current_frame.save(current_path)
-        next_frame.save(next_path)
+        next_frame = self.render_at(next_time)
+        next_path = frame_store.stage(next_frame)
         
         logging.info(f"Saved current frame (aligned to {aligned_time}) to {current_path}")
         logging.info(f"Saved next frame ({next_time}) to {next_path}")
         
         return current_path, next_path
 
+    def rotated_position(self, x, y, rotation):
+        """Where globe pixel (x, y) lands in a frame rotated by rotation degrees (the polar math of red-dot.py).
+        
+        The rotation engines turn the globe counter-clockwise about its center, sampling at
+        pixel centers, and the compositor shifts it down by the vertical offset.
+        """
+        cx, cy = self.rotation_engine.center
+        radians = math.radians(rotation)
+        dx, dy = x + 0.5 - cx, y + 0.5 - cy
+        rotated_x = cx + dx * math.cos(radians) + dy * math.sin(radians) - 0.5
+        rotated_y = cy - dx * math.sin(radians) + dy * math.cos(radians) - 0.5 + self.vertical_offset
+        return rotated_x, rotated_y
+    
+    def project_dots(self, locations):
+        """Globe pixels {name: (x, y)} for {name: (lat, lon)} in degrees, for render_batch."""
+        if self.geometry is None:
+            from projection import GlobeGeometry
+            self.geometry = GlobeGeometry.from_image(self.globe)
+        names = list(locations)
+        lats, lons = (np.array(values, dtype=np.float64) for values in zip(*locations.values())) if names else ([], [])
+        xs, ys = self.geometry.project(lats, lons)
+        return {name: (int(round(float(x))), int(round(float(y)))) for name, x, y in zip(names, np.atleast_1d(xs), np.atleast_1d(ys))}
+    
+    def render_batch(self, instant, dots, sprite=None):
+        """Render one frame for an instant and a dot for every user on it, rotating the globe only once.
+        
+        dots maps a user name to the globe pixel (x, y) of their dot on the unrotated
+        globe (see project_dots). Instead of baking each dot into its own globe and
+        rotating N globes, the bare frame is rendered once and each dot is stamped at its
+        rotated position into a copy of just the sprite's box, clipped to the globe mask.
+        Each user then costs a few microseconds; BatchFrame.frame(name) builds their
+        full frame on demand.
+        """
+        from batch import BatchFrame, stamp_patch
+        sprite = sprite or default_sprite()
+        base = np.array(self.render_at(instant))
+        rotation = self.calculate_rotation(instant)
+        if self.frame_cache is not None:
+            # Cached frames are rendered at the quantized angle
+            rotation = quantize_angle(rotation, self.angle_quantum)
+        if self._canvas_mask is None:
+            self._canvas_mask = np.asarray(self.globe_mask) > 0
+        patches = {}
+        with self.spans.span('dot', dots=len(dots)):
+            for name, (x, y) in dots.items():
+                patches[name] = stamp_patch(base, self._canvas_mask, sprite, *self.rotated_position(x, y, rotation))
+        return BatchFrame(base, patches)
+    
     def add_red_dot(self, x, y, rotation_degrees=0):
         """Add a glowing red dot at the specified coordinates."""
         logging.info(f"Adding red dot at coordinates ({x}, {y})")
-        # Create a new image with alpha channel for the dot
-        dot_img = Image.new('RGBA', self.globe.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(dot_img)
-        
-        # Define the glow layers (radius, alpha)
-        glow_layers = [
-            (20, 40),   # Outer glow
-            (15, 80),   # Middle glow
-            (10, 120),  # Inner glow
-            (5, 255)    # Core dot
-        ]
-        
-        # Draw each layer of the glow
-        for radius, alpha in glow_layers:
-            # Create a semi-transparent red color
-            color = (255, 0, 0, alpha)
-            # Draw the circle
-            draw.ellipse(
-                [x - radius, y - radius, x + radius, y + radius],
-                fill=color
-            )
-        
-        # Composite the dot onto the globe
-        self.globe = Image.alpha_composite(self.globe, dot_img)
+        # Blend the precomputed glow sprite into its bounding box only
+        with self.spans.span('dot', dots=1):
+            default_sprite().stamp(self.globe, x, y)
+        self.red_dots.append((x, y))
+        self._build_rotation_engine()
         logging.info("Red dot added successfully")
+    
+    def add_locations(self, lats, lons):
+        """Add a red dot at every latitude/longitude (degrees, arrays or scalars) in one pass."""
+        self._stamp_locations(lats, lons)
+        self._build_rotation_engine()
+    
+    def _stamp_locations(self, lats, lons):
+        """Project the locations onto the globe and stamp them; the rotation engine is not rebuilt."""
+        if self.geometry is None:
+            from projection import GlobeGeometry
+            self.geometry = GlobeGeometry.from_image(self.globe)
+        xs, ys = self.geometry.project(lats, lons)
+        xs, ys = np.rint(np.atleast_1d(xs)).astype(int), np.rint(np.atleast_1d(ys)).astype(int)
+        with self.spans.span('dot', dots=len(xs)):
+            drawn = default_sprite().stamp_many(self.globe, xs, ys)
+        self.red_dots.extend(zip(xs.tolist(), ys.tolist()))
+        logging.info(f"Marked {drawn} locations on the globe using {self.geometry}")
 
 def create_base_globe_with_dot(base_globe_path, x, y, output_path):
     """Create a base globe image with the red dot permanently placed at the specified coordinates."""
@@ -168,30 +323,8 @@ def create_base_globe_with_dot(base_globe_path, x, y, output_path):
     # Load the base globe
     base_globe = Image.open(base_globe_path).convert('RGBA')
     
-    # Create a new image with alpha channel for the dot
-    dot_img = Image.new('RGBA', base_globe.size, (0, 0, 0, 0))
-    draw = ImageDraw.Draw(dot_img)
-    
-    # Define the glow layers (radius, alpha)
-    glow_layers = [
-        (20, 40),   # Outer glow
-        (15, 80),   # Middle glow
-        (10, 120),  # Inner glow
-        (5, 255)    # Core dot
-    ]
-    
-    # Draw each layer of the glow
-    for radius, alpha in glow_layers:
-        # Create a semi-transparent red color
-        color = (255, 0, 0, alpha)
-        # Draw the circle
-        draw.ellipse(
-            [x - radius, y - radius, x + radius, y + radius],
-            fill=color
-        )
-    
-    # Composite the dot onto the globe
-    base_globe = Image.alpha_composite(base_globe, dot_img)
+    # Blend the precomputed glow sprite into its bounding box only
+    default_sprite().stamp(base_globe, x, y)
     
     # Save the result
     base_globe.save(output_path)
@@ -203,18 +336,118 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Generate black mode clock frames')
-    parser.add_argument('--base-globe', required=True, help='Path to base globe image')
-    parser.add_argument('--overlay', required=True, help='Path to overlay image')
-    parser.add_argument('--temp-dir', required=True, help='Path to temporary directory')
+    parser.add_argument('--base-globe', help='Path to base globe image')
+    parser.add_argument('--overlay', help='Path to overlay image')
+    parser.add_argument('--temp-dir', default='/tmp/randall-clock', help='Path to temporary directory (default: /tmp/randall-clock)')
     parser.add_argument('--use-red-dot', action='store_true', help='Whether to use red dot')
     parser.add_argument('--create-base', action='store_true', help='Create base globe with red dot')
     parser.add_argument('--dot-x', type=int, help='X coordinate for red dot')
     parser.add_argument('--dot-y', type=int, help='Y coordinate for red dot')
     parser.add_argument('--update-interval', type=int, default=1, help='Update interval in minutes (default: 1)')
+    parser.add_argument('--daemon', action='store_true', help='Stay resident and render a frame on every interval boundary')
+    parser.add_argument('--publish-command', help='Command run on each new frame in daemon mode, e.g. "feh --image-bg black --bg-max {path}"')
+    parser.add_argument('--render-ahead', action='store_true', help='In daemon mode, render the next boundary frame in the background and swap it in at the boundary')
+    parser.add_argument('--socket', help='Daemon control socket path (default: <temp-dir>/black_mode.sock)')
+    parser.add_argument('--control', metavar='{status,render,shutdown}', help='Send a command to a running daemon and exit')
+    parser.add_argument('--rotation-engine', choices=sorted(ROTATION_ENGINES), default='pil', help='Globe rotation engine: pil (BICUBIC Image.rotate) or polar (precomputed polar roll, faster per frame, slower start)')
+    parser.add_argument('--cache-dir', help='Directory for the persistent frame cache (disabled when omitted)')
+    parser.add_argument('--cache-max-mb', type=int, default=1024, help='Disk size cap for the frame cache in MB (default: 1024)')
+    parser.add_argument('--memory-cache', type=int, default=0, help='Number of frames to also keep in memory (default: 0)')
+    parser.add_argument('--output-format', choices=list(OUTPUT_FORMATS), default='png', help='Published frame format: png (default deflate), png-fast (deflate level 1), ppm or bmp (uncompressed RGB)')
+    parser.add_argument('--compress-level', type=int, choices=range(10), metavar='0-9', help='PNG deflate level, overriding the output format default')
+    parser.add_argument('--rgb', action='store_true', help='Flatten frames onto black and write RGB without the alpha channel')
+    parser.add_argument('--no-debug-frames', action='store_true', help='Do not save the debug rotated globe for each frame')
+    parser.add_argument('--keep-frames', type=int, default=2, help='Number of recent frames kept in the temp dir ring (default: 2, 0 writes only current_frame)')
+    parser.add_argument('--wallpaper', choices=['command', 'x11'], default='command', help='Daemon wallpaper backend: command (run --publish-command on a frame file) or x11 (set the X root pixmap in-process, uploading only the changed globe rectangle)')
+    parser.add_argument('--display', help='X display for --wallpaper x11 (default: $DISPLAY, else the first local X server)')
+    parser.add_argument('--smooth', action='store_true', help='In daemon mode, render continuously instead of on interval boundaries, whenever the globe edge has moved --min-displacement pixels')
+    parser.add_argument('--smooth-step', type=float, default=1.0, help='Shortest wait between smooth-mode checks in seconds (default: 1)')
+    parser.add_argument('--min-displacement', type=float, default=0.5, help='Smooth mode: skip frames whose largest pixel motion at the disk edge is below this (default: 0.5)')
+    parser.add_argument('--cpu-budget', type=float, default=10.0, help='Smooth mode: maximum CPU use in percent of one core, including the publish command (default: 10)')
+    parser.add_argument('--outputs', help='Render at native size for each output instead of one 1980x1977 frame: comma-separated [name=]WIDTHxHEIGHT[:fit|fill|center], e.g. left=1920x1080,right=3840x2160:fill; frames go to <temp-dir>/outputs/<name>/')
+    parser.add_argument('--asset-cache-dir', default=DEFAULT_ASSET_CACHE_DIR, help=f'Cache of decoded globe, overlay and masks, memory-mapped on later starts instead of decoding the PNGs (default: {DEFAULT_ASSET_CACHE_DIR})')
+    parser.add_argument('--no-asset-cache', action='store_true', help='Decode the PNG assets on every start')
+    parser.add_argument('--trace-file', help='Append every render stage span (asset load, mask build, rotate, composite, dot, encode, publish) to this file as JSON lines')
+    parser.add_argument('--metrics-file', help='Write per-stage span totals in Prometheus textfile-collector format to this file after each render, e.g. /var/lib/node_exporter/textfile_collector/randall_clock.prom')
+    parser.add_argument('--profile', action='store_true', help='Run under cProfile and tracemalloc and print a time and memory summary on exit (raw profile: <temp-dir>/black_mode.prof)')
+    parser.add_argument('--serve', metavar='[HOST:]PORT', help='In daemon mode, also serve each new frame over HTTP from memory at /frame (and /frame/<name> per output), with ETag/304 revalidation and a /frame/next long poll; HOST defaults to 127.0.0.1')
+    parser.add_argument('--users', help='Render one frame per user from a name,lat,lon CSV, rotating the globe once per tick and stamping each dot after rotation; frames go to <temp-dir>/users/<name>/')
+    parser.add_argument('--user-workers', type=int, help='Threads encoding and writing the per-user frames (default: CPU count)')
+    parser.add_argument('--pyramid-dir', help='Cache of prescaled assets for --outputs (default: ~/.cache/randall-clock/pyramid)')
     
     args = parser.parse_args()
+    
+    # Set up logging (here rather than at import, so importing the module has no side effects)
+    os.makedirs(args.temp_dir, exist_ok=True)
+    logging.basicConfig(
+        filename=os.path.join(args.temp_dir, 'black_mode.log'),
+        level=logging.INFO,
+        format='%(asctime)s - %(message)s'
+    )
     logging.info(f"Starting black_mode.py with arguments: {args}")
     
+    # The daemon, HTTP server, multi-output and multi-user modules are only imported by the
+    # options that need them, so a one-shot render does not pay for them
+    if args.control:
+        from render_daemon import CONTROL_COMMANDS, default_socket_path, send_control_command
+        if args.control not in CONTROL_COMMANDS:
+            parser.error(f"--control must be one of {', '.join(CONTROL_COMMANDS)}")
+        socket_path = args.socket or default_socket_path(args.temp_dir)
+        try:
+            response = send_control_command(socket_path, args.control)
+        except OSError as e:
+            print(f"Error: could not reach daemon on {socket_path}: {e}")
+            sys.exit(1)
+        print(json.dumps(response, indent=2))
+        sys.exit(0 if response.get('ok') else 1)
+    
+    if not args.base_globe or not args.overlay:
+        parser.error('--base-globe and --overlay are required')
+    if args.wallpaper == 'x11' and not args.daemon:
+        parser.error('--wallpaper x11 requires --daemon')
+    if args.smooth:
+        if not args.daemon:
+            parser.error('--smooth requires --daemon')
+        if args.render_ahead:
+            parser.error('--smooth and --render-ahead cannot be combined')
+        if args.cache_dir:
+            parser.error('--smooth cannot use --cache-dir (cached frames are snapped to whole minutes)')
+        if not 0 < args.cpu_budget <= 100:
+            parser.error('--cpu-budget must be in (0, 100]')
+        if args.min_displacement <= 0 or args.smooth_step <= 0:
+            parser.error('--min-displacement and --smooth-step must be positive')
+    if args.serve:
+        if not args.daemon:
+            parser.error('--serve requires --daemon')
+        if args.wallpaper == 'x11':
+            parser.error('--serve cannot be combined with --wallpaper x11 (no frame is encoded)')
+        from frame_server import parse_address
+        try:
+            args.serve = parse_address(args.serve)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.users:
+        if args.outputs:
+            parser.error('--users cannot be combined with --outputs')
+        if args.wallpaper == 'x11':
+            parser.error('--users cannot be combined with --wallpaper x11')
+        from batch import load_users
+        try:
+            args.users = load_users(args.users)
+        except (OSError, KeyError, ValueError) as e:
+            parser.error(f"Cannot read --users: {e}")
+    targets = None
+    if args.outputs:
+        if args.wallpaper == 'x11':
+            parser.error('--outputs cannot be combined with --wallpaper x11')
+        if args.cache_dir:
+            parser.error('--outputs cannot use --cache-dir (outputs are resampled from each rotation, which the cache does not hold)')
+        from outputs import parse_outputs
+        try:
+            targets = parse_outputs(args.outputs)
+        except ValueError as e:
+            parser.error(str(e))
+    
     if args.create_base:
         if not args.dot_x or not args.dot_y:
             logging.error("Error: --dot-x and --dot-y are required when --create-base is used")
@@ -227,16 +460,108 @@ def main():
         print(f"Created base globe with red dot at: {base_with_dot}")
         return
     
+    # Stage spans are always kept; --trace-file and --metrics-file export them
+    spans = SpanRecorder(args.trace_file, args.metrics_file)
+    try:
+        with profiled(os.path.join(args.temp_dir, 'black_mode.prof'), spans) if args.profile else contextlib.nullcontext():
+            render(args, parser, targets, spans)
+    finally:
+        spans.close()
+
+def render(args, parser, targets, spans):
+    """Render one frame pair, or run the daemon, as configured by main's arguments."""
+    try:
+        output = FrameEncoder(args.output_format, compress_level=args.compress_level, rgb=args.rgb)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    # Take the store lock before loading anything, so an overlapping run exits immediately
+    frame_store = FrameStore(args.temp_dir, output, keep=args.keep_frames, spans=spans)
+    try:
+        frame_store.acquire()
+    except FrameStoreLocked as e:
+        logging.warning(f"Skipping render: {e}")
+        print(f"Skipping render: {e}")
+        sys.exit(75)
+    
+    frame_cache = None
+    if args.cache_dir:
+        frame_cache = FrameCache(
+            os.path.expanduser(args.cache_dir),
+            max_bytes=args.cache_max_mb * 1024 * 1024,
+            memory_entries=args.memory_cache
+        )
+    
     generator = BlackModeGenerator(
         args.base_globe,
         args.overlay,
         args.temp_dir,
-        args.use_red_dot
+        args.use_red_dot,
+        save_debug=not (args.daemon or args.no_debug_frames),
+        frame_cache=frame_cache,
+        rotation_engine=args.rotation_engine,
+        output=output,
+        spans=spans,
+        asset_cache=None if args.no_asset_cache else DecodedAssetCache(os.path.expanduser(args.asset_cache_dir))
     )
     
-    current_path, next_path = generator.generate_next_frame(args.update_interval)
-    print(f"Current frame: {current_path}")
-    print(f"Next frame: {next_path}")
+    # With --outputs every tick renders all outputs, and each output has its own frame store
+    renderer = generator
+    if targets:
+        from outputs import DEFAULT_PYRAMID_DIR, AssetPyramid, MultiOutputRenderer, OutputFrameStores
+        renderer = MultiOutputRenderer(generator, targets, AssetPyramid(os.path.expanduser(args.pyramid_dir or DEFAULT_PYRAMID_DIR)))
+        frame_store = OutputFrameStores(frame_store, targets, keep=args.keep_frames)
+    elif args.users:
+        from batch import MultiUserRenderer, UserFrameStores
+        renderer = MultiUserRenderer(generator, args.users)
+        frame_store = UserFrameStores(frame_store, args.users, keep=args.keep_frames, workers=args.user_workers)
+    
+    if args.daemon:
+        from render_daemon import RenderDaemon
+        wallpaper = None
+        if args.wallpaper == 'x11':
+            from x11_wallpaper import X11RootWallpaper
+            try:
+                wallpaper = X11RootWallpaper(args.display)
+            except RuntimeError as e:
+                logging.error(f"X11 wallpaper backend unavailable: {e}")
+                print(f"Error: {e}")
+                sys.exit(1)
+        frame_server = None
+        if args.serve:
+            from frame_server import FrameServer
+            try:
+                names = [target.name for target in targets] if targets else list(args.users or ['current'])
+                frame_server = FrameServer(*args.serve, names=names)
+            except OSError as e:
+                logging.error(f"Cannot serve frames on {args.serve[0]}:{args.serve[1]}: {e}")
+                print(f"Error: cannot serve frames on {args.serve[0]}:{args.serve[1]}: {e}")
+                sys.exit(1)
+        daemon = RenderDaemon(
+            renderer,
+            args.temp_dir,
+            update_interval=args.update_interval,
+            socket_path=args.socket,
+            publish_command=args.publish_command,
+            render_ahead=args.render_ahead,
+            wallpaper=wallpaper,
+            frame_store=frame_store,
+            smooth=args.smooth,
+            smooth_step=args.smooth_step,
+            min_displacement=args.min_displacement,
+            cpu_budget=args.cpu_budget,
+            frame_server=frame_server
+        )
+        daemon.run()
+        return
+    
+    try:
+        current_path, next_path = renderer.generate_next_frame(args.update_interval, frame_store)
+    finally:
+        frame_store.release()
+    print(f"Current frame: {', '.join(current_path) if isinstance(current_path, list) else current_path}")
+    print(f"Next frame: {', '.join(next_path) if isinstance(next_path, list) else next_path}")
+    print(f"Frame store: {frame_store.describe_footprint()}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
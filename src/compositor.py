@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from PIL import Image
+
+
+def _div255_table():
+    """Lookup table for PIL's premultiply rounding: DIV255(v * a) indexed by a * 256 + v."""
+    product = np.arange(256, dtype=np.uint32)[:, None] * np.arange(256, dtype=np.uint32)[None, :] + 128
+    return ((product + (product >> 8)) >> 8).astype(np.uint8).reshape(-1)
+
+
+class FrameCompositor:
+    """Fused per-frame compositing over preallocated NumPy buffers.
+
+    The canvas holds the static overlay (already cleared inside the globe mask) and is
+    wrapped once by a PIL image that shares its memory. Each frame fills every pixel inside
+    the globe mask in one gather: the rotated globe pixel from the vertically offset
+    position, premultiplied by its alpha exactly as PIL's ``paste(im, box, im)`` does onto a
+    transparent background. Opaque pixels premultiply to themselves, so only the antialiased
+    rim goes through the lookup table. Pixels outside the mask are never touched, and no
+    full-size array is allocated after construction.
+    """
+
+    def __init__(self, static, globe_mask, vertical_offset=0):
+        self.height, self.width = static.shape[:2]
+        self.vertical_offset = vertical_offset
+        # Writable arrays (e.g. a copy-on-write mapped canvas) are used as they are, others are copied
+        self.canvas = np.require(static, dtype=np.uint8, requirements=['C', 'W'])
+        # The PIL view shares the canvas memory, so it always shows the latest frame
+        self.image = Image.frombuffer('RGBA', (self.width, self.height), self.canvas, 'raw', 'RGBA', 0, 1)
+        self._canvas_pixels = self.canvas.view(np.uint32).reshape(-1)
+
+        ys, xs = np.nonzero(globe_mask)
+        self._mask_y = ys
+        self._mask_x = xs
+        self.canvas_index = ys.astype(np.intp) * self.width + xs
+
+        self._pixels = np.empty(len(self.canvas_index), dtype=np.uint32)
+        self._channels = self._pixels.view(np.uint8).reshape(-1, 4)
+        self._opaque = np.empty(len(self.canvas_index), dtype=bool)
+        self._div255 = _div255_table()
+        self._box = None
+        self.source_index = None
+        self.outside_box = None
+
+    def _build_source_index(self, box):
+        """Map every mask pixel to its pixel in the flattened rotated box."""
+        left, top, right, bottom = box
+        box_width = right - left
+        sx = self._mask_x - left
+        sy = self._mask_y - self.vertical_offset - top
+        inside = (sx >= 0) & (sx < box_width) & (sy >= 0) & (sy < bottom - top)
+        # Pixels whose source falls outside the rotated box are transparent; read pixel 0, then clear them
+        self.source_index = np.where(inside, sy * box_width + sx, 0).astype(np.intp)
+        self.outside_box = np.flatnonzero(~inside)
+        self._box = box
+
+    def compose(self, rotated, box):
+        """Write the rotated globe box (an RGBA uint8 array located at box) into the canvas."""
+        if box != self._box:
+            self._build_source_index(box)
+        source = np.ascontiguousarray(rotated).view(np.uint32).reshape(-1)
+        np.take(source, self.source_index, out=self._pixels)
+        self._pixels[self.outside_box] = 0
+
+        # Premultiply the translucent rim: DIV255(v * a) with PIL's rounding, via the lookup table
+        np.equal(self._channels[:, 3], 255, out=self._opaque)
+        rim = np.flatnonzero(~self._opaque)
+        channels = self._channels[rim]
+        offsets = channels[:, 3:].astype(np.intp) << 8
+        self._channels[rim] = self._div255[offsets + channels]
+
+        self._canvas_pixels[self.canvas_index] = self._pixels
+        return self.image
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+# Frames are stored with fast deflate; they are re-read far more often than written
+CACHE_PNG_COMPRESS_LEVEL = 1
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_digest(**parts):
+    """Hash the render inputs (asset hashes, dot configuration, ...) into a short namespace id."""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def quantize_angle(angle, quantum):
+    """Snap a rotation angle to the cache grid, normalised into [0, 360)."""
+    steps = round(angle / quantum)
+    return (steps * quantum) % 360.0
+
+
+class FrameCache:
+    """Two-tier (memory + disk) cache of rendered frames keyed by render inputs and rotation angle.
+
+    Entries live under ``<cache_dir>/<namespace>/<angle>.png`` where the namespace is the
+    config digest of the assets and dot settings, so changing the overlay or the dot only
+    orphans the entries for the old inputs; those age out through LRU eviction.
+    """
+
+    def __init__(self, cache_dir, max_bytes=1024 * 1024 * 1024, memory_entries=0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._scan()
+        self._total_bytes = sum(size for size, _ in self._index.values())
+        logging.info(f"Frame cache at {cache_dir}: {len(self._index)} entries, {self._total_bytes / 1e6:.1f} MB")
+
+    def _scan(self):
+        """Build the on-disk index: path -> (size, mtime)."""
+        index = {}
+        for namespace in os.listdir(self.cache_dir):
+            ns_dir = os.path.join(self.cache_dir, namespace)
+            if not os.path.isdir(ns_dir):
+                continue
+            for name in os.listdir(ns_dir):
+                if not name.endswith('.png'):
+                    continue
+                path = os.path.join(ns_dir, name)
+                st = os.stat(path)
+                index[path] = (st.st_size, st.st_mtime)
+        return index
+
+    def _path(self, namespace, angle):
+        return os.path.join(self.cache_dir, namespace, f"{angle:09.4f}.png")
+
+    def get(self, namespace, angle):
+        """Return the cached frame for (namespace, angle), or None on a miss."""
+        key = (namespace, angle)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key].copy()
+            path = self._path(namespace, angle)
+            if path not in self._index:
+                self.misses += 1
+                return None
+            # Touch the file so its mtime tracks recency for LRU eviction
+            os.utime(path)
+            self._index[path] = (self._index[path][0], os.stat(path).st_mtime)
+            self.hits += 1
+        try:
+            frame = Image.open(path)
+            frame.load()
+        except OSError as e:
+            logging.warning(f"Dropping unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return None
+        self._remember(key, frame)
+        return frame
+
+    def put(self, namespace, angle, frame):
+        """Store a rendered frame in both tiers, evicting least recently used entries as needed."""
+        path = self._path(namespace, angle)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        frame.save(tmp_path, format='PNG', compress_level=CACHE_PNG_COMPRESS_LEVEL)
+        os.replace(tmp_path, path)
+        st = os.stat(path)
+        with self._lock:
+            previous = self._index.get(path)
+            if previous:
+                self._total_bytes -= previous[0]
+            self._index[path] = (st.st_size, st.st_mtime)
+            self._total_bytes += st.st_size
+        self._remember((namespace, angle), frame.copy())
+        self._evict()
+
+    def _remember(self, key, frame):
+        if self.memory_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = frame
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _remove(self, path):
+        with self._lock:
+            entry = self._index.pop(path, None)
+            if entry:
+                self._total_bytes -= entry[0]
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Delete the oldest entries until the disk tier fits under max_bytes."""
+        if self._total_bytes <= self.max_bytes:
+            return
+        with self._lock:
+            by_age = sorted(self._index.items(), key=lambda item: item[1][1])
+        for path, _ in by_age:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            self.evictions += 1
+        logging.info(f"Frame cache evicted down to {self._total_bytes / 1e6:.1f} MB")
+
+    def stats(self):
+        """Return hit/miss counters and the current footprint."""
+        return {
+            'entries': len(self._index),
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'memory_entries': len(self._memory),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
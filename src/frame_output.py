@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import logging
+import threading
+from PIL import Image
+
+# name -> (PIL format, file extension, keeps alpha, default save parameters)
+OUTPUT_FORMATS = {
+    'png': ('PNG', 'png', True, {}),
+    'png-fast': ('PNG', 'png', True, {'compress_level': 1}),
+    'ppm': ('PPM', 'ppm', False, {}),
+    'bmp': ('BMP', 'bmp', False, {}),
+}
+
+
+class FrameEncoder:
+    """Write published frames in a configurable format.
+
+    ``png`` keeps PIL's default deflate level, ``png-fast`` uses level 1, and ``ppm``/``bmp``
+    are uncompressed. ``rgb`` flattens the frame onto black before encoding, which is what
+    the wallpaper shows anyway and saves a quarter of the bytes; PPM and BMP are always
+    written as RGB.
+    """
+
+    def __init__(self, output_format='png', compress_level=None, rgb=False):
+        try:
+            self.pil_format, self.extension, keeps_alpha, params = OUTPUT_FORMATS[output_format]
+        except KeyError:
+            raise ValueError(f"Unknown output format {output_format!r}, expected one of {', '.join(OUTPUT_FORMATS)}")
+        self.output_format = output_format
+        self.rgb = rgb or not keeps_alpha
+        self.params = dict(params)
+        if compress_level is not None:
+            if self.pil_format != 'PNG':
+                raise ValueError(f"--compress-level only applies to PNG output, not {output_format}")
+            self.params['compress_level'] = compress_level
+        # One flattening buffer per thread: several stores may share an encoder across workers
+        self._local = threading.local()
+
+    def describe(self):
+        """Short human-readable summary, e.g. 'png-fast (rgb, compress_level=1)'."""
+        details = ['rgb' if self.rgb else 'rgba'] + [f"{key}={value}" for key, value in self.params.items()]
+        return f"{self.output_format} ({', '.join(details)})"
+
+    def prepare(self, frame):
+        """Return the image that will be encoded: the frame itself, or the frame flattened onto black.
+
+        The flattened image is reused by the calling thread's next prepare.
+        """
+        if not self.rgb:
+            return frame
+        background = getattr(self._local, 'background', None)
+        if background is None or background.size != frame.size:
+            background = self._local.background = Image.new('RGB', frame.size)
+        # Pasting with the frame's own alpha over black premultiplies it, exactly like the desktop shows it
+        background.paste((0, 0, 0), (0, 0) + frame.size)
+        background.paste(frame, (0, 0), frame)
+        return background
+
+    def filename(self, stem):
+        """File name for a frame stem such as 'current_frame'."""
+        return f"{stem}.{self.extension}"
+
+    def save(self, frame, path):
+        """Encode a frame to path (written to a temporary file and renamed into place)."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.prepare(frame).save(tmp_path, format=self.pil_format, **self.params)
+        os.replace(tmp_path, path)
+        logging.info(f"Saved frame to {path} as {self.describe()}")
+        return path
+
+    def encode(self, frame):
+        """Encode a frame to bytes."""
+        buffer = io.BytesIO()
+        self.prepare(frame).save(buffer, format=self.pil_format, **self.params)
+        return buffer.getvalue()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+import hashlib
+import logging
+import math
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_PORT = 8765
+# Long-poll requests wait at most this long (seconds) before answering 304
+DEFAULT_POLL_TIMEOUT = 60
+MAX_POLL_TIMEOUT = 300
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'ppm': 'image/x-portable-pixmap',
+    'bmp': 'image/bmp',
+}
+
+
+def parse_address(spec):
+    """Parse ``[HOST:]PORT`` (host defaults to 127.0.0.1) into (host, port)."""
+    host, _, port = spec.rpartition(':')
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError(f"Bad --serve address {spec!r}, expected [HOST:]PORT")
+    if not 0 <= port <= 65535:
+        raise ValueError(f"Port out of range in {spec!r}")
+    return host.strip('[]') or '127.0.0.1', port
+
+
+class ServedFrame:
+    """One encoded frame as served: the bytes plus their validators."""
+
+    def __init__(self, body, content_type, modified, expires=None):
+        self.body = body
+        self.content_type = content_type
+        # Strong validator: the hash of the exact bytes served
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        # HTTP dates have one-second resolution
+        self.modified = modified.astimezone(timezone.utc).replace(microsecond=0)
+        self.expires = expires
+
+    def cache_control(self, now=None):
+        """max-age up to the next publish, so caches revalidate exactly when a new frame can exist."""
+        if self.expires is None:
+            return 'no-cache'
+        now = now or datetime.now(timezone.utc)
+        return f"public, max-age={max(int((self.expires - now).total_seconds()), 0)}"
+
+
+class _FrameHandler(BaseHTTPRequestHandler):
+    """GET/HEAD on /frame[/<name>] and the long-poll /frame[/<name>]/next."""
+
+    server_version = 'RandallClock'
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def log_message(self, format, *args):
+        logging.debug(f"HTTP {self.address_string()} {format % args}")
+
+    def _respond(self, send_body):
+        frames = self.server.frames
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        if not parts or parts[0] != 'frame' or len(parts) > 3:
+            return self._send_error(404, 'Not found; try /frame or /frame/next')
+        name, wait = frames.default_name, False
+        if len(parts) >= 2:
+            if parts[1] in frames.names:
+                name = parts[1]
+                wait = len(parts) == 3 and parts[2] == 'next'
+                if len(parts) == 3 and not wait:
+                    return self._send_error(404, 'Not found')
+            elif parts[1] == 'next' and len(parts) == 2:
+                wait = True
+            else:
+                return self._send_error(404, f"Unknown output {parts[1]!r}, expected one of {', '.join(frames.names)}")
+
+        etags = self._request_etags()
+        if wait:
+            query = parse_qs(url.query)
+            try:
+                timeout = float(query.get('timeout', [DEFAULT_POLL_TIMEOUT])[0])
+            except ValueError:
+                timeout = math.nan
+            if not math.isfinite(timeout):
+                return self._send_error(400, 'timeout must be a number of seconds')
+            timeout = min(max(timeout, 0.0), MAX_POLL_TIMEOUT)
+            after = query.get('after', [None])[0]
+            if after:
+                # Bare hashes are accepted as well as the quoted ETag
+                after = after if after.startswith(('"', 'W/')) else f'"{after}"'
+                etags.append(after.removeprefix('W/'))
+            elif not etags:
+                # Without a validator the client has whatever is current now
+                etags = [getattr(frames.get(name), 'etag', None)]
+            frame = frames.wait(name, after or etags[0], timeout)
+        else:
+            frame = frames.get(name)
+        if frame is None:
+            return self._send_error(503, 'No frame rendered yet', retry_after=1)
+
+        if self._not_modified(frame, etags):
+            frames.count('not_modified')
+            self.send_response(304)
+            self._send_validators(frame)
+            self.end_headers()
+            return
+        frames.count('served')
+        self.send_response(200)
+        self.send_header('Content-Type', frame.content_type)
+        self.send_header('Content-Length', str(len(frame.body)))
+        self._send_validators(frame)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(frame.body)
+
+    def _request_etags(self):
+        header = self.headers.get('If-None-Match')
+        if not header:
+            return []
+        return [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+    def _not_modified(self, frame, etags):
+        """Whether the client already has frame: its If-None-Match (or long-poll) ETags, else If-Modified-Since."""
+        # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+        if etags:
+            return '*' in etags or frame.etag in etags
+        since = self.headers.get('If-Modified-Since')
+        if since:
+            try:
+                return frame.modified <= parsedate_to_datetime(since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _send_validators(self, frame):
+        self.send_header('ETag', frame.etag)
+        self.send_header('Last-Modified', format_datetime(frame.modified, usegmt=True))
+        self.send_header('Cache-Control', frame.cache_control())
+
+    def _send_error(self, code, message, retry_after=None):
+        body = (message + '\n').encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+
+class _FrameHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class FrameServer:
+    """Serve the latest published frame(s) from memory over HTTP.
+
+    The renderer calls ``publish`` once per new frame with the encoded bytes; every client
+    is answered from that copy, so N consumers never cause N renders. Responses carry a
+    strong ETag (hash of the bytes), Last-Modified (the frame's instant) and a
+    Cache-Control max-age running out at the next expected publish, and conditional
+    requests get 304. ``/frame/next`` is a long poll: it answers as soon as a frame other
+    than the one the client has (its If-None-Match or ``?after=`` ETag) is published, or
+    with 304 after ``?timeout=`` seconds. With several outputs each is served at
+    ``/frame/<name>`` and the first one also at ``/frame``.
+    """
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, names=('current',)):
+        self.names = list(names)
+        self.default_name = self.names[0]
+        self._frames = {}
+        self._changed = threading.Condition()
+        self._counts = {'published': 0, 'served': 0, 'not_modified': 0, 'waiting': 0}
+        self._httpd = _FrameHTTPServer((host, port), _FrameHandler)
+        self._httpd.frames = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._httpd.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='frame-server', daemon=True)
+        self._thread.start()
+        logging.info(f"Serving frames on http://{self.address[0]}:{self.address[1]}/frame")
+
+    def stop(self):
+        # Wake long polls so their threads answer before the socket closes
+        with self._changed:
+            self._changed.notify_all()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def publish(self, bodies, content_type, modified, expires=None):
+        """Make new encoded frames current (one body per name, in order) and wake long polls."""
+        frames = {name: ServedFrame(body, content_type, modified, expires) for name, body in zip(self.names, bodies)}
+        with self._changed:
+            self._frames.update(frames)
+            self._counts['published'] += 1
+            self._changed.notify_all()
+
+    def get(self, name):
+        with self._changed:
+            return self._frames.get(name)
+
+    def wait(self, name, etag, timeout):
+        """The frame for name once its ETag differs from etag (or any frame when etag is None), else after timeout the current one."""
+        with self._changed:
+            baseline = etag if etag is not None else getattr(self._frames.get(name), 'etag', None)
+            self._counts['waiting'] += 1
+            try:
+                self._changed.wait_for(lambda: getattr(self._frames.get(name), 'etag', None) != baseline, timeout)
+            finally:
+                self._counts['waiting'] -= 1
+            return self._frames.get(name)
+
+    def count(self, key):
+        with self._changed:
+            self._counts[key] += 1
+
+    def stats(self):
+        with self._changed:
+            stats = dict(self._counts)
+            stats['url'] = f"http://{self.address[0]}:{self.address[1]}/frame"
+            stats['frames'] = {name: frame.etag for name, frame in self._frames.items()}
+        return stats
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import fcntl
+import logging
+from datetime import datetime
+from frame_output import FrameEncoder
+from spans import SpanRecorder
+
+LOCK_NAME = 'frame_store.lock'
+# Ring entries, including the frame_<timestamp>.png copies left by older update_background.sh versions
+RING_PATTERN = re.compile(r'^frame_\d{8}_\d{4,6}\.\w+$')
+
+
+class FrameStoreLocked(RuntimeError):
+    """Another process holds the frame store lock (a render is already in progress)."""
+
+
+def filesystem_type(path):
+    """Filesystem type (e.g. 'tmpfs', 'ext4') of the mount containing path, from /proc/mounts."""
+    path = os.path.realpath(path)
+    best, best_type = '', None
+    try:
+        with open('/proc/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace('\\040', ' ')
+                prefix = mount_point.rstrip('/') + '/'
+                if (path == mount_point or path.startswith(prefix)) and len(mount_point) >= len(best):
+                    best, best_type = mount_point, fields[2]
+    except OSError:
+        return None
+    return best_type
+
+
+class FrameStore:
+    """Directory of published frames with atomic updates, a bounded ring and an exclusive render lock.
+
+    Every file is written to a temporary name and renamed into place, so readers such as feh
+    never see a partial frame. ``publish`` stores the frame as ``frame_<timestamp>.<ext>`` and
+    hard-links it to ``current_frame.<ext>`` (a regular file, never a symlink), then prunes
+    the ring to the newest ``keep`` frames; with ``keep=0`` the frame is written straight to
+    ``current_frame``. ``next_frame`` is the staging buffer for render-ahead. Encoding and
+    making a frame current are timed as the ``encode`` and ``publish`` spans.
+    """
+
+    def __init__(self, directory, encoder=None, keep=2, spans=None):
+        self.directory = directory
+        self.encoder = encoder or FrameEncoder()
+        self.keep = keep
+        self.spans = spans or SpanRecorder()
+        self.current_path = self.path('current_frame')
+        self.next_path = self.path('next_frame')
+        self._lock_file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, stem):
+        """Path of a frame file with the encoder's extension."""
+        return os.path.join(self.directory, self.encoder.filename(stem))
+
+    def acquire(self):
+        """Take the exclusive store lock without waiting (kept until release or process exit)."""
+        if self._lock_file is not None:
+            return
+        lock_file = open(os.path.join(self.directory, LOCK_NAME), 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.seek(0)
+            holder = lock_file.read().strip() or 'unknown'
+            lock_file.close()
+            raise FrameStoreLocked(f"{self.directory} is locked by another renderer (pid {holder})")
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+        self._lock_file = lock_file
+
+    def release(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def stage(self, frame, stem='next_frame'):
+        """Write a frame under a fixed name (atomically) without making it current."""
+        return self._encode(frame, self.path(stem))
+
+    def publish(self, frame, instant=None):
+        """Write a frame and make it the current one; returns the current frame path."""
+        if self.keep <= 0:
+            return self._encode(frame, self.current_path)
+        ring_path = self._encode(frame, self._ring_path(instant))
+        with self.spans.span('publish'):
+            return self._make_current(ring_path)
+
+    def promote(self, staged_path, instant=None):
+        """Make a staged file (e.g. next_frame) current by renaming it, without re-encoding."""
+        with self.spans.span('publish', promoted=True):
+            if self.keep <= 0:
+                os.replace(staged_path, self.current_path)
+                return self.current_path
+            ring_path = self._ring_path(instant)
+            os.replace(staged_path, ring_path)
+            return self._make_current(ring_path)
+
+    def _encode(self, frame, path):
+        with self.spans.span('encode', format=self.encoder.output_format):
+            return self.encoder.save(frame, path)
+
+    def _ring_path(self, instant):
+        instant = (instant or datetime.now()).astimezone()
+        return self.path(f"frame_{instant:%Y%m%d_%H%M%S}")
+
+    def _make_current(self, ring_path):
+        """Point current_frame at a ring entry by hard link and rename, then prune the ring."""
+        tmp_path = f"{self.current_path}.{os.getpid()}.tmp"
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        os.link(ring_path, tmp_path)
+        os.replace(tmp_path, self.current_path)
+        self.prune()
+        return self.current_path
+
+    def ring(self):
+        """Ring entries, oldest first."""
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if RING_PATTERN.match(name)
+        )
+
+    def prune(self):
+        """Delete ring entries beyond the newest keep frames."""
+        entries = self.ring()
+        stale = entries[:max(len(entries) - self.keep, 0)]
+        for path in stale:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        if stale:
+            logging.info(f"Pruned {len(stale)} old frame(s) from {self.directory}")
+        return stale
+
+    def footprint(self):
+        """Bytes actually allocated by files in the store (hard links counted once) and where they live."""
+        seen = set()
+        allocated = 0
+        files = 0
+        for name in os.listdir(self.directory):
+            try:
+                st = os.lstat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            files += 1
+            if (st.st_dev, st.st_ino) in seen:
+                continue
+            seen.add((st.st_dev, st.st_ino))
+            allocated += st.st_blocks * 512
+        fs = os.statvfs(self.directory)
+        return {
+            'directory': self.directory,
+            'filesystem': filesystem_type(self.directory),
+            'files': files,
+            'ring_frames': len(self.ring()),
+            'keep': self.keep,
+            'bytes': allocated,
+            'available_bytes': fs.f_bavail * fs.f_frsize,
+        }
+
+    def describe_footprint(self):
+        """One-line footprint summary for logs."""
+        info = self.footprint()
+        return (f"{info['directory']} ({info['filesystem'] or 'unknown fs'}): {info['files']} files, "
+                f"{info['ring_frames']}/{info['keep']} ring frames, {info['bytes'] / 1e6:.1f} MB used, "
+                f"{info['available_bytes'] / 1e6:.0f} MB free")
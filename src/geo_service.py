@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import gzip
+import json
+import time
+import bisect
+import signal
+import socket
+import logging
+import argparse
+import threading
+import ipaddress
+from array import array
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8766
+DEFAULT_CACHE_ENTRIES = 10000
+DEFAULT_TTL = 3600
+
+
+def _parse_ip(text):
+    """(version, integer value) of an address; much faster than ipaddress for millions of rows."""
+    text = text.strip()
+    if ':' in text:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, text), 'big')
+    return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, text), 'big')
+
+
+class RangeDatabase:
+    """IP ranges mapped to locations, loaded from a CSV (optionally gzipped) file.
+
+    Two layouts are read, told apart by the number of columns:
+
+    - ``start,end,country,region,city,latitude,longitude``
+    - ``start,end,continent,country,region,city,latitude,longitude``, the DB-IP "IP to
+      City Lite" CSV (https://db-ip.com/db/download/ip-to-city-lite, CC BY 4.0)
+
+    Rows may be IPv4 or IPv6 and in any order; a header row and ``#`` comments are
+    skipped. Lookups are a binary search over the range starts of the address family.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # version -> (range starts, range ends, location indices), sorted by start
+        self.tables = {4: (array('I'), array('I'), array('I')), 6: ([], [], array('I'))}
+        self.locations = []
+        self.ranges = 0
+        started = time.perf_counter()
+        self._load()
+        logging.info(f"Loaded {self.ranges} IP ranges ({len(self.locations)} locations) from {path} "
+                     f"in {time.perf_counter() - started:.1f}s")
+
+    def _load(self):
+        opener = gzip.open if self.path.endswith('.gz') else open
+        interned = {}
+        ordered = {4: True, 6: True}
+        first = True
+        with opener(self.path, 'rt', newline='', encoding='utf-8') as f:
+            for number, row in enumerate(csv.reader(f), 1):
+                if not row or row[0].startswith('#'):
+                    continue
+                if len(row) not in (7, 8):
+                    raise ValueError(f"{self.path}:{number}: expected 7 or 8 columns, got {len(row)}")
+                try:
+                    version, start = _parse_ip(row[0])
+                    end_version, end = _parse_ip(row[1])
+                    latitude, longitude = float(row[-2]), float(row[-1])
+                except (OSError, ValueError):
+                    if first:
+                        first = False
+                        continue  # header
+                    raise ValueError(f"{self.path}:{number}: bad row {row!r}")
+                first = False
+                if version != end_version or start > end:
+                    raise ValueError(f"{self.path}:{number}: bad range {row[0]} - {row[1]}")
+                location = (row[-5].strip(), row[-4].strip(), row[-3].strip(), latitude, longitude)
+                index = interned.get(location)
+                if index is None:
+                    index = interned[location] = len(self.locations)
+                    self.locations.append(location)
+                starts, ends, indices = self.tables[version]
+                if starts and start < starts[-1]:
+                    ordered[version] = False
+                starts.append(start)
+                ends.append(end)
+                indices.append(index)
+        for version, (starts, ends, indices) in self.tables.items():
+            if not ordered[version]:
+                # Published databases are sorted already; only shuffled files pay for this
+                order = sorted(range(len(starts)), key=starts.__getitem__)
+                for column in (starts, ends, indices):
+                    reordered = [column[i] for i in order]
+                    column[:] = array(column.typecode, reordered) if isinstance(column, array) else reordered
+            self.ranges += len(starts)
+
+    def lookup(self, address):
+        """(country, region, city, latitude, longitude) for an ip_address, or None."""
+        starts, ends, indices = self.tables[address.version]
+        value = int(address)
+        position = bisect.bisect_right(starts, value) - 1
+        if position >= 0 and value <= ends[position]:
+            return self.locations[indices[position]]
+        return None
+
+
+class LookupCache:
+    """LRU cache of encoded answers whose entries also expire ttl seconds after they were stored."""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires monotonic, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class GeoService:
+    """Answer IP geolocation queries from a RangeDatabase in the ipwho.is JSON shape.
+
+    The answers are what ``parseIpWho`` in web/js/geo.js reads: ``success`` plus
+    ``latitude``, ``longitude``, ``city``, ``region`` and ``country``, or ``success: false``
+    with a ``message``. Encoded answers are kept in a LookupCache.
+    """
+
+    def __init__(self, database_path, cache=None):
+        self.database_path = database_path
+        self.database = RangeDatabase(database_path)
+        self.cache = cache or LookupCache()
+        self._reload_lock = threading.Lock()
+
+    def reload(self):
+        """Re-read the database file (e.g. after a monthly DB-IP update) and drop cached answers."""
+        with self._reload_lock:
+            self.database = RangeDatabase(self.database_path)
+            self.cache.clear()
+
+    def answer(self, ip):
+        """The ipwho.is-style dict for an address string."""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return {'ip': ip, 'success': False, 'message': 'Invalid IP address'}
+        if address.version == 6 and address.ipv4_mapped is not None:
+            # Dual-stack listeners report IPv4 clients as ::ffff:a.b.c.d
+            address = address.ipv4_mapped
+        result = {'ip': str(address), 'success': True, 'type': f"IPv{address.version}"}
+        location = self.database.lookup(address)
+        if location is None:
+            result['success'] = False
+            result['message'] = 'IP address not found' if address.is_global else 'Reserved range'
+            return result
+        country, region, city, latitude, longitude = location
+        result.update({
+            'country': country,
+            'country_code': country if len(country) == 2 else '',
+            'region': region,
+            'city': city,
+            'latitude': latitude,
+            'longitude': longitude,
+        })
+        return result
+
+    def encoded(self, ip):
+        """The answer for ip as JSON bytes, from the cache when possible."""
+        body = self.cache.get(ip)
+        if body is None:
+            body = json.dumps(self.answer(ip)).encode('utf-8')
+            self.cache.put(ip, body)
+        return body
+
+
+class _GeoHandler(BaseHTTPRequestHandler):
+    """GET / (the client's own address) or /<ip>, like ipwho.is."""
+
+    server_version = 'RandallClockGeo'
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        service = self.server.service
+        path = self.path.split('?', 1)[0].strip('/')
+        ip = path.rsplit('/', 1)[-1] if path else self._client_ip()
+        if path and ip in ('geo', 'json'):
+            ip = self._client_ip()
+        body = service.encoded(ip)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        # The answer depends on who asks, so only the viewer's own browser may reuse it
+        self.send_header('Cache-Control', f"private, max-age={service.cache.ttl}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _client_ip(self):
+        if self.server.trust_proxy:
+            # nginx sets X-Real-IP to $remote_addr; X-Forwarded-For's last entry is the nearest proxy's peer
+            forwarded = self.headers.get('X-Real-IP') or self.headers.get('X-Forwarded-For', '').split(',')[-1]
+            if forwarded.strip():
+                return forwarded.strip()
+        return self.client_address[0]
+
+    def log_message(self, format, *args):
+        logging.debug(f"HTTP {self.address_string()} {format % args}")
+
+
+class GeoHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, trust_proxy=False):
+        super().__init__(address, _GeoHandler)
+        self.service = service
+        self.trust_proxy = trust_proxy
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local IP geolocation service for the web clock (stands in for the ipwho.is proxy)')
+    parser.add_argument('--database', required=True, help='IP range CSV (.csv or .csv.gz), e.g. the DB-IP IP to City Lite download')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--cache-entries', type=int, default=DEFAULT_CACHE_ENTRIES, help=f'Answers kept in the LRU cache (default: {DEFAULT_CACHE_ENTRIES})')
+    parser.add_argument('--ttl', type=int, default=DEFAULT_TTL, help=f'Seconds a cached answer stays valid, also sent as max-age (default: {DEFAULT_TTL})')
+    parser.add_argument('--trust-proxy', action='store_true', help='Take the client address from X-Real-IP / X-Forwarded-For (set this behind nginx or Apache)')
+    parser.add_argument('--lookup', metavar='IP', action='append', help='Print the answer for IP and exit (repeatable); no server is started')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    service = GeoService(args.database, LookupCache(args.cache_entries, args.ttl))
+    if args.lookup:
+        for ip in args.lookup:
+            print(service.encoded(ip).decode('utf-8'))
+        return
+
+    server = GeoHTTPServer((args.host, args.port), service, trust_proxy=args.trust_proxy)
+    signal.signal(signal.SIGHUP, lambda *_: threading.Thread(target=service.reload, daemon=True).start())
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    logging.info(f"Geo service listening on http://{args.host}:{args.port}/ (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logging.info(f"Geo service stopped (cache {service.cache.stats()})")
+
+
+if __name__ == "__main__":
+    main()
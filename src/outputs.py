@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import math
+import hashlib
+import logging
+import numpy as np
+from PIL import Image
+from datetime import datetime, timedelta
+from compositor import FrameCompositor
+from frame_cache import file_digest
+from frame_store import FrameStore
+from rotation import create_rotation_engine
+
+# How a frame is fitted to an output, named after the feh modes they replace
+LETTERBOX_POLICIES = {
+    'fit': min,     # --bg-max: whole frame visible, black bars on the short axis
+    'fill': max,    # --bg-fill: cover the output, crop the long axis
+    'center': None, # --bg-center: no scaling, centered and cropped or padded
+}
+DEFAULT_PYRAMID_DIR = os.path.expanduser('~/.cache/randall-clock/pyramid')
+OUTPUT_SPEC = re.compile(r'^(?:(?P<name>[\w.-]+)=)?(?P<width>\d+)x(?P<height>\d+)(?::(?P<policy>\w+))?$')
+
+
+class OutputTarget:
+    """One monitor (or kiosk) the clock is rendered for: native size and letterbox policy."""
+
+    def __init__(self, width, height, policy='fit', name=None):
+        if policy not in LETTERBOX_POLICIES:
+            raise ValueError(f"Unknown letterbox policy {policy!r}, expected one of {', '.join(LETTERBOX_POLICIES)}")
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Output size must be positive, got {width}x{height}")
+        self.width = width
+        self.height = height
+        self.policy = policy
+        self.name = name or f"{width}x{height}"
+
+    def __repr__(self):
+        return f"{self.name}={self.width}x{self.height}:{self.policy}"
+
+    def placement(self, image_size):
+        """Rectangle (x, y, width, height) the scaled frame covers on this output; may extend past its edges."""
+        choose = LETTERBOX_POLICIES[self.policy]
+        scale = 1.0 if choose is None else choose(self.width / image_size[0], self.height / image_size[1])
+        width = max(int(round(image_size[0] * scale)), 1)
+        height = max(int(round(image_size[1] * scale)), 1)
+        return ((self.width - width) // 2, (self.height - height) // 2, width, height)
+
+
+def parse_outputs(spec):
+    """Parse ``[name=]WIDTHxHEIGHT[:policy]`` entries separated by commas, e.g. ``left=1920x1080:fit,3840x2160``."""
+    targets = []
+    for entry in spec.split(','):
+        match = OUTPUT_SPEC.match(entry.strip())
+        if not match:
+            raise ValueError(f"Bad output {entry!r}, expected [name=]WIDTHxHEIGHT[:{'|'.join(LETTERBOX_POLICIES)}]")
+        targets.append(OutputTarget(int(match['width']), int(match['height']), match['policy'] or 'fit', match['name']))
+    names = [target.name for target in targets]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Output names must be unique, got {', '.join(names)}; name them like left=1920x1080")
+    return targets
+
+
+def array_digest(image):
+    """SHA-256 of an image's pixels and size, for assets that only exist in memory."""
+    digest = hashlib.sha256(f"{image.mode}{image.size}".encode('utf-8'))
+    digest.update(np.ascontiguousarray(np.asarray(image)).data)
+    return digest.hexdigest()
+
+
+class AssetPyramid:
+    """Disk cache of assets prescaled to every size an output needs.
+
+    Each level is the asset resized once with LANCZOS and stored as raw RGBA ``.npy`` named
+    after the asset's content digest and the level size, so later runs load it in
+    milliseconds instead of decoding and resampling the full-size PNG again.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_PYRAMID_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def level(self, digest, load, size):
+        """The asset (digest, loaded on demand by calling load()) at size, as an RGBA uint8 array."""
+        path = os.path.join(self.cache_dir, f"{digest[:16]}_{size[0]}x{size[1]}.npy")
+        try:
+            return np.load(path)
+        except (FileNotFoundError, ValueError):
+            pass
+        scaled = np.asarray(load().convert('RGBA').resize(size, Image.LANCZOS))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, scaled)
+        os.replace(tmp_path, path)
+        logging.info(f"Cached {size[0]}x{size[1]} pyramid level {path}")
+        return scaled
+
+
+def _place(canvas, source, x, y):
+    """Copy source into canvas with its top-left corner at (x, y), clipped to the canvas."""
+    height, width = canvas.shape[:2]
+    left, top = max(x, 0), max(y, 0)
+    right, bottom = min(x + source.shape[1], width), min(y + source.shape[0], height)
+    if left < right and top < bottom:
+        canvas[top:bottom, left:right] = source[top - y:bottom - y, left - x:right - x]
+
+
+class MultiOutputRenderer:
+    """Render the clock for several outputs at their native sizes from one rotation per tick.
+
+    The globe is rotated once, at the largest size any output needs. Each output then
+    resamples only the rotated globe box to its own scale and composites it into its own
+    preallocated canvas, which holds the prescaled overlay letterboxed for that output.
+    ``render_at`` returns one frame per target, in order. Like BlackModeGenerator, the
+    frames share their canvases with the next render.
+    """
+
+    def __init__(self, generator, targets, pyramid=None):
+        self.generator = generator
+        self.targets = targets
+        self.output = generator.output
+        self.spans = generator.spans
+        # Outputs never use the frame cache; black_mode.py rejects --cache-dir with --outputs
+        self.frame_cache = None
+        pyramid = pyramid or AssetPyramid()
+        size = generator.globe.size
+        self.placements = [target.placement(size) for target in targets]
+
+        # Rotate once, at the largest scale any output needs
+        largest = max(self.placements, key=lambda rect: rect[2] * rect[3])
+        self.rotation_size = largest[2:]
+        if self.rotation_size == size:
+            self.rotation_engine = generator.rotation_engine
+        else:
+            globe_only = generator.globe_only()
+            scaled = pyramid.level(array_digest(globe_only), lambda: globe_only, self.rotation_size)
+            center = (size[0] // 2 * self.rotation_size[0] / size[0], size[1] // 2 * self.rotation_size[1] / size[1])
+            self.rotation_engine = create_rotation_engine(
+                generator.rotation_engine_name, Image.fromarray(scaled, 'RGBA'), center)
+
+        overlay_digest = getattr(generator, 'overlay_hash', None) or file_digest(generator.overlay_path)
+        self.compositors = [
+            self._build_output(target, rect, pyramid.level(overlay_digest, lambda: Image.open(generator.overlay_path), rect[2:]))
+            for target, rect in zip(targets, self.placements)
+        ]
+        logging.info(f"Rendering {len(targets)} outputs ({', '.join(map(repr, targets))}) "
+                     f"from one {self.rotation_size[0]}x{self.rotation_size[1]} rotation")
+
+    def _build_output(self, target, rect, overlay):
+        """Static canvas and compositor for one output: the letterboxed overlay, cleared inside the globe mask."""
+        x, y, width, height = rect
+        mask = np.asarray(self.generator.globe_mask.resize((width, height), Image.BILINEAR)) > 0
+        canvas_mask = np.zeros((target.height, target.width), dtype=bool)
+        _place(canvas_mask, mask, x, y)
+        static = np.zeros((target.height, target.width, 4), dtype=np.uint8)
+        _place(static, overlay, x, y)
+        static[canvas_mask] = 0
+        vertical_offset = int(round(self.generator.vertical_offset * height / self.generator.globe.height))
+        return FrameCompositor(static, canvas_mask, vertical_offset)
+
+    def calculate_rotation(self, instant=None):
+        return self.generator.calculate_rotation(instant)
+
+    def render_at(self, instant):
+        """Render every output for an instant; returns the frames in target order."""
+        rotation = self.generator.calculate_rotation(instant)
+        with self.spans.span('rotate', size=f"{self.rotation_size[0]}x{self.rotation_size[1]}"):
+            rotated = self.rotation_engine.rotate_array(rotation)
+        rotated_image = None
+        left, top, right, bottom = self.rotation_engine.box
+        frames = []
+        for target, (x, y, width, height), compositor in zip(self.targets, self.placements, self.compositors):
+            with self.spans.span('composite', output=target.name):
+                if (width, height) == self.rotation_size:
+                    frames.append(compositor.compose(rotated, (left + x, top + y, right + x, bottom + y)))
+                    continue
+                # Resample only the globe box, snapped inward to whole output pixels
+                rx, ry = width / self.rotation_size[0], height / self.rotation_size[1]
+                box = (math.ceil(left * rx), math.ceil(top * ry), math.floor(right * rx), math.floor(bottom * ry))
+                source_box = (box[0] / rx - left, box[1] / ry - top, box[2] / rx - left, box[3] / ry - top)
+                if rotated_image is None:
+                    rotated_image = Image.fromarray(rotated, 'RGBA')
+                patch = rotated_image.resize((box[2] - box[0], box[3] - box[1]), Image.BILINEAR, box=source_box)
+                frames.append(compositor.compose(np.asarray(patch), (box[0] + x, box[1] + y, box[2] + x, box[3] + y)))
+        return frames
+
+    def generate_next_frame(self, update_interval, frame_store):
+        """Publish every output's frame for the current interval boundary and stage the next ones."""
+        now = datetime.now().astimezone()
+        aligned_time = now.replace(minute=(now.minute // update_interval) * update_interval, second=0, microsecond=0)
+        current_paths = frame_store.publish(self.render_at(aligned_time), aligned_time)
+        next_paths = frame_store.stage(self.render_at(aligned_time + timedelta(minutes=update_interval)))
+        logging.info(f"Saved current frames (aligned to {aligned_time}) to {', '.join(current_paths)}")
+        return current_paths, next_paths
+
+
+class OutputFrameStores:
+    """FrameStore interface over one store per output under ``<directory>/outputs/<name>``.
+
+    Frames and paths are lists in target order. Locking goes through the main store, so a
+    multi-output render excludes every other renderer on the same temp dir.
+    """
+
+    def __init__(self, lock_store, targets, keep=2):
+        self.lock_store = lock_store
+        self.encoder = lock_store.encoder
+        self.spans = lock_store.spans
+        self.stores = [
+            FrameStore(os.path.join(lock_store.directory, 'outputs', target.name), lock_store.encoder, keep, lock_store.spans)
+            for target in targets
+        ]
+        self.current_path = [store.current_path for store in self.stores]
+        self.next_path = [store.next_path for store in self.stores]
+
+    def acquire(self):
+        self.lock_store.acquire()
+
+    def release(self):
+        self.lock_store.release()
+
+    def stage(self, frames):
+        return [store.stage(frame) for store, frame in zip(self.stores, frames)]
+
+    def publish(self, frames, instant=None):
+        return [store.publish(frame, instant) for store, frame in zip(self.stores, frames)]
+
+    def promote(self, staged_paths, instant=None):
+        return [store.promote(path, instant) for store, path in zip(self.stores, staged_paths)]
+
+    def footprint(self):
+        return {'outputs': [store.footprint() for store in self.stores]}
+
+    def describe_footprint(self):
+        return '; '.join(store.describe_footprint() for store in self.stores)
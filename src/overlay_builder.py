@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import logging
+import tempfile
+import numpy as np
+from PIL import Image
+from frame_store import filesystem_type
+
+# A pixel belongs to the globe when its RGB differs from the overlay by more than this (sum of abs diffs)
+MASK_THRESHOLD = 30
+# The scratch file holds every decoded frame (about 1.5 GB for 96 keyframes), so it must be on disk:
+# the system temp dir is often tmpfs, i.e. RAM
+DEFAULT_SCRATCH_DIR = os.path.expanduser('~/.cache/randall-clock/scratch')
+
+
+def kth_smallest(stack, k, counts=None):
+    """Exact k-th smallest (0-based) uint8 value along axis 0 of an (N, M) stack.
+
+    Builds the answer one bit at a time from the top: a bit is set when fewer than k + 1
+    values lie below the candidate. Eight counting passes over the stack, no sort and no
+    float promotion.
+    """
+    result = np.zeros(stack.shape[1], dtype=np.uint8)
+    candidate = np.empty_like(result)
+    below = np.empty(stack.shape[1], dtype=bool)
+    if counts is None:
+        counts = np.empty(stack.shape[1], dtype=np.uint16)
+    for bit in range(7, -1, -1):
+        np.bitwise_or(result, 1 << bit, out=candidate)
+        counts[...] = 0
+        for values in stack:
+            np.less(values, candidate, out=below)
+            counts += below
+        np.copyto(result, candidate, where=counts <= k)
+    return result
+
+
+def median_uint8(stack):
+    """Per-column median of an (N, M) uint8 stack, matching np.median(...).astype(np.uint8).
+
+    For even N that is the floor of the mean of the two middle values.
+    """
+    n = stack.shape[0]
+    counts = np.empty(stack.shape[1], dtype=np.uint16)
+    k = (n - 1) // 2
+    lower = kth_smallest(stack, k, counts)
+    if n % 2:
+        return lower
+    # The next order statistic is lower itself if it occurs often enough, else the smallest larger value
+    counts[...] = 0
+    upper = np.full_like(lower, 255)
+    for values in stack:
+        counts += values <= lower
+        np.minimum(upper, np.where(values > lower, values, 255).astype(np.uint8), out=upper)
+    upper = np.where(counts >= k + 2, lower, upper)
+    return ((lower.astype(np.uint16) + upper) >> 1).astype(np.uint8)
+
+
+def scratch_directory(scratch_dir=None):
+    """Create and return the scratch directory, warning when it is memory-backed."""
+    scratch_dir = scratch_dir or DEFAULT_SCRATCH_DIR
+    os.makedirs(scratch_dir, exist_ok=True)
+    fs_type = filesystem_type(scratch_dir)
+    if fs_type in ('tmpfs', 'ramfs'):
+        message = (f"Scratch directory {scratch_dir} is on {fs_type}, so the decoded frames "
+                   f"will be held in RAM; pass a disk-backed --scratch-dir to keep memory bounded")
+        logging.warning(message)
+        print(f"Warning: {message}", flush=True)
+    return scratch_dir
+
+
+def build_overlay_and_masks(frame_paths, mask_paths=None, overlay=None, tile_mb=256, scratch_dir=None,
+                            threshold=MASK_THRESHOLD):
+    """Compute the stationary overlay (per-pixel median) and the frames' globe masks in one streaming pass.
+
+    Every frame is decoded exactly once into a scratch file under scratch_dir (default
+    DEFAULT_SCRATCH_DIR, on disk), then the median
+    and all masks are computed in row tiles sized so that a tile of every frame plus the
+    working buffers fits in tile_mb. Pass an existing overlay (RGBA image) to only build
+    masks. mask_paths lines up with frame_paths; None entries are not written. Returns the
+    overlay image.
+    """
+    started = time.perf_counter()
+    n = len(frame_paths)
+    if n == 0:
+        raise ValueError("No frames to build from")
+    mask_paths = mask_paths or [None] * n
+    want_masks = any(mask_paths)
+    with Image.open(frame_paths[0]) as first:
+        width, height = first.size
+
+    frame_bytes = height * width * 4
+    row_bytes = width * 4
+    with tempfile.TemporaryDirectory(prefix='randall-masks-', dir=scratch_directory(scratch_dir)) as scratch:
+        # Plain file I/O rather than a memmap, so scratch pages stay in the page cache and out of our RSS
+        frames_fd = os.open(os.path.join(scratch, 'frames.u8'), os.O_RDWR | os.O_CREAT, 0o600)
+        masks_fd = os.open(os.path.join(scratch, 'masks.u8'), os.O_RDWR | os.O_CREAT, 0o600) if want_masks else None
+        try:
+            for i, path in enumerate(frame_paths):
+                image = Image.open(path).convert('RGBA')
+                if image.size != (width, height):
+                    raise ValueError(f"{path} is {image.size[0]}x{image.size[1]}, expected {width}x{height}")
+                os.pwrite(frames_fd, np.asarray(image).data, i * frame_bytes)
+                del image
+                print(f"Decoded {i + 1}/{n}: {os.path.basename(path)}", flush=True)
+
+            if overlay is None:
+                reference = np.empty((height, width, 4), dtype=np.uint8)
+            else:
+                reference = np.asarray(overlay.convert('RGBA'))
+
+            # A tile row holds n RGBA frame rows; the median and masks need about 16 more row-sized buffers
+            tile_rows = max(1, min(height, (tile_mb * 1024 * 1024) // ((n + 16) * row_bytes)))
+            print(f"Processing {height} rows in tiles of {tile_rows} ({tile_mb} MB budget)", flush=True)
+            tile_buffer = np.empty((n, tile_rows, width, 4), dtype=np.uint8)
+            for top in range(0, height, tile_rows):
+                bottom = min(top + tile_rows, height)
+                tile = tile_buffer[:, :bottom - top]
+                for i in range(n):
+                    os.preadv(frames_fd, [tile[i].data], i * frame_bytes + top * row_bytes)
+                if overlay is None:
+                    reference[top:bottom] = median_uint8(tile.reshape(n, -1)).reshape(bottom - top, width, 4)
+                if masks_fd is not None:
+                    reference_rgb = reference[top:bottom, :, :3].astype(np.int16)
+                    for i in range(n):
+                        diff = np.abs(tile[i, ..., :3].astype(np.int16) - reference_rgb).sum(axis=2)
+                        mask = (diff > threshold).astype(np.uint8) * 255
+                        os.pwrite(masks_fd, mask.data, i * height * width + top * width)
+                logging.info(f"Processed rows {top}-{bottom} of {height}")
+            del tile_buffer, tile
+
+            mask = np.empty((height, width), dtype=np.uint8)
+            for i, mask_path in enumerate(mask_paths):
+                if mask_path is None:
+                    continue
+                os.preadv(masks_fd, [mask.data], i * height * width)
+                os.makedirs(os.path.dirname(mask_path) or '.', exist_ok=True)
+                Image.fromarray(mask, 'L').save(mask_path)
+                print(f"Saved globe mask for {os.path.basename(frame_paths[i])} as {mask_path}", flush=True)
+        finally:
+            os.close(frames_fd)
+            if masks_fd is not None:
+                os.close(masks_fd)
+
+    print(f"Built overlay and masks from {n} frames in {time.perf_counter() - started:.1f}s", flush=True)
+    return Image.fromarray(reference, 'RGBA') if overlay is None else overlay
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import re
+
+# A small built-in gazetteer (name -> lat, lon) for snapping typed places without a network lookup
+PLACES = {
+    'anchorage': (61.22, -149.90),
+    'auckland': (-36.85, 174.76),
+    'bangkok': (13.76, 100.50),
+    'beijing': (39.90, 116.41),
+    'berlin': (52.52, 13.40),
+    'boston': (42.36, -71.06),
+    'buenos aires': (-34.60, -58.38),
+    'burlington vt': (44.48, -73.21),
+    'cairo': (30.04, 31.24),
+    'cape town': (-33.93, 18.42),
+    'chicago': (41.88, -87.63),
+    'delhi': (28.61, 77.21),
+    'denver': (39.74, -104.99),
+    'dubai': (25.20, 55.27),
+    'honolulu': (21.31, -157.86),
+    'istanbul': (41.01, 28.98),
+    'jakarta': (-6.21, 106.85),
+    'johannesburg': (-26.20, 28.05),
+    'lagos': (6.52, 3.38),
+    'lima': (-12.05, -77.04),
+    'london': (51.51, -0.13),
+    'los angeles': (34.05, -118.24),
+    'madrid': (40.42, -3.70),
+    'mexico city': (19.43, -99.13),
+    'montpelier vt': (44.26, -72.58),
+    'moscow': (55.76, 37.62),
+    'mumbai': (19.08, 72.88),
+    'nairobi': (-1.29, 36.82),
+    'new york': (40.71, -74.01),
+    'paris': (48.86, 2.35),
+    'reykjavik': (64.15, -21.94),
+    'rome': (41.90, 12.50),
+    'san francisco': (37.77, -122.42),
+    'santiago': (-33.45, -70.67),
+    'sao paulo': (-23.55, -46.63),
+    'seattle': (47.61, -122.33),
+    'seoul': (37.57, 126.98),
+    'singapore': (1.35, 103.82),
+    'sydney': (-33.87, 151.21),
+    'tokyo': (35.68, 139.65),
+    'toronto': (43.65, -79.38),
+    'vancouver': (49.28, -123.12),
+}
+
+COORDINATE_PATTERN = re.compile(r'^\s*([-+]?\d+(?:\.\d+)?)\s*[, ]\s*([-+]?\d+(?:\.\d+)?)\s*$')
+
+
+def resolve_place(text, extra_places=None):
+    """Turn ``"lat, lon"`` or a place name into (label, lat, lon).
+
+    Names are matched case-insensitively against extra_places (e.g. the [LOCATIONS]
+    entries) first, then the built-in PLACES; a unique prefix is accepted. Raises
+    ValueError when nothing or more than one place matches.
+    """
+    match = COORDINATE_PATTERN.match(text)
+    if match:
+        lat, lon = float(match.group(1)), float(match.group(2))
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Coordinates out of range: {text!r}")
+        return f"{lat:.4f}, {lon:.4f}", lat, lon
+    places = dict(PLACES)
+    places.update({name.lower(): coords for name, coords in (extra_places or {}).items()})
+    key = ' '.join(text.lower().split())
+    if key in places:
+        return key, places[key][0], places[key][1]
+    candidates = sorted(name for name in places if name.startswith(key))
+    if len(candidates) == 1:
+        return candidates[0], places[candidates[0]][0], places[candidates[0]][1]
+    if candidates:
+        raise ValueError(f"{text!r} is ambiguous: {', '.join(candidates)}")
+    raise ValueError(f"Unknown place {text!r}; give 'lat, lon' or one of: {', '.join(sorted(places))}")
+
+
+def format_lat_lon(lat, lon):
+    """Human-readable lat/lon, or a note for pixels off the globe (NaN)."""
+    if lat != lat:
+        return "off the globe"
+    return f"lat={lat:.2f}, lon={lon:.2f}"
+
+
+def snap_place(inverse, text, extra_places=None):
+    """Resolve text with resolve_place and snap it to the nearest globe pixel.
+
+    inverse is a projection.InverseProjection; returns (label, lat, lon, x, y, pixel_lat,
+    pixel_lon) where the last two are what the table says lies under the chosen pixel.
+    """
+    label, lat, lon = resolve_place(text, extra_places)
+    px, py = inverse.geometry.project(lat, lon)
+    x, y = int(round(float(px))), int(round(float(py)))
+    pixel_lat, pixel_lon = (float(v) for v in inverse.lookup(x, y))
+    return label, lat, lon, x, y, pixel_lat, pixel_lon
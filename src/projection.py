@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import math
+import logging
+import numpy as np
+from PIL import Image
+from frame_cache import config_digest
+
+# Port of web/js/projection.js: south-pole azimuthal equidistant projection of the globe artwork.
+# Prime meridian orientation in the static base_globe artwork (degrees)
+GLOBE_LON0 = 15
+# Geographic radius of the visible globe disk in full-frame artwork (pixels)
+FULL_FRAME_GLOBE_RADIUS = 491
+# Where inverse projection tables are cached, one file per globe geometry and image size
+DEFAULT_TABLE_DIR = os.path.expanduser('~/.cache/randall-clock/projection')
+# Bumped whenever the table layout or the inverse math changes
+TABLE_VERSION = 1
+
+
+class GlobeGeometry:
+    """Where the globe sits in its image: disk center, geographic radius and meridian offset."""
+
+    def __init__(self, center_x, center_y, radius, lon0=GLOBE_LON0):
+        self.center_x = center_x
+        self.center_y = center_y
+        self.radius = radius
+        self.lon0 = lon0
+
+    @classmethod
+    def from_image(cls, image, lon0=GLOBE_LON0):
+        """Measure the geometry from an RGBA globe image, as globeGeometryFromImage does on the web."""
+        alpha = np.asarray(image.getchannel('A'))
+        center_x, center_y = detect_globe_center(alpha)
+        return cls(center_x, center_y, detect_globe_disk_radius(alpha, center_x, center_y), lon0)
+
+    def __repr__(self):
+        return (f"GlobeGeometry(center_x={self.center_x:.2f}, center_y={self.center_y:.2f}, "
+                f"radius={self.radius}, lon0={self.lon0})")
+
+    def project(self, lat, lon, clamp=True):
+        """Pixel (x, y) arrays for latitude/longitude arrays in degrees (scalars broadcast)."""
+        x, y = lat_lon_to_pixel(lat, lon, self)
+        if clamp:
+            x, y = clamp_to_globe(x, y, self)
+        return x, y
+
+
+def lat_lon_to_pixel(lat, lon, globe):
+    """Vectorized latLonToGlobePixel: float64 (x, y) arrays for any broadcastable lat/lon."""
+    phi = np.radians(np.asarray(lat, dtype=np.float64))
+    lam = np.radians(np.asarray(lon, dtype=np.float64)) - math.radians(globe.lon0)
+    phi0 = -math.pi / 2
+    sin_phi, cos_phi, cos_lam = np.sin(phi), np.cos(phi), np.cos(lam)
+    c = np.arccos(np.clip(math.sin(phi0) * sin_phi + math.cos(phi0) * cos_phi * cos_lam, -1.0, 1.0))
+    rho = globe.radius * c / math.pi
+    theta = np.arctan2(math.cos(phi0) * sin_phi - math.sin(phi0) * cos_phi * cos_lam, cos_phi * np.sin(lam))
+    # The pole itself maps to the center (theta is undefined there)
+    rho = np.where(c < 1e-12, 0.0, rho)
+    return globe.center_x + rho * np.cos(theta), globe.center_y + rho * np.sin(theta)
+
+
+def pixel_to_lat_lon(x, y, globe):
+    """Inverse of lat_lon_to_pixel: float64 (lat, lon) arrays in degrees, NaN outside the disk.
+
+    On the south-pole projection the distance from the center gives the colatitude from the
+    pole and the screen angle gives the longitude: lat = c - 90, lon = lon0 + 90 - theta.
+    """
+    dx = np.asarray(x, dtype=np.float64) - globe.center_x
+    dy = np.asarray(y, dtype=np.float64) - globe.center_y
+    rho = np.hypot(dx, dy)
+    lat = np.degrees(np.pi * rho / globe.radius) - 90.0
+    lon = (globe.lon0 + 90.0 - np.degrees(np.arctan2(dy, dx)) + 180.0) % 360.0 - 180.0
+    outside = rho > globe.radius
+    return np.where(outside, np.nan, lat), np.where(outside, np.nan, lon)
+
+
+def clamp_to_globe(x, y, globe):
+    """Pull points outside the disk radially back onto its edge."""
+    dx = np.asarray(x, dtype=np.float64) - globe.center_x
+    dy = np.asarray(y, dtype=np.float64) - globe.center_y
+    dist = np.hypot(dx, dy)
+    scale = np.where(dist > globe.radius, globe.radius / np.maximum(dist, 1e-12), 1.0)
+    return globe.center_x + dx * scale, globe.center_y + dy * scale
+
+
+def detect_globe_center(alpha):
+    """Centroid of the pixels with non-zero alpha, or the image center if there are none."""
+    ys, xs = np.nonzero(alpha)
+    if not len(xs):
+        return alpha.shape[1] / 2, alpha.shape[0] / 2
+    return float(xs.mean()), float(ys.mean())
+
+
+def detect_globe_disk_radius(alpha, center_x, center_y):
+    """Median extent of the opaque disk along 72 rays; full-frame artwork uses the tuned radius."""
+    height, width = alpha.shape
+    if width >= 1900:
+        return FULL_FRAME_GLOBE_RADIUS
+    max_scan = int(math.ceil(min(center_x, center_y, width - center_x, height - center_y)))
+    r = np.arange(1, max_scan)
+    samples = []
+    for angle in range(0, 360, 5):
+        xs = np.round(center_x + r * math.cos(math.radians(angle))).astype(np.int64)
+        ys = np.round(center_y + r * math.sin(math.radians(angle))).astype(np.int64)
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        if not inside.all():
+            stop = int(np.argmin(inside))
+            xs, ys = xs[:stop], ys[:stop]
+        opaque = alpha[ys, xs] > 0
+        if not opaque.any():
+            continue
+        # Furthest opaque radius seen before each step; the scan stops at the first
+        # transparent pixel once the disk (opaque beyond radius 100) has been crossed
+        seen = np.concatenate(([0], np.maximum.accumulate(np.where(opaque, r[:len(opaque)], 0))))
+        ends = np.nonzero(~opaque & (seen[:-1] > 100))[0]
+        last_opaque = int(seen[ends[0]] if len(ends) else seen[-1])
+        if last_opaque > 0:
+            samples.append(last_opaque)
+    if not samples:
+        return min(width, height) / 2
+    return sorted(samples)[len(samples) // 2]
+
+
+class InverseProjection:
+    """Per-pixel (lat, lon) table for one globe geometry, memory-mapped from a disk cache.
+
+    The table is a float32 ``(height, width, 2)`` .npy file named after a digest of the
+    geometry and image size, so it is built once and every later lookup of a pixel is a
+    single indexed read. Pixels off the disk hold NaN.
+    """
+
+    def __init__(self, geometry, size, cache_dir=DEFAULT_TABLE_DIR):
+        self.geometry = geometry
+        self.width, self.height = size
+        self.key = config_digest(
+            center_x=round(geometry.center_x, 4),
+            center_y=round(geometry.center_y, 4),
+            radius=geometry.radius,
+            lon0=geometry.lon0,
+            size=[self.width, self.height],
+            version=TABLE_VERSION,
+        )
+        self.path = os.path.join(cache_dir, f"inverse_{self.key}.npy")
+        if not os.path.exists(self.path):
+            self._build(cache_dir)
+        self.table = np.load(self.path, mmap_mode='r')
+
+    @classmethod
+    def for_image(cls, globe_path, cache_dir=DEFAULT_TABLE_DIR, lon0=GLOBE_LON0):
+        """Table for a globe image file, measuring its geometry from the alpha channel."""
+        with Image.open(globe_path) as image:
+            globe = image.convert('RGBA')
+        return cls(GlobeGeometry.from_image(globe, lon0), globe.size, cache_dir)
+
+    def _build(self, cache_dir, rows_per_chunk=256):
+        """Write the table in row chunks to a temporary file and move it into place."""
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        table = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(self.height, self.width, 2))
+        xs = np.arange(self.width, dtype=np.float64)
+        for top in range(0, self.height, rows_per_chunk):
+            ys = np.arange(top, min(top + rows_per_chunk, self.height), dtype=np.float64)[:, None]
+            lat, lon = pixel_to_lat_lon(xs[None, :], ys, self.geometry)
+            table[top:top + len(ys), :, 0] = lat
+            table[top:top + len(ys), :, 1] = lon
+        table.flush()
+        del table
+        os.replace(tmp_path, self.path)
+        logging.info(f"Built inverse projection table {self.path} for {self.geometry}")
+
+    def lookup(self, x, y):
+        """(lat, lon) under integer pixel(s) x, y; NaN off the globe or outside the image."""
+        x = np.asarray(x, dtype=np.int64)
+        y = np.asarray(y, dtype=np.int64)
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        values = self.table[np.where(inside, y, 0), np.where(inside, x, 0)].astype(np.float64)
+        values[~inside] = np.nan
+        return values[..., 0], values[..., 1]
+
+
+def load_locations(config, base_dir='.'):
+    """Read the [LOCATIONS] config section into (names, lats, lons).
+
+    Each entry is ``name = lat, lon`` in degrees. A ``file`` entry names a CSV with
+    ``name,lat,lon`` columns (relative to base_dir) for long lists such as every office.
+    """
+    names, lats, lons = [], [], []
+    if not config.has_section('LOCATIONS'):
+        return names, np.array(lats), np.array(lons)
+    for name, value in config.items('LOCATIONS', raw=True):
+        if name in config.defaults():
+            continue
+        if name == 'file':
+            with open(os.path.join(base_dir, os.path.expanduser(value)), newline='') as f:
+                for row in csv.DictReader(f):
+                    names.append(row['name'])
+                    lats.append(float(row['lat']))
+                    lons.append(float(row['lon']))
+            continue
+        try:
+            lat, lon = (float(part) for part in value.split(','))
+        except ValueError:
+            raise ValueError(f"[LOCATIONS] {name} must be 'lat, lon', got {value!r}")
+        names.append(name)
+        lats.append(lat)
+        lons.append(lon)
+    return names, np.array(lats, dtype=np.float64), np.array(lons, dtype=np.float64)
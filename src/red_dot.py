@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import functools
+import numpy as np
+from PIL import Image
+
+# Glow layers (radius, alpha) drawn from the outside in, as used for the black-mode globe
+GLOW_LAYERS = (
+    (20, 40),   # Outer glow
+    (15, 80),   # Middle glow
+    (10, 120),  # Inner glow
+    (5, 255),   # Core dot
+)
+
+
+class DotSprite:
+    """A precomputed RGBA dot sprite that is blended into images over its bounding box only.
+
+    ``anchor`` is the sprite pixel that lands on the dot coordinates. Stamping composites the
+    sprite onto the part of the target it covers, which gives the same pixels as compositing
+    a full-size transparent layer with the dot drawn on it, without allocating one.
+    """
+
+    def __init__(self, image, anchor):
+        self.image = image.convert('RGBA')
+        self.anchor = anchor
+
+    @classmethod
+    def layered(cls, layers=GLOW_LAYERS, color=(255, 0, 0)):
+        """Concentric flat circles, largest first (the ImageDraw glow used by black_mode)."""
+        # Drawing is only needed to build a sprite, so ImageDraw is not imported with the module
+        from PIL import ImageDraw
+
+        extent = max(radius for radius, _ in layers)
+        size = 2 * extent + 1
+        image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        for radius, alpha in layers:
+            draw.ellipse([extent - radius, extent - radius, extent + radius, extent + radius], fill=color + (alpha,))
+        return cls(image, (extent, extent))
+
+    @classmethod
+    def gaussian(cls, dot_radius=5, sigma=4, glow_opacity=0.8, glow_color=(255, 255, 255), color=(255, 0, 0)):
+        """A Gaussian-blurred glow disc under a solid dot (the ImageMagick ``-blur 0xSIGMA`` look)."""
+        from PIL import ImageDraw, ImageFilter
+
+        extent = dot_radius + int(3 * sigma + 1)
+        size = 2 * extent + 1
+        box = [extent - dot_radius, extent - dot_radius, extent + dot_radius, extent + dot_radius]
+        glow = Image.new('RGBA', (size, size), glow_color + (0,))
+        ImageDraw.Draw(glow).ellipse(box, fill=glow_color + (int(round(255 * glow_opacity)),))
+        glow = glow.filter(ImageFilter.GaussianBlur(sigma))
+        dot = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        ImageDraw.Draw(dot).ellipse(box, fill=color + (255,))
+        return cls(Image.alpha_composite(glow, dot), (extent, extent))
+
+    def bbox(self, x, y):
+        """Target box (left, top, right, bottom) the sprite covers when centred on (x, y)."""
+        left, top = x - self.anchor[0], y - self.anchor[1]
+        return (left, top, left + self.image.width, top + self.image.height)
+
+    def stamp(self, image, x, y):
+        """Blend the dot into image (in place) centred on integer pixel (x, y); returns the touched box."""
+        left, top, right, bottom = self.bbox(int(round(x)), int(round(y)))
+        # Clip to the target so dots near the edge only blend the visible part
+        dest = (max(left, 0), max(top, 0))
+        end = (min(right, image.width), min(bottom, image.height))
+        if dest[0] >= end[0] or dest[1] >= end[1]:
+            return None
+        source = (dest[0] - left, dest[1] - top, end[0] - left, end[1] - top)
+        if image.mode == 'RGBA':
+            image.alpha_composite(self.image, dest=dest, source=source)
+        else:
+            region = image.crop(dest + end).convert('RGBA')
+            region.alpha_composite(self.image, source=source)
+            image.paste(region.convert(image.mode), dest)
+        return dest + end
+
+    def stamp_many(self, image, xs, ys):
+        """Stamp a dot at every (x, y) pair, in order; returns the number drawn inside the image."""
+        drawn = 0
+        for x, y in zip(np.rint(xs).astype(np.int64).tolist(), np.rint(ys).astype(np.int64).tolist()):
+            if self.stamp(image, x, y) is not None:
+                drawn += 1
+        return drawn
+
+
+@functools.lru_cache(maxsize=None)
+def default_sprite():
+    """The shared layered red-dot sprite used for the black-mode globe."""
+    return DotSprite.layered()
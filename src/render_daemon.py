@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import math
+import time
+import shlex
+import resource
+import signal
+import socket
+import logging
+import threading
+import subprocess
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from frame_store import FrameStore
+from spans import SpanRecorder
+
+# Control commands understood by the daemon socket
+CONTROL_COMMANDS = ('status', 'render', 'shutdown')
+# The globe turns once per day
+DEGREES_PER_SECOND = 360 / (24 * 3600)
+
+
+def default_socket_path(temp_dir):
+    """Return the control socket path used for a given temp directory."""
+    return os.path.join(temp_dir, 'black_mode.sock')
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    """Handle one control connection: a single command line in, one JSON line out."""
+
+    def handle(self):
+        command = self.rfile.readline().decode('utf-8', 'replace').strip().lower()
+        response = self.server.daemon_ref.handle_command(command)
+        self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+
+
+class _ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class RenderDaemon:
+    """Long-running renderer that keeps one BlackModeGenerator resident between ticks."""
+
+    def __init__(self, generator, temp_dir, update_interval=1, socket_path=None, publish_command=None,
+                 render_ahead=False, wallpaper=None, frame_store=None, smooth=False, smooth_step=1.0,
+                 min_displacement=0.5, cpu_budget=10.0, frame_server=None):
+        self.generator = generator
+        self.temp_dir = temp_dir
+        self.update_interval = update_interval
+        self.socket_path = socket_path or default_socket_path(temp_dir)
+        self.publish_command = publish_command
+        self.render_ahead = render_ahead
+        # In-process wallpaper backend (e.g. X11RootWallpaper); frames then never touch the disk
+        self.wallpaper = wallpaper
+        self.spans = getattr(generator, 'spans', None) or SpanRecorder()
+        self.frame_store = frame_store or FrameStore(temp_dir, generator.output, spans=self.spans)
+        self.current_path = self.frame_store.current_path
+        self.next_path = self.frame_store.next_path
+        # Optional FrameServer: each published frame is also served over HTTP from memory
+        self.frame_server = frame_server
+        # Smooth mode: render whenever the disk edge has moved min_displacement pixels, within cpu_budget % of a core
+        self.smooth = smooth
+        self.smooth_step = smooth_step
+        self.min_displacement = min_displacement
+        self.cpu_budget = cpu_budget
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        # The generator is not thread-safe; the render-ahead worker and control commands share it
+        self._generator_lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='render-ahead') if render_ahead else None
+        self._ahead = None  # (boundary instant, future resolving to a staged frame path or wallpaper patch)
+        self._server = None
+        self._started_at = None
+        self._frames_rendered = 0
+        self._last_render = None
+        self._last_render_seconds = None
+        self._last_error = None
+        self._next_tick = None
+        self._published_angle = None
+        self._last_displacement = None
+        self._skipped_small = 0
+        self._deferred_budget = 0
+        self._render_cpu_seconds = 0.0
+        self._budget_ready = 0.0
+        self._cpu_at_start = None
+
+    def next_boundary(self, now=None):
+        """Return the next local time aligned to the update interval."""
+        now = now or datetime.now().astimezone()
+        aligned_minute = (now.minute // self.update_interval) * self.update_interval
+        aligned_time = now.replace(minute=aligned_minute, second=0, microsecond=0)
+        return aligned_time + timedelta(minutes=self.update_interval)
+
+    def _render_to(self, instant, ahead=False):
+        """Render the frame for an instant and stage it for _show.
+
+        The result is a wallpaper patch, the staged next_frame file when rendering ahead,
+        or otherwise the frame already published to the frame store.
+        """
+        with self._generator_lock:
+            frame = self.generator.render_at(instant)
+            if self.wallpaper is not None:
+                # Only the globe ROI changes between frames
+                return self.wallpaper.prepare(frame, self.generator.roi)
+            if ahead:
+                return self.frame_store.stage(frame)
+            return self.frame_store.publish(frame, instant)
+
+    def _show(self, staged, instant):
+        """Make a staged frame the current one and publish it."""
+        with self._publish_lock:
+            if self.wallpaper is not None:
+                with self.spans.span('publish', backend='x11'):
+                    self.wallpaper.apply(staged)
+                return
+            if staged != self.current_path:
+                # Promoting the staged file is a rename, so the boundary costs no rendering
+                staged = self.frame_store.promote(staged, instant)
+            self._publish(staged)
+            self._serve(staged, instant)
+
+    def render_now(self, instant=None):
+        """Render and publish a frame for an instant (default: now)."""
+        started = datetime.now().astimezone()
+        instant = instant or started
+        try:
+            self._show(self._render_to(instant), instant)
+        except Exception as e:
+            self._last_error = f"{type(e).__name__}: {e}"
+            logging.exception("Render failed")
+            return False
+        self._record_render(started, f"Rendered frame for {instant.isoformat()}")
+        return True
+
+    def _record_render(self, started, message):
+        self._last_render_seconds = (datetime.now().astimezone() - started).total_seconds()
+        self._last_render = started
+        self._last_error = None
+        self._frames_rendered += 1
+        target = 'the X root window' if self.wallpaper is not None else self.current_path
+        logging.info(f"{message} to {target} in {self._last_render_seconds:.3f}s")
+        self.spans.flush()
+
+    def _schedule_ahead(self, boundary):
+        """Start rendering the frame for an upcoming boundary on the background worker."""
+        self._ahead = (boundary, self._executor.submit(self._render_to, boundary, True))
+        logging.info(f"Rendering ahead for {boundary.isoformat()}")
+
+    def tick(self, boundary):
+        """Publish the frame for a boundary that has just passed, using the pre-rendered one if ready."""
+        if self._ahead is None or self._ahead[0] != boundary:
+            return self.render_now(boundary)
+        started = datetime.now().astimezone()
+        _, future = self._ahead
+        self._ahead = None
+        try:
+            self._show(future.result(), boundary)
+        except Exception as e:
+            logging.warning(f"Render-ahead frame for {boundary.isoformat()} unusable ({e}), rendering now")
+            return self.render_now(boundary)
+        self._record_render(started, f"Published pre-rendered frame for {boundary.isoformat()}")
+        return True
+
+    def displacement(self, angle):
+        """Largest on-screen motion in pixels (at the disk edge) between the published angle and angle."""
+        if self._published_angle is None:
+            return math.inf
+        delta = abs((angle - self._published_angle + 180.0) % 360.0 - 180.0)
+        return self.generator.rotation_engine.radius * math.radians(delta)
+
+    def edge_speed(self):
+        """Pixels per second the disk edge moves."""
+        return self.generator.rotation_engine.radius * math.radians(DEGREES_PER_SECOND)
+
+    def smooth_step_once(self, now=None):
+        """One smooth-mode decision: render now, or skip; returns the seconds to wait before the next step."""
+        now = now or datetime.now().astimezone()
+        angle = self.generator.calculate_rotation(now)
+        moved = self.displacement(angle)
+        if moved < self.min_displacement:
+            # Sleep until the edge will have moved far enough, but not less than the step
+            self._skipped_small += 1
+            return max(self.smooth_step, (self.min_displacement - moved) / self.edge_speed())
+        budget_wait = self._budget_ready - time.monotonic()
+        if budget_wait > 0:
+            self._deferred_budget += 1
+            return max(budget_wait, 0.01)
+        cpu_before = _cpu_seconds()
+        started = time.monotonic()
+        if self.render_now(now):
+            self._published_angle = angle
+            self._last_displacement = moved if moved != math.inf else None
+        cost = _cpu_seconds() - cpu_before
+        self._render_cpu_seconds += cost
+        # The next render may start once this one's CPU time fits in the budget
+        self._budget_ready = started + cost / (self.cpu_budget / 100.0)
+        return max(self.smooth_step, self._budget_ready - time.monotonic(),
+                   self.min_displacement / self.edge_speed())
+
+    def cpu_percent(self):
+        """Process CPU (including publish commands) as a percentage of one core since the daemon started."""
+        if self._cpu_at_start is None:
+            return None
+        wall = time.monotonic() - self._cpu_at_start[1]
+        return 100.0 * (_cpu_seconds() - self._cpu_at_start[0]) / wall if wall > 0 else 0.0
+
+    def _publish(self, path):
+        """Run the configured publish command (e.g. feh) on the new frame.
+        
+        With several outputs path is a list: a bare {path} argument expands to all of them
+        in output order (one per monitor for feh), otherwise they are appended.
+        """
+        if not self.publish_command:
+            return
+        paths = path if isinstance(path, list) else [path]
+        template = shlex.split(self.publish_command)
+        if not any('{path}' in arg for arg in template):
+            template.append('{path}')
+        args = []
+        for arg in template:
+            if arg == '{path}':
+                args.extend(paths)
+            else:
+                args.append(arg.replace('{path}', paths[0]))
+        with self.spans.span('publish_command', command=args[0]):
+            result = subprocess.run(args, capture_output=True, text=True)
+        if result.returncode != 0:
+            logging.error(f"Publish command failed ({result.returncode}): {result.stderr.strip()}")
+
+    def _serve(self, path, instant):
+        """Hand the published frame file(s) to the frame server, read once for every HTTP client."""
+        if self.frame_server is None:
+            return
+        # Only --serve needs the HTTP module, so it is not imported with the daemon
+        from frame_server import CONTENT_TYPES
+        paths = path if isinstance(path, list) else [path]
+        with self.spans.span('publish', backend='http'):
+            bodies = []
+            for frame_path in paths:
+                with open(frame_path, 'rb') as f:
+                    bodies.append(f.read())
+            # Smooth mode has no next boundary, so clients must revalidate every time
+            expires = None if self.smooth else self.next_boundary(instant)
+            self.frame_server.publish(bodies, CONTENT_TYPES[self.generator.output.extension], instant, expires)
+
+    def status(self):
+        """Return a JSON-serialisable snapshot of the daemon state."""
+        status = {
+            'pid': os.getpid(),
+            'started_at': self._started_at.isoformat() if self._started_at else None,
+            'update_interval': self.update_interval,
+            'frames_rendered': self._frames_rendered,
+            'last_render': self._last_render.isoformat() if self._last_render else None,
+            'last_render_seconds': self._last_render_seconds,
+            'next_tick': self._next_tick.isoformat() if self._next_tick else None,
+            'current_frame': None if self.wallpaper is not None else self.current_path,
+            'output_format': self.generator.output.describe(),
+            'wallpaper': 'x11' if self.wallpaper is not None else 'command',
+            'render_ahead': self.render_ahead,
+            'render_ahead_ready': bool(self._ahead and self._ahead[1].done()),
+            'last_error': self._last_error,
+            'spans': self.spans.snapshot(),
+        }
+        if self.smooth:
+            cpu_percent = self.cpu_percent()
+            status['smooth'] = {
+                'min_displacement_px': self.min_displacement,
+                'edge_px_per_second': round(self.edge_speed(), 4),
+                'last_displacement_px': self._last_displacement,
+                'skipped_below_threshold': self._skipped_small,
+                'deferred_by_budget': self._deferred_budget,
+                'cpu_budget_percent': self.cpu_budget,
+                'cpu_percent': round(cpu_percent, 2) if cpu_percent is not None else None,
+                'render_cpu_seconds': round(self._render_cpu_seconds, 3),
+            }
+        if self.wallpaper is None:
+            status['frame_store'] = self.frame_store.footprint()
+        frame_cache = getattr(self.generator, 'frame_cache', None)
+        if frame_cache is not None:
+            status['frame_cache'] = frame_cache.stats()
+        if self.frame_server is not None:
+            status['frame_server'] = self.frame_server.stats()
+        return status
+
+    def handle_command(self, command):
+        """Dispatch a control command and return the response dict."""
+        logging.info(f"Control command: {command!r}")
+        if command == 'status':
+            return {'ok': True, 'status': self.status()}
+        if command == 'render':
+            ok = self.render_now()
+            return {'ok': ok, 'status': self.status()}
+        if command == 'shutdown':
+            self.shutdown()
+            return {'ok': True}
+        return {'ok': False, 'error': f"unknown command {command!r}, expected one of {', '.join(CONTROL_COMMANDS)}"}
+
+    def shutdown(self):
+        """Ask the tick loop to exit."""
+        self._stop.set()
+        self._wake.set()
+
+    def _start_control_server(self):
+        if os.path.exists(self.socket_path):
+            # A live daemon answers on the socket; a stale file is left over from a crash
+            try:
+                send_control_command(self.socket_path, 'status', timeout=1)
+            except OSError:
+                os.unlink(self.socket_path)
+            else:
+                raise RuntimeError(f"Another daemon is already listening on {self.socket_path}")
+        self._server = _ControlServer(self.socket_path, _ControlHandler)
+        self._server.daemon_ref = self
+        os.chmod(self.socket_path, 0o600)
+        thread = threading.Thread(target=self._server.serve_forever, name='control', daemon=True)
+        thread.start()
+        logging.info(f"Control socket listening on {self.socket_path}")
+
+    def _stop_control_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _run_boundaries(self):
+        """Render immediately, then on every update interval boundary."""
+        self.render_now()
+        while not self._stop.is_set():
+            self._next_tick = self.next_boundary()
+            if self._executor is not None and (self._ahead is None or self._ahead[0] != self._next_tick):
+                self._schedule_ahead(self._next_tick)
+            timeout = max((self._next_tick - datetime.now().astimezone()).total_seconds(), 0)
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if datetime.now().astimezone() >= self._next_tick:
+                self.tick(self._next_tick)
+
+    def _run_smooth(self):
+        """Render continuously, skipping frames the eye could not see change and staying within the CPU budget."""
+        while not self._stop.is_set():
+            wait = self.smooth_step_once()
+            self._next_tick = datetime.now().astimezone() + timedelta(seconds=wait)
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def run(self):
+        """Render until shut down: once per interval boundary, or continuously in smooth mode."""
+        self._started_at = datetime.now()
+        # Held for the daemon's lifetime so cron runs cannot write into the same store
+        self.frame_store.acquire()
+        try:
+            self._start_control_server()
+        except Exception:
+            self.frame_store.release()
+            raise
+        if self.frame_server is not None:
+            self.frame_server.start()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.shutdown())
+        self._cpu_at_start = (_cpu_seconds(), time.monotonic())
+        if self.smooth:
+            logging.info(f"Render daemon started (pid {os.getpid()}, smooth: {self.min_displacement}px edge "
+                         f"threshold at {self.edge_speed():.4f}px/s, {self.cpu_budget}% CPU budget)")
+        else:
+            logging.info(f"Render daemon started (pid {os.getpid()}, interval {self.update_interval} min)")
+        try:
+            if self.smooth:
+                self._run_smooth()
+            else:
+                self._run_boundaries()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+            self._stop_control_server()
+            if self.frame_server is not None:
+                self.frame_server.stop()
+            self.frame_store.release()
+            if self.wallpaper is not None:
+                self.wallpaper.close()
+            logging.info("Render daemon stopped")
+
+
+def _cpu_seconds():
+    """CPU time used by this process and its finished children (e.g. the publish command)."""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def send_control_command(socket_path, command, timeout=30):
+    """Send a control command to a running daemon and return its decoded response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((command + '\n').encode('utf-8'))
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data.decode('utf-8'))
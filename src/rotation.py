@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+import math
+import logging
+import numpy as np
+from PIL import Image
+
+
+def support_radius(alpha, center):
+    """Distance from the center to the furthest non-transparent pixel, plus a margin."""
+    ys, xs = np.nonzero(alpha)
+    if len(xs) == 0:
+        return 1.0
+    # PIL samples at pixel centers, hence the half-pixel offset
+    dist = np.hypot(xs + 0.5 - center[0], ys + 0.5 - center[1])
+    return float(dist.max()) + 1.0
+
+
+def rotation_box(size, center, radius, margin=3):
+    """Integer box (left, top, right, bottom) that holds the disk at every rotation angle."""
+    half = int(math.ceil(radius)) + margin
+    cx, cy = int(center[0]), int(center[1])
+    return (max(cx - half, 0), max(cy - half, 0), min(cx + half, size[0]), min(cy + half, size[1]))
+
+
+class PilRotationEngine:
+    """Rotate the globe with PIL's BICUBIC Image.rotate (the reference implementation).
+
+    Only the box around the disk is rotated; everything outside it is transparent at any
+    angle, so the result matches a full-canvas rotate cropped to the box.
+    """
+
+    name = 'pil'
+
+    def __init__(self, globe_only, center):
+        self.center = center
+        self.size = globe_only.size
+        self.radius = support_radius(np.asarray(globe_only.getchannel('A')), center)
+        self.box = rotation_box(self.size, center, self.radius)
+        self.globe_box = globe_only.crop(self.box)
+        self._box_center = (center[0] - self.box[0], center[1] - self.box[1])
+
+    def rotate(self, angle):
+        """Return the globe box rotated counter-clockwise by angle degrees about the center."""
+        return self.globe_box.rotate(angle, resample=Image.BICUBIC, center=self._box_center, expand=False)
+
+    def rotate_array(self, angle):
+        """Return the rotated globe box as an RGBA uint8 array."""
+        return np.asarray(self.rotate(angle))
+
+
+class PolarRotationEngine:
+    """Rotate the globe as a cyclic shift of a precomputed polar (radius x angle) image.
+
+    The disk is resampled once into polar coordinates at load time. A rotation is then a
+    column roll of the polar array followed by one gather back to Cartesian pixels, using
+    index and bilinear weight tables that are also built once. Angles are snapped to the
+    nearest polar column (360 / angular_steps degrees, 0.05 by default), so every whole
+    minute of clock time (0.25 degrees) is an exact integer shift.
+    """
+
+    name = 'polar'
+
+    def __init__(self, globe_only, center, radius=None, radial_step=0.5, angular_steps=7200):
+        self.center = center
+        self.size = globe_only.size
+        self.angular_steps = angular_steps
+        source = np.asarray(globe_only.convert('RGBA'))
+
+        if radius is None:
+            radius = support_radius(source[..., 3], center)
+        self.radius = radius
+        self.box = rotation_box(self.size, center, radius)
+        self.radial_step = radial_step
+        self.radial_steps = int(math.ceil(radius / radial_step)) + 2
+
+        self.polar = self._to_polar(source)
+        self._rolled = np.empty_like(self.polar)
+        self._build_gather_tables()
+        self._output = np.zeros((self.box[3] - self.box[1], self.box[2] - self.box[0], 4), dtype=np.uint8)
+        logging.info(f"Built polar rotation engine: radius={radius:.1f}, polar grid {self.radial_steps}x{angular_steps}")
+
+    @staticmethod
+    def _bilinear(source, u, v):
+        """Sample source at continuous pixel coordinates (pixel centers at i + 0.5); outside is transparent."""
+        height, width = source.shape[:2]
+        x = u - 0.5
+        y = v - 0.5
+        x0 = np.floor(x).astype(np.int64)
+        y0 = np.floor(y).astype(np.int64)
+        fx = (x - x0)[..., None].astype(np.float32)
+        fy = (y - y0)[..., None].astype(np.float32)
+        padded = np.zeros((height + 2, width + 2, source.shape[2]), dtype=np.float32)
+        padded[1:-1, 1:-1] = source
+        x0 = np.clip(x0 + 1, 0, width)
+        y0 = np.clip(y0 + 1, 0, height)
+        top = padded[y0, x0] * (1 - fx) + padded[y0, x0 + 1] * fx
+        bottom = padded[y0 + 1, x0] * (1 - fx) + padded[y0 + 1, x0 + 1] * fx
+        return top * (1 - fy) + bottom * fy
+
+    def _to_polar(self, source):
+        """Resample the disk into a (radius x angle x RGBA) uint8 array."""
+        cx, cy = self.center
+        r = np.arange(self.radial_steps, dtype=np.float64) * self.radial_step
+        theta = np.arange(self.angular_steps, dtype=np.float64) * (2 * math.pi / self.angular_steps)
+        u = cx + r[:, None] * np.cos(theta)[None, :]
+        v = cy + r[:, None] * np.sin(theta)[None, :]
+        polar = self._bilinear(source, u, v)
+        return np.clip(np.rint(polar), 0, 255).astype(np.uint8)
+
+    def _build_gather_tables(self):
+        """Precompute, for every output pixel inside the disk, its four polar neighbours and weights."""
+        cx, cy = self.center
+        left, top, right, bottom = self.box
+        ys, xs = np.mgrid[top:bottom, left:right]
+        dx = xs + 0.5 - cx
+        dy = ys + 0.5 - cy
+        rho = np.hypot(dx, dy)
+        inside = rho < self.radius
+        self.disk_index = np.flatnonzero(inside)
+
+        rho = rho[inside] / self.radial_step
+        phi = np.mod(np.arctan2(dy[inside], dx[inside]), 2 * math.pi) * (self.angular_steps / (2 * math.pi))
+        r0 = np.minimum(np.floor(rho).astype(np.int64), self.radial_steps - 2)
+        t0 = np.floor(phi).astype(np.int64) % self.angular_steps
+        t1 = (t0 + 1) % self.angular_steps
+        wr = rho - r0
+        wt = phi - np.floor(phi)
+
+        n = self.angular_steps
+        self.gather_index = np.stack([r0 * n + t0, r0 * n + t1, (r0 + 1) * n + t0, (r0 + 1) * n + t1])
+        # Bilinear weights in 8-bit fixed point so the blend stays in uint16: each set is
+        # floored and the residual (0 to 3) goes to its largest weight, so all are >= 0 and sum to 256
+        exact = np.stack([(1 - wr) * (1 - wt), (1 - wr) * wt, wr * (1 - wt), wr * wt]) * 256
+        weights = np.floor(exact).astype(np.int32)
+        largest = np.argmax(exact, axis=0)
+        columns = np.arange(weights.shape[1])
+        weights[largest, columns] += 256 - weights.sum(axis=0)
+        self.gather_weight = weights.astype(np.uint16)[..., None]
+
+        count = len(self.disk_index)
+        self._taps = np.empty((count, 4), dtype=np.uint8)
+        self._acc = np.empty((count, 4), dtype=np.uint16)
+        self._term = np.empty((count, 4), dtype=np.uint16)
+
+    def shift_for(self, angle):
+        """Polar column shift equivalent to a counter-clockwise rotation by angle degrees."""
+        return int(round((angle % 360.0) / 360.0 * self.angular_steps)) % self.angular_steps
+
+    def rotate_array(self, angle):
+        """Return the rotated globe box as an RGBA uint8 array (owned by the engine, reused per call)."""
+        # Output at polar angle phi comes from input angle phi + angle, i.e. a roll to the left
+        shift = self.shift_for(angle)
+        self._rolled[:, :self.angular_steps - shift] = self.polar[:, shift:]
+        self._rolled[:, self.angular_steps - shift:] = self.polar[:, :shift]
+        flat = self._rolled.reshape(-1, 4)
+        np.take(flat, self.gather_index[0], axis=0, out=self._taps)
+        np.multiply(self._taps, self.gather_weight[0], out=self._acc)
+        for k in range(1, 4):
+            np.take(flat, self.gather_index[k], axis=0, out=self._taps)
+            np.multiply(self._taps, self.gather_weight[k], out=self._term)
+            np.add(self._acc, self._term, out=self._acc)
+        # Round the 8-bit fixed point sum back to uint8
+        np.add(self._acc, 128, out=self._acc)
+        np.right_shift(self._acc, 8, out=self._acc)
+        self._output.reshape(-1, 4)[self.disk_index] = self._acc
+        return self._output
+
+    def rotate(self, angle):
+        """Return the globe box rotated counter-clockwise by angle degrees about the center."""
+        return Image.fromarray(self.rotate_array(angle), 'RGBA')
+
+
+ROTATION_ENGINES = {
+    PilRotationEngine.name: PilRotationEngine,
+    PolarRotationEngine.name: PolarRotationEngine,
+}
+
+
+def create_rotation_engine(name, globe_only, center):
+    """Build the rotation engine registered under name."""
+    try:
+        engine_cls = ROTATION_ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown rotation engine {name!r}, expected one of {', '.join(ROTATION_ENGINES)}")
+    return engine_cls(globe_only, center)
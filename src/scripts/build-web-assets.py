@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Build the web clock's assets: pre-masked overlay, globe geometry and compressed, content-hashed variants."""
+
+import io
+import os
+import re
+import sys
+import json
+import base64
+import hashlib
+import argparse
+import numpy as np
+from PIL import Image, features
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from projection import GLOBE_LON0, GlobeGeometry  # noqa: E402
+
+# Formats in the order the browser should prefer them, with the Pillow feature they need
+FORMATS = {
+    'avif': 'avif',
+    'webp': 'webp',
+    'png': None,
+}
+MANIFEST_NAME = 'manifest.json'
+# Only files this script wrote are ever removed from the output directory
+BUILT_NAME = re.compile(r'^(globe|overlay)\.[0-9a-f]{12}\.(' + '|'.join(FORMATS) + r')$')
+MANIFEST_VERSION = 1
+
+
+def encode(image, fmt, args):
+    """Encode an RGBA image in one of FORMATS and return the bytes."""
+    buffer = io.BytesIO()
+    if fmt == 'avif':
+        image.save(buffer, 'AVIF', quality=args.avif_quality, speed=args.avif_speed)
+    elif fmt == 'webp':
+        # Lossy colour with lossless alpha, so the globe edge and the mask stay exact
+        image.save(buffer, 'WEBP', quality=args.webp_quality, alpha_quality=100, method=6)
+    else:
+        image.save(buffer, 'PNG', compress_level=9)
+    return buffer.getvalue()
+
+
+def hashed_name(stem, data, fmt):
+    """File name carrying a digest of its content, so it can be cached forever."""
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}.{fmt}"
+
+
+def probe(fmt):
+    """A 1x1 image in fmt as a data URI, for the browser to test decoding support without a request."""
+    buffer = io.BytesIO()
+    Image.new('RGBA', (1, 1), (0, 0, 0, 0)).save(buffer, fmt.upper())
+    return f"data:image/{fmt};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+
+def masked_overlay(overlay, globe):
+    """The overlay with the globe area made transparent, as createOverlayMaskCanvas and destination-in do in the browser."""
+    pixels = np.array(overlay.convert('RGBA'))
+    inside = np.asarray(globe.getchannel('A')) > 0
+    pixels[inside] = 0
+    return Image.fromarray(pixels, 'RGBA')
+
+
+def write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build precomputed, content-hashed web clock assets')
+    parser.add_argument('--base-globe', default='web/assets/base_globe.png', help='Globe image')
+    parser.add_argument('--overlay', default='web/assets/stationary_overlay.png', help='Overlay image')
+    parser.add_argument('--out-dir', default='web/assets/build', help='Output directory; files no longer in the manifest are removed')
+    parser.add_argument('--formats', default=','.join(FORMATS), help=f"Comma-separated formats to emit, best first (default: {','.join(FORMATS)})")
+    parser.add_argument('--webp-quality', type=int, default=90, help='WebP colour quality (default: 90)')
+    parser.add_argument('--avif-quality', type=int, default=80, help='AVIF quality (default: 80)')
+    parser.add_argument('--avif-speed', type=int, default=6, help='AVIF encoder speed 0-10, lower is smaller and slower (default: 6)')
+    parser.add_argument('--lon0', type=float, default=GLOBE_LON0, help=f'Prime meridian orientation of the artwork (default: {GLOBE_LON0})')
+    args = parser.parse_args()
+
+    formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        parser.error(f"Unknown format(s) {', '.join(unknown)}, expected {', '.join(FORMATS)}")
+    for fmt in list(formats):
+        if FORMATS[fmt] and not features.check(FORMATS[fmt]):
+            print(f"Skipping {fmt}: this Pillow build cannot encode it")
+            formats.remove(fmt)
+    if 'png' not in formats:
+        # Every browser decodes PNG, so it is always the last resort
+        formats.append('png')
+
+    globe = Image.open(args.base_globe).convert('RGBA')
+    overlay = Image.open(args.overlay)
+    if overlay.size != globe.size:
+        parser.error(f"Globe {globe.size} and overlay {overlay.size} must be the same size")
+    geometry = GlobeGeometry.from_image(globe, args.lon0)
+    sources = {'globe': globe, 'overlay': masked_overlay(overlay, globe)}
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    images = {}
+    written = set()
+    for key, image in sources.items():
+        images[key] = {}
+        for fmt in formats:
+            data = encode(image, fmt, args)
+            name = hashed_name(key, data, fmt)
+            path = os.path.join(args.out_dir, name)
+            if not os.path.exists(path):
+                write_atomic(path, data)
+            images[key][fmt] = {'file': name, 'bytes': len(data)}
+            written.add(name)
+            print(f"{key:<8} {fmt:<5} {len(data) / 1024:>8.0f} KB  {path}")
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'width': globe.width,
+        'height': globe.height,
+        # Same keys as RandallProjection.globeGeometryFromImage, so the page does no pixel scan
+        'geometry': {
+            'centerX': geometry.center_x,
+            'centerY': geometry.center_y,
+            'radius': geometry.radius,
+            'lon0': geometry.lon0,
+            'width': globe.width,
+            'height': globe.height,
+        },
+        'formats': formats,
+        'probes': {fmt: probe(fmt) for fmt in formats if fmt != 'png'},
+        'images': images,
+    }
+    # The manifest goes last, so a page never sees it before the files it names
+    write_atomic(os.path.join(args.out_dir, MANIFEST_NAME), (json.dumps(manifest, indent=2) + '\n').encode('utf-8'))
+
+    for name in os.listdir(args.out_dir):
+        if BUILT_NAME.match(name) and name not in written:
+            os.unlink(os.path.join(args.out_dir, name))
+            print(f"Removed stale {name}")
+
+    print(f"Geometry: {geometry}")
+    print(f"Manifest written to {os.path.join(args.out_dir, MANIFEST_NAME)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Measure the polar rotation engine against the PIL reference for speed and pixel error."""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rotation import ROTATION_ENGINES  # noqa: E402
+
+
+def premultiplied(arr):
+    """Premultiply RGB by alpha so fully transparent pixels compare equal regardless of their RGB."""
+    arr = arr.astype(np.float64)
+    return np.concatenate([arr[..., :3] * arr[..., 3:] / 255.0, arr[..., 3:]], axis=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare globe rotation engines')
+    parser.add_argument('--base-globe', default='src/images/base_globe.png', help='Globe image to rotate')
+    parser.add_argument('--angles', type=int, default=12, help='Number of angles to sample over a full turn')
+    args = parser.parse_args()
+
+    globe = Image.open(args.base_globe).convert('RGBA')
+    center = (globe.width // 2, globe.height // 2)
+    # One angle per sample, offset by a non-round amount so partial-minute angles are included
+    angles = [-(i * 360.0 / args.angles + 1.75) for i in range(args.angles)]
+
+    engines = {}
+    for name, engine_cls in ROTATION_ENGINES.items():
+        started = time.perf_counter()
+        engines[name] = engine_cls(globe, center)
+        print(f"{name:>6}: setup {time.perf_counter() - started:.3f}s")
+
+    timings = {name: [] for name in engines}
+    errors = []
+    for angle in angles:
+        outputs = {}
+        for name, engine in engines.items():
+            started = time.perf_counter()
+            outputs[name] = np.array(engine.rotate(angle))
+            timings[name].append(time.perf_counter() - started)
+        diff = np.abs(premultiplied(outputs['pil']) - premultiplied(outputs['polar']))
+        errors.append((diff.max(), diff.mean(), (diff ** 2).mean()))
+
+    for name, samples in timings.items():
+        print(f"{name:>6}: rotate mean {np.mean(samples) * 1000:.1f} ms, min {np.min(samples) * 1000:.1f} ms")
+    max_err = max(e[0] for e in errors)
+    mean_err = np.mean([e[1] for e in errors])
+    psnr = 10 * np.log10(255.0 ** 2 / np.mean([e[2] for e in errors]))
+    print(f"polar vs pil (premultiplied RGBA): max abs error {max_err:.0f}, mean abs error {mean_err:.3f}, PSNR {psnr:.1f} dB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Export a timelapse of the clock over a time range as APNG, animated WebP or raw RGB frames."""
+
+import os
+import re
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from black_mode import BlackModeGenerator  # noqa: E402
+from rotation import ROTATION_ENGINES  # noqa: E402
+from asset_cache import DEFAULT_ASSET_CACHE_DIR, DecodedAssetCache  # noqa: E402
+from timelapse import DEFAULT_PREFETCH, TIMELAPSE_FORMATS, export_timelapse, frame_count, frame_instants, open_output  # noqa: E402
+
+DURATION = re.compile(r'^(\d+(?:\.\d+)?)([smhd]?)$')
+UNITS = {'s': 'seconds', 'm': 'minutes', '': 'minutes', 'h': 'hours', 'd': 'days'}
+
+
+def parse_duration(text):
+    """A duration such as 30s, 5m, 5 (minutes), 12h or 7d."""
+    match = DURATION.match(text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Bad duration {text!r}, expected e.g. 30s, 5m, 12h or 7d")
+    return timedelta(**{UNITS[match.group(2)]: float(match.group(1))})
+
+
+def parse_instant(text):
+    """An ISO date or date and time; naive values are local time."""
+    try:
+        return datetime.fromisoformat(text).astimezone()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Bad time {text!r}, expected ISO format such as 2026-06-21T00:00")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a timelapse of the clock as APNG, animated WebP or raw RGB frames')
+    parser.add_argument('--base-globe', default='src/images/base_globe.png', help='Globe image')
+    parser.add_argument('--overlay', default='src/images/stationary_overlay.png', help='Overlay image')
+    parser.add_argument('--start', type=parse_instant, help='First instant, ISO format, local time unless an offset is given (default: today 00:00)')
+    parser.add_argument('--end', type=parse_instant, help='End of the range, exclusive (default: start + --duration)')
+    parser.add_argument('--duration', type=parse_duration, default=timedelta(days=1), help='Length of the range when --end is not given (default: 1d)')
+    parser.add_argument('--step', type=parse_duration, default=timedelta(minutes=1), help='Clock time between frames, e.g. 30s, 5m, 1h (default: 1m)')
+    parser.add_argument('--format', choices=list(TIMELAPSE_FORMATS), default='apng', help='apng, webp (animated) or raw (RGB24 frames back to back, for ffmpeg) (default: apng)')
+    parser.add_argument('--output', help="Output file, or - for stdout (default: timelapse.<ext>, stdout for raw)")
+    parser.add_argument('--fps', type=float, default=24.0, help='Playback frames per second (default: 24)')
+    parser.add_argument('--loop', type=int, default=0, help='Times the animation plays, 0 forever (default: 0)')
+    parser.add_argument('--rgb', action='store_true', help='Flatten frames onto black and drop the alpha channel (always on for raw)')
+    parser.add_argument('--quality', type=int, default=90, help='WebP colour quality (default: 90)')
+    parser.add_argument('--lossless', action='store_true', help='Lossless WebP frames')
+    parser.add_argument('--compress-level', type=int, choices=range(10), metavar='0-9', default=6, help='APNG deflate level (default: 6)')
+    parser.add_argument('--full-frames', action='store_true', help='Encode every frame whole instead of only the globe box after the first')
+    parser.add_argument('--rotation-engine', choices=sorted(ROTATION_ENGINES), default='pil', help='Globe rotation engine (default: pil)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Encoder threads; rendering runs on its own thread (default: number of CPUs)')
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH, help=f'Frames rendered ahead of the encoders (default: {DEFAULT_PREFETCH})')
+    parser.add_argument('--temp-dir', default='/tmp/randall-clock', help='Generator temp directory (default: /tmp/randall-clock)')
+    parser.add_argument('--asset-cache-dir', default=DEFAULT_ASSET_CACHE_DIR, help=f'Decoded asset cache (default: {DEFAULT_ASSET_CACHE_DIR})')
+    parser.add_argument('--no-asset-cache', action='store_true', help='Decode the PNG assets instead of mapping the asset cache')
+    args = parser.parse_args()
+
+    start = args.start or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).astimezone()
+    end = args.end or start + args.duration
+    if args.step <= timedelta(0):
+        parser.error('--step must be positive')
+    count = frame_count(start, end, args.step)
+    if count < 1:
+        parser.error('The range holds no frames; --end must be after --start')
+    if args.fps <= 0 or args.workers < 1:
+        parser.error('--fps and --workers must be positive')
+    writer_class, extension = TIMELAPSE_FORMATS[args.format]
+    output = args.output or ('-' if args.format == 'raw' else f"timelapse.{extension}")
+    if output == '-' and args.format == 'webp':
+        parser.error('Animated WebP needs a seekable --output file; use apng or raw to stream to stdout')
+    if output == '-' and sys.stdout.isatty():
+        parser.error('Refusing to write binary frames to a terminal; pipe them or pass --output FILE')
+
+    generator = BlackModeGenerator(
+        args.base_globe,
+        args.overlay,
+        args.temp_dir,
+        save_debug=False,
+        rotation_engine=args.rotation_engine,
+        asset_cache=None if args.no_asset_cache else DecodedAssetCache(os.path.expanduser(args.asset_cache_dir))
+    )
+    size = generator.globe.size
+    options = {
+        'apng': {'compress_level': args.compress_level},
+        'webp': {'quality': args.quality, 'lossless': args.lossless},
+        'raw': {},
+    }[args.format]
+
+    # Progress goes to stderr: stdout may be carrying the frames
+    print(f"Rendering {count} frames from {start.isoformat()} to {end.isoformat()} every {args.step} "
+          f"({count / args.fps:.1f}s at {args.fps:g} fps) as {args.format} to {output}", file=sys.stderr)
+    if args.format == 'raw':
+        print(f"Raw frames are rgb24 {size[0]}x{size[1]}, e.g. | ffmpeg -f rawvideo -pix_fmt rgb24 "
+              f"-s {size[0]}x{size[1]} -r {args.fps:g} -i - timelapse.mp4", file=sys.stderr)
+
+    started = time.perf_counter()
+
+    def progress(written):
+        if written % 60 == 0 or written == count:
+            elapsed = time.perf_counter() - started
+            print(f"[{written}/{count}] {written / elapsed:.2f} frames/s", file=sys.stderr, flush=True)
+
+    fp = open_output(output)
+    try:
+        writer = writer_class(fp, size, count, args.fps, loop=args.loop, rgb=args.rgb,
+                              box=None if args.full_frames else generator.roi, **options)
+        written = export_timelapse(generator, frame_instants(start, end, args.step), writer,
+                                   workers=args.workers, prefetch=args.prefetch, progress=progress)
+    except BrokenPipeError:
+        # The reader went away (e.g. ffmpeg was stopped); nothing more to do
+        sys.stderr.close()
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if fp is not sys.stdout.buffer:
+            fp.close()
+    elapsed = time.perf_counter() - started
+    print(f"Done: {written} frames in {elapsed:.1f}s ({written / elapsed:.2f} frames/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
 #!/usr/bin/env python3
 
 import os
-import math
-import re
+import sys
+import time
+import argparse
 from pathlib import Path
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PIL import Image
 import numpy as np
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rotation import ROTATION_ENGINES, create_rotation_engine  # noqa: E402
+
 # Configuration
 IMAGE_DIR = 'src/images/intervals15m/blackGlobeGreenOverlay'
 OUTPUT_DIR = 'src/images/intervals1m/blackGreenOverlay'
@@ -17,58 +23,130 @@ IMAGE_PATTERN = r'(\d{2})h(\d{2})m\.png'
 # Earth's rotation speed: 360 degrees in 24 hours = 15 degrees/hour = 0.25 degrees/minute
 ROTATION_SPEED_DEG_PER_MIN = -0.25
 
+# Per-worker state set up once by _init_worker
+_worker = {}
 
-def generate_minute_frames():
-    overlay_img = Image.open(os.path.join(OVERLAY_DIR, 'stationary_overlay.png')).convert('RGBA')
-    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
-    Path(MASKS_DIR).mkdir(parents=True, exist_ok=True)
 
-    # Gather all output paths
-    output_paths = []
-    for hour in range(24):
-        for q in range(0, 60, 15):
-            for minute in range(q, q+15):
-                outname = f"{hour:02d}h{minute:02d}m.png"
-                outpath = os.path.join(OUTPUT_DIR, outname)
-                output_paths.append(outpath)
-    existing = [p for p in output_paths if os.path.exists(p)]
-    overwrite = False
-    if existing:
-        resp = input(f"Some frame images already exist in {OUTPUT_DIR}. Overwrite all? (y/n): ").strip().lower()
-        if resp == 'y':
-            overwrite = True
-        else:
-            print("Keeping existing frames. Skipping existing files.")
+def _init_worker(overlay_name, overlay_shape, engine):
+    """Attach to the shared overlay once per worker process instead of receiving it with every task."""
+    shm = shared_memory.SharedMemory(name=overlay_name)
+    overlay = np.ndarray(overlay_shape, dtype=np.uint8, buffer=shm.buf)
+    _worker['shm'] = shm  # keep the mapping alive for the worker's lifetime
+    _worker['overlay'] = Image.frombuffer('RGBA', (overlay_shape[1], overlay_shape[0]), overlay, 'raw', 'RGBA', 0, 1)
+    _worker['engine'] = engine
+
+
+def render_keyframe(source_path, mask_path, hour, q, minutes, output_dir):
+    """Render the given minutes of one 15-minute keyframe; returns (source name, frames written, seconds)."""
+    started = time.perf_counter()
+    overlay_img = _worker['overlay']
+    source_img = Image.open(source_path).convert('RGBA')
+    globe_mask = Image.open(mask_path).convert('L')
+
+    # Extract globe and build the rotation engine once per keyframe
+    globe_only = Image.composite(source_img, Image.new('RGBA', source_img.size, (0,0,0,0)), globe_mask)
+    rotator = create_rotation_engine(_worker['engine'], globe_only, (source_img.width//2, source_img.height//2))
+    del source_img, globe_mask, globe_only
+
+    for minute in minutes:
+        outpath = os.path.join(output_dir, f"{hour:02d}h{minute:02d}m.png")
+        rotation = (minute - q) * ROTATION_SPEED_DEG_PER_MIN
+        # Rotate globe (about center); engines return only the box around the disk
+        rotated_globe = rotator.rotate(rotation)
+        # Composite onto overlay
+        final = overlay_img.copy()
+        final.alpha_composite(rotated_globe, dest=rotator.box[:2])
+        final.save(outpath)
+    return os.path.basename(source_path), len(minutes), time.perf_counter() - started
+
+
+def plan_keyframes(image_dir, masks_dir, output_dir, overwrite):
+    """List (source, mask, hour, q, minutes to render) for every keyframe that has work to do."""
+    tasks = []
     for hour in range(24):
         for q in range(0, 60, 15):
             source_name = f"{hour:02d}h{q:02d}m.png"
-            source_path = os.path.join(IMAGE_DIR, source_name)
-            mask_path = os.path.join(MASKS_DIR, source_name)
+            source_path = os.path.join(image_dir, source_name)
+            mask_path = os.path.join(masks_dir, source_name)
             if not os.path.exists(source_path) or not os.path.exists(mask_path):
                 continue
-            source_img = Image.open(source_path).convert('RGBA')
-            globe_mask = Image.open(mask_path).convert('L')
-            for minute in range(q, q+15):
-                outname = f"{hour:02d}h{minute:02d}m.png"
-                outpath = os.path.join(OUTPUT_DIR, outname)
-                if os.path.exists(outpath) and not overwrite:
-                    continue  # skip if already exists
-                total_minutes = hour * 60 + minute
-                source_minutes = hour * 60 + q
-                rotation = (total_minutes - source_minutes) * ROTATION_SPEED_DEG_PER_MIN
-                # Extract globe
-                globe_only = Image.composite(source_img, Image.new('RGBA', source_img.size, (0,0,0,0)), globe_mask)
-                # Rotate globe (about center)
-                rotated_globe = globe_only.rotate(rotation, resample=Image.BICUBIC, center=(source_img.width//2, source_img.height//2))
-                # Composite onto overlay
-                final = overlay_img.copy()
-                final.alpha_composite(rotated_globe)
-                final.save(outpath)
-                print(f"Saved {outname} (source: {source_name}, rotation: {rotation:.2f} deg, mask: {mask_path})")
+            minutes = [
+                minute for minute in range(q, q+15)
+                if overwrite or not os.path.exists(os.path.join(output_dir, f"{hour:02d}h{minute:02d}m.png"))
+            ]
+            if minutes:
+                tasks.append((source_path, mask_path, hour, q, minutes))
+    return tasks
+
+
+def decide_overwrite(output_dir, assume_yes):
+    """Overwrite existing frames with --yes, ask on a terminal, and keep them when run non-interactively."""
+    existing = any(Path(output_dir).glob('[0-2][0-9]h[0-5][0-9]m.png'))
+    if not existing:
+        return False
+    if assume_yes:
+        return True
+    if not sys.stdin.isatty():
+        print(f"Some frame images already exist in {output_dir}; keeping them (pass --yes to overwrite).")
+        return False
+    resp = input(f"Some frame images already exist in {output_dir}. Overwrite all? (y/n): ").strip().lower()
+    if resp == 'y':
+        return True
+    print("Keeping existing frames. Skipping existing files.")
+    return False
+
+
+def generate_minute_frames(engine='pil', workers=None, assume_yes=False, image_dir=IMAGE_DIR, output_dir=OUTPUT_DIR,
+                           masks_dir=MASKS_DIR, overlay_dir=OVERLAY_DIR):
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    Path(masks_dir).mkdir(parents=True, exist_ok=True)
+    overwrite = decide_overwrite(output_dir, assume_yes)
+    tasks = plan_keyframes(image_dir, masks_dir, output_dir, overwrite)
+    total_frames = sum(len(task[4]) for task in tasks)
+    if not tasks:
+        print("Nothing to do.")
+        return
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    print(f"Rendering {total_frames} frames from {len(tasks)} keyframes on {workers} worker(s)")
+
+    # The overlay is identical for every frame: publish it once in shared memory
+    overlay = np.asarray(Image.open(os.path.join(overlay_dir, 'stationary_overlay.png')).convert('RGBA'))
+    shm = shared_memory.SharedMemory(create=True, size=overlay.nbytes)
+    try:
+        np.ndarray(overlay.shape, dtype=np.uint8, buffer=shm.buf)[...] = overlay
+        started = time.perf_counter()
+        done_frames = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shm.name, overlay.shape, engine)) as pool:
+            futures = [pool.submit(render_keyframe, *task, output_dir) for task in tasks]
+            del overlay
+            for done_keyframes, future in enumerate(as_completed(futures), 1):
+                source_name, frames, seconds = future.result()
+                done_frames += frames
+                elapsed = time.perf_counter() - started
+                rate = done_frames / elapsed if elapsed else 0.0
+                eta = (total_frames - done_frames) / rate if rate else 0.0
+                print(f"[{done_keyframes}/{len(tasks)}] {source_name}: {frames} frames in {seconds:.1f}s | "
+                      f"{done_frames}/{total_frames} frames, {rate:.2f} frames/s, ETA {eta:.0f}s", flush=True)
+        elapsed = time.perf_counter() - started
+        print(f"Done: {done_frames} frames in {elapsed:.1f}s ({done_frames / elapsed:.2f} frames/s, {workers} workers)")
+    finally:
+        shm.close()
+        shm.unlink()
 
 
 def main():
-    generate_minute_frames()
+    parser = argparse.ArgumentParser(description='Generate 1-minute interval frames from the 15-minute keyframes')
+    parser.add_argument('--engine', choices=sorted(ROTATION_ENGINES), default='pil', help='Globe rotation engine (default: pil)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: number of CPUs)')
+    parser.add_argument('-y', '--yes', action='store_true', help='Overwrite existing frames without asking')
+    parser.add_argument('--image-dir', default=IMAGE_DIR, help=f'15-minute keyframes (default: {IMAGE_DIR})')
+    parser.add_argument('--masks-dir', default=MASKS_DIR, help=f'Globe masks per keyframe (default: {MASKS_DIR})')
+    parser.add_argument('--overlay-dir', default=OVERLAY_DIR, help=f'Directory with stationary_overlay.png (default: {OVERLAY_DIR})')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help=f'Output directory (default: {OUTPUT_DIR})')
+    args = parser.parse_args()
+    generate_minute_frames(engine=args.engine, workers=args.workers, assume_yes=args.yes, image_dir=args.image_dir,
+                           output_dir=args.output_dir, masks_dir=args.masks_dir, overlay_dir=args.overlay_dir)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
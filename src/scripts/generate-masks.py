@@ -1,10 +1,11 @@
 import os
 import re
 import sys
-from pathlib import Path
+import argparse
 from PIL import Image
-import numpy as np
-from scipy.ndimage import binary_dilation
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from overlay_builder import DEFAULT_SCRATCH_DIR, build_overlay_and_masks  # noqa: E402
 
 IMAGE_DIR = 'src/images/intervals15m/blackGlobeGreenOverlay'
 MASKS_DIR = 'src/images/masks'
@@ -24,82 +25,64 @@ def get_all_frames():
     ))
 
 
-def create_stationary_overlay(frames, overwrite=False):
-    overlay_path = os.path.join(OVERLAY_DIR, 'stationary_overlay.png')
-    if os.path.exists(overlay_path) and not overwrite:
-        print(f"Overlay already exists at {overlay_path}.")
-        return None
-    imgs = [np.array(Image.open(os.path.join(IMAGE_DIR, f)).convert('RGBA')) for f in frames]
-    imgs_stack = np.stack(imgs, axis=0)
-    median_img = np.median(imgs_stack, axis=0).astype(np.uint8)
-    overlay_img = Image.fromarray(median_img, 'RGBA')
-    Path(OVERLAY_DIR).mkdir(parents=True, exist_ok=True)
-    overlay_img.save(overlay_path)
-    print(f"Saved overlay to {overlay_path}")
-    return overlay_img
-
-
-def create_globe_mask(overlay_img, source_frame, mask_path, overwrite=False):
-    if os.path.exists(mask_path) and not overwrite:
-        return None
-    sample_img = Image.open(os.path.join(IMAGE_DIR, source_frame)).convert('RGBA')
-    overlay_arr = np.array(overlay_img)
-    sample_arr = np.array(sample_img)
-    diff = np.abs(sample_arr[..., :3].astype(np.int16) - overlay_arr[..., :3].astype(np.int16)).sum(axis=2)
-    mask = (diff > 30).astype(np.uint8) * 255
-    mask_img = Image.fromarray(mask, 'L')
-    Path(MASKS_DIR).mkdir(parents=True, exist_ok=True)
-    mask_img.save(mask_path)
-    print(f"Saved globe mask for {source_frame} as {mask_path}")
-    return mask_img
+def confirm(question, assume_yes):
+    """Ask a y/n question on a terminal; non-interactive runs answer no unless --overwrite was given."""
+    if assume_yes:
+        return True
+    if not sys.stdin.isatty():
+        return False
+    return input(f"{question} (y/n): ").strip().lower() == 'y'
 
 
 def main():
-    do_overlay = '--overlay' in sys.argv or len(sys.argv) == 1
-    do_masks = '--masks' in sys.argv or len(sys.argv) == 1
-    overwrite_overlay = '--overwrite' in sys.argv
-    overwrite_masks = '--overwrite' in sys.argv
+    parser = argparse.ArgumentParser(description='Build the stationary overlay and per-keyframe globe masks')
+    parser.add_argument('--overlay', action='store_true', help='Build the stationary overlay (default: overlay and masks)')
+    parser.add_argument('--masks', action='store_true', help='Build the globe masks (default: overlay and masks)')
+    parser.add_argument('--overwrite', action='store_true', help='Overwrite existing outputs without asking')
+    parser.add_argument('--tile-mb', type=int, default=256, help='Memory budget for one row tile of all frames in MB (default: 256)')
+    parser.add_argument('--scratch-dir', help=f'Disk-backed directory for the decoded-frame scratch file (default: {DEFAULT_SCRATCH_DIR})')
+    args = parser.parse_args()
+    do_overlay = args.overlay or not args.masks
+    do_masks = args.masks or not args.overlay
+
     frames = get_all_frames()
+    overlay_path = os.path.join(OVERLAY_DIR, 'stationary_overlay.png')
     overlay_img = None
     # Overlay prompt
+    build_overlay = False
     if do_overlay:
-        overlay_path = os.path.join(OVERLAY_DIR, 'stationary_overlay.png')
-        if os.path.exists(overlay_path) and not overwrite_overlay:
-            resp = input(f"Overlay already exists at {overlay_path}. Overwrite? (y/n): ").strip().lower()
-            if resp == 'y':
-                overwrite_overlay = True
-            else:
-                print("Keeping existing overlay.")
-        if not os.path.exists(overlay_path) or overwrite_overlay:
-            overlay_img = create_stationary_overlay(frames, overwrite=True)
-        else:
-            overlay_img = Image.open(overlay_path).convert('RGBA')
+        build_overlay = (not os.path.exists(overlay_path)
+                         or confirm(f"Overlay already exists at {overlay_path}. Overwrite?", args.overwrite))
+        if not build_overlay:
+            print("Keeping existing overlay.")
+    if not build_overlay and os.path.exists(overlay_path):
+        overlay_img = Image.open(overlay_path).convert('RGBA')
     # Masks prompt
+    mask_paths = []
     if do_masks:
-        mask_paths = [os.path.join(MASKS_DIR, f"{hour:02d}h{q:02d}m.png")
-                      for hour in range(24) for q in range(0, 60, 15)
-                      if os.path.exists(os.path.join(IMAGE_DIR, f"{hour:02d}h{q:02d}m.png"))]
+        mask_paths = [os.path.join(MASKS_DIR, f) for f in frames]
         existing_masks = [p for p in mask_paths if os.path.exists(p)]
-        if existing_masks and not overwrite_masks:
-            resp = input(f"Some mask files already exist in {MASKS_DIR}. Overwrite all? (y/n): ").strip().lower()
-            if resp == 'y':
-                overwrite_masks = True
-            else:
-                print("Keeping existing masks.")
-        if not existing_masks or overwrite_masks:
-            if overlay_img is None:
-                overlay_path = os.path.join(OVERLAY_DIR, 'stationary_overlay.png')
-                if not os.path.exists(overlay_path):
-                    print("Overlay not found. Please generate overlay first.")
-                    return
-                overlay_img = Image.open(overlay_path).convert('RGBA')
-            for hour in range(24):
-                for q in range(0, 60, 15):
-                    source_name = f"{hour:02d}h{q:02d}m.png"
-                    mask_path = os.path.join(MASKS_DIR, source_name)
-                    if not os.path.exists(os.path.join(IMAGE_DIR, source_name)):
-                        continue
-                    create_globe_mask(overlay_img, source_name, mask_path, overwrite=overwrite_masks)
+        if existing_masks and not confirm(f"Some mask files already exist in {MASKS_DIR}. Overwrite all?", args.overwrite):
+            print("Keeping existing masks.")
+            mask_paths = [p if not os.path.exists(p) else None for p in mask_paths]
+        if overlay_img is None and not build_overlay:
+            print("Overlay not found. Please generate overlay first.")
+            return
+    if not build_overlay and not any(mask_paths):
+        return
+
+    # One decode per keyframe feeds both the median overlay and every mask
+    overlay_img = build_overlay_and_masks(
+        [os.path.join(IMAGE_DIR, f) for f in frames],
+        mask_paths=mask_paths or None,
+        overlay=overlay_img,
+        tile_mb=args.tile_mb,
+        scratch_dir=args.scratch_dir
+    )
+    if build_overlay:
+        os.makedirs(OVERLAY_DIR, exist_ok=True)
+        overlay_img.save(overlay_path)
+        print(f"Saved overlay to {overlay_path}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
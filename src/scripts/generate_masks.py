@@ -1,9 +1,11 @@
 import os
 import re
+import sys
+import argparse
 from pathlib import Path
-from PIL import Image
-import numpy as np
-from scipy.ndimage import binary_dilation
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from overlay_builder import DEFAULT_SCRATCH_DIR, build_overlay_and_masks  # noqa: E402
 
 IMAGE_DIR = 'src/images/intervals15m/blackGlobeGreenOverlay'
 MASKS_DIR = 'src/images/masks'
@@ -23,41 +25,21 @@ def get_all_frames():
     ))
 
 
-def create_stationary_overlay(frames):
-    imgs = [np.array(Image.open(os.path.join(IMAGE_DIR, f)).convert('RGBA')) for f in frames]
-    imgs_stack = np.stack(imgs, axis=0)
-    median_img = np.median(imgs_stack, axis=0).astype(np.uint8)
-    overlay_img = Image.fromarray(median_img, 'RGBA')
-    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
-    overlay_img.save(os.path.join(OUTPUT_DIR, 'stationary_overlay.png'))
-    return overlay_img
-
-
-def create_globe_mask(overlay_img, source_frame, mask_path):
-    sample_img = Image.open(os.path.join(IMAGE_DIR, source_frame)).convert('RGBA')
-    overlay_arr = np.array(overlay_img)
-    sample_arr = np.array(sample_img)
-    diff = np.abs(sample_arr[..., :3].astype(np.int16) - overlay_arr[..., :3].astype(np.int16)).sum(axis=2)
-    mask = (diff > 30).astype(np.uint8) * 255
-    # No dilation (lines as thin as original)
-    # mask = binary_dilation(mask, iterations=0).astype(np.uint8) * 255
-    mask_img = Image.fromarray(mask, 'L')
-    Path(MASKS_DIR).mkdir(parents=True, exist_ok=True)
-    mask_img.save(mask_path)
-    print("Saved globe mask for {} as {}".format(source_frame, mask_path))
-    return mask_img
-
-
 def main():
+    parser = argparse.ArgumentParser(description='Build the stationary overlay and all globe masks')
+    parser.add_argument('--tile-mb', type=int, default=256, help='Memory budget for one row tile of all frames in MB (default: 256)')
+    parser.add_argument('--scratch-dir', help=f'Disk-backed directory for the decoded-frame scratch file (default: {DEFAULT_SCRATCH_DIR})')
+    args = parser.parse_args()
     frames = get_all_frames()
-    overlay_img = create_stationary_overlay(frames)
-    for hour in range(24):
-        for q in range(0, 60, 15):
-            source_name = f"{hour:02d}h{q:02d}m.png"
-            mask_path = os.path.join(MASKS_DIR, source_name)
-            if not os.path.exists(os.path.join(IMAGE_DIR, source_name)):
-                continue
-            create_globe_mask(overlay_img, source_name, mask_path)
+    # No dilation (lines as thin as original)
+    overlay_img = build_overlay_and_masks(
+        [os.path.join(IMAGE_DIR, f) for f in frames],
+        mask_paths=[os.path.join(MASKS_DIR, f) for f in frames],
+        tile_mb=args.tile_mb,
+        scratch_dir=args.scratch_dir
+    )
+    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
+    overlay_img.save(os.path.join(OUTPUT_DIR, 'stationary_overlay.png'))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Measure encode time, file size and decode time of each frame output format."""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from black_mode import BlackModeGenerator  # noqa: E402
+from frame_output import FrameEncoder  # noqa: E402
+
+# (output format, rgb) combinations worth comparing
+CANDIDATES = [
+    ('png', False),
+    ('png', True),
+    ('png-fast', False),
+    ('png-fast', True),
+    ('ppm', True),
+    ('bmp', True),
+]
+
+
+def best_of(repeats, func):
+    """Run func repeats times and return the fastest wall time in seconds."""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure published frame output formats')
+    parser.add_argument('--base-globe', default='src/images/base_globe.png', help='Globe image')
+    parser.add_argument('--overlay', default='src/images/stationary_overlay.png', help='Overlay image')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per measurement; the fastest is reported')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        generator = BlackModeGenerator(args.base_globe, args.overlay, temp_dir, save_debug=False)
+        frame = generator.render_at(datetime(2026, 1, 1, 17, 7, tzinfo=timezone.utc))
+
+        print(f"{'format':<10} {'alpha':<6} {'encode ms':>10} {'size MB':>8} {'decode ms':>10}")
+        for output_format, rgb in CANDIDATES:
+            encoder = FrameEncoder(output_format, rgb=rgb)
+            path = os.path.join(temp_dir, encoder.filename(f"frame-{output_format}-{rgb}"))
+            encode = best_of(args.repeats, lambda: encoder.save(frame, path))
+            decode = best_of(args.repeats, lambda: Image.open(path).load())
+            size = os.path.getsize(path) / 1e6
+            print(f"{output_format:<10} {'no' if encoder.rgb else 'yes':<6} {encode * 1000:>10.1f} {size:>8.2f} {decode * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
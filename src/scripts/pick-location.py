@@ -1,54 +1,46 @@
 import os
+import sys
+import argparse
 import configparser
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from projection import DEFAULT_TABLE_DIR, GLOBE_LON0, InverseProjection, load_locations  # noqa: E402
+from places import format_lat_lon, snap_place  # noqa: E402
 
 # Mode options and corresponding image paths
 MODES = {
     'black': os.path.join('src', 'images', 'intervals15m', 'blackGlobeGreenOverlay', '00h00m.png'),
     'xkcd': os.path.join('src', 'images', 'intervals15m', 'xkcdOriginal', '00h00m.png'),
 }
+# The black keyframe is the base globe turned to 00:00 UTC, which the projection is measured on
+BLACK_GLOBE_PATH = os.path.join('src', 'images', 'base_globe.png')
+# BlackModeGenerator.calculate_rotation at 00:00 UTC (degrees counter-clockwise, as Image.rotate)
+KEYFRAME_ROTATION = -195
+# Turning the south-pole projection about its center only shifts the meridian offset, so the
+# keyframe's pixels map to lat/lon with base_globe's geometry and this lon0
+KEYFRAME_LON0 = GLOBE_LON0 - KEYFRAME_ROTATION
 CONFIG_PATH = 'config.ini'
 
-# Prompt user for mode
-print("Select clock style for location pick:")
-print("  1. black (black globe with green overlay)")
-print("  2. xkcd (original XKCD now clock)")
-mode = ''
-while mode not in MODES:
-    choice = input("Enter 1 for black, 2 for xkcd: ").strip()
-    if choice == '1':
-        mode = 'black'
-    elif choice == '2':
-        mode = 'xkcd'
-    else:
-        print("Invalid choice. Please enter 1 or 2.")
-
-IMG_PATH = MODES[mode]
-
-# Load image
-img = mpimg.imread(IMG_PATH)
-
-print(f"Click on your approximate location in the {mode} image window.")
-
-fig, ax = plt.subplots()
-ax.imshow(img)
-coords = []
 
-# Click event handler
-def onclick(event):
-    if event.xdata is not None and event.ydata is not None:
-        x, y = int(event.xdata), int(event.ydata)
-        print(f"You clicked at: x={x}, y={y}")
-        coords.append((x, y))
-        plt.close()
+def ask_mode():
+    """Prompt user for mode."""
+    print("Select clock style for location pick:")
+    print("  1. black (black globe with green overlay)")
+    print("  2. xkcd (original XKCD now clock)")
+    mode = ''
+    while mode not in MODES:
+        choice = input("Enter 1 for black, 2 for xkcd: ").strip()
+        if choice == '1':
+            mode = 'black'
+        elif choice == '2':
+            mode = 'xkcd'
+        else:
+            print("Invalid choice. Please enter 1 or 2.")
+    return mode
 
-cid = fig.canvas.mpl_connect('button_press_event', onclick)
-plt.show()
 
-if coords:
-    x, y = coords[0]
-    # Write to config.ini
+def save_location(x, y, mode, lat=float('nan'), lon=float('nan')):
+    """Write the picked pixel to config.ini under [LOCATION]."""
     config = configparser.ConfigParser()
     if os.path.exists(CONFIG_PATH):
         config.read(CONFIG_PATH)
@@ -57,8 +49,86 @@ if coords:
     config['LOCATION']['x'] = str(x)
     config['LOCATION']['y'] = str(y)
     config['LOCATION']['mode'] = mode
+    if lat == lat:
+        config['LOCATION']['lat'] = f"{lat:.4f}"
+        config['LOCATION']['lon'] = f"{lon:.4f}"
     with open(CONFIG_PATH, 'w') as configfile:
         config.write(configfile)
     print(f"Coordinates saved to {CONFIG_PATH} under [LOCATION]: x={x}, y={y}, mode={mode}")
-else:
-    print("No location selected.") 
\ No newline at end of file
+
+
+def pick_with_mouse(img_path, mode, inverse=None):
+    """Open the keyframe in a window and return the clicked (x, y), or None."""
+    import matplotlib.pyplot as plt
+    import matplotlib.image as mpimg
+
+    img = mpimg.imread(img_path)
+    print(f"Click on your approximate location in the {mode} image window.")
+
+    fig, ax = plt.subplots()
+    ax.imshow(img)
+    if inverse is not None:
+        ax.format_coord = lambda x, y: f"x={int(x)}, y={int(y)}  {format_lat_lon(*(float(v) for v in inverse.lookup(int(x), int(y))))}"
+    coords = []
+
+    # Click event handler
+    def onclick(event):
+        if event.xdata is not None and event.ydata is not None:
+            x, y = int(event.xdata), int(event.ydata)
+            print(f"You clicked at: x={x}, y={y}")
+            coords.append((x, y))
+            plt.close()
+
+    fig.canvas.mpl_connect('button_press_event', onclick)
+    plt.show()
+    return coords[0] if coords else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pick the red dot location on a clock keyframe')
+    parser.add_argument('--mode', choices=sorted(MODES), help='Clock style to pick on (default: ask)')
+    parser.add_argument('--place', help="Place name or 'lat, lon' to snap to a pixel instead of clicking (black mode)")
+    parser.add_argument('--pixel', type=int, nargs=2, metavar=('X', 'Y'), help='Print the lat/lon under a pixel of the 00h00m keyframe and exit (black mode)')
+    parser.add_argument('--dry-run', action='store_true', help='Print the snapped pixel without writing config.ini')
+    parser.add_argument('--table-dir', default=DEFAULT_TABLE_DIR, help=f'Inverse projection table cache (default: {DEFAULT_TABLE_DIR})')
+    args = parser.parse_args()
+
+    mode = args.mode or ('black' if args.place or args.pixel else ask_mode())
+    if mode != 'black' and (args.place or args.pixel):
+        parser.error('--place and --pixel need the black globe; the xkcd artwork has no measured projection')
+    # Lat/lon readouts are only available for the black globe
+    inverse = InverseProjection.for_image(BLACK_GLOBE_PATH, args.table_dir, KEYFRAME_LON0) if mode == 'black' else None
+
+    if args.pixel:
+        x, y = args.pixel
+        print(f"x={x}, y={y}: {format_lat_lon(*(float(v) for v in inverse.lookup(x, y)))}")
+        return
+
+    if args.place:
+        config = configparser.ConfigParser()
+        config.read(CONFIG_PATH)
+        names, lats, lons = load_locations(config)
+        try:
+            label, place_lat, place_lon, x, y, lat, lon = snap_place(
+                inverse, args.place, dict(zip(names, zip(lats.tolist(), lons.tolist()))))
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"{label} ({place_lat:.4f}, {place_lon:.4f}) -> pixel x={x}, y={y} ({format_lat_lon(lat, lon)})")
+        if not args.dry_run:
+            save_location(x, y, mode, lat, lon)
+        return
+
+    picked = pick_with_mouse(MODES[mode], mode, inverse)
+    if picked:
+        x, y = picked
+        if inverse is not None:
+            lat, lon = (float(v) for v in inverse.lookup(x, y))
+            print(f"Under the pick: {format_lat_lon(lat, lon)}")
+            save_location(x, y, mode, lat, lon)
+        else:
+            save_location(x, y, mode)
+    else:
+        print("No location selected.")
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,19 @@
 import os
+import sys
+import argparse
 import configparser
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from projection import DEFAULT_TABLE_DIR, InverseProjection, load_locations  # noqa: E402
+from places import format_lat_lon, snap_place  # noqa: E402
 
 # Paths
 IMG_PATH = os.path.join('src', 'images', 'base_globe.png')
 CONFIG_PATH = 'config.ini'
 
-# Load image
-img = mpimg.imread(IMG_PATH)
-
-print("Click on your approximate location in the image window.")
-print("This will be used to place the red dot on the globe.")
-
-fig, ax = plt.subplots()
-ax.imshow(img)
-coords = []
-
-# Click event handler
-def onclick(event):
-    if event.xdata is not None and event.ydata is not None:
-        x, y = int(event.xdata), int(event.ydata)
-        print(f"You clicked at: x={x}, y={y}")
-        coords.append((x, y))
-        plt.close()
-
-cid = fig.canvas.mpl_connect('button_press_event', onclick)
-plt.show()
 
-if coords:
-    x, y = coords[0]
-    # Write to config.ini
+def save_location(x, y, lat, lon):
+    """Write the picked pixel (and what lies under it) to config.ini under [LOCATION]."""
     config = configparser.ConfigParser()
     if os.path.exists(CONFIG_PATH):
         config.read(CONFIG_PATH)
@@ -38,8 +21,80 @@ if coords:
         config['LOCATION'] = {}
     config['LOCATION']['x'] = str(x)
     config['LOCATION']['y'] = str(y)
+    if lat == lat:
+        config['LOCATION']['lat'] = f"{lat:.4f}"
+        config['LOCATION']['lon'] = f"{lon:.4f}"
     with open(CONFIG_PATH, 'w') as configfile:
         config.write(configfile)
-    print(f"Coordinates saved to {CONFIG_PATH} under [LOCATION]: x={x}, y={y}")
-else:
-    print("No location selected.") 
\ No newline at end of file
+    print(f"Coordinates saved to {CONFIG_PATH} under [LOCATION]: x={x}, y={y} ({format_lat_lon(lat, lon)})")
+
+
+def configured_places():
+    """The [LOCATIONS] entries of config.ini as name -> (lat, lon), for snapping by name."""
+    config = configparser.ConfigParser()
+    config.read(CONFIG_PATH)
+    names, lats, lons = load_locations(config)
+    return dict(zip(names, zip(lats.tolist(), lons.tolist())))
+
+
+def pick_with_mouse(inverse):
+    """Open the globe in a window; the status bar shows lat/lon under the cursor. Returns (x, y) or None."""
+    import matplotlib.pyplot as plt
+    import matplotlib.image as mpimg
+
+    img = mpimg.imread(IMG_PATH)
+    print("Click on your approximate location in the image window.")
+    print("This will be used to place the red dot on the globe.")
+
+    fig, ax = plt.subplots()
+    ax.imshow(img)
+    ax.format_coord = lambda x, y: f"x={int(x)}, y={int(y)}  {format_lat_lon(*(float(v) for v in inverse.lookup(int(x), int(y))))}"
+    coords = []
+
+    # Click event handler
+    def onclick(event):
+        if event.xdata is not None and event.ydata is not None:
+            x, y = int(event.xdata), int(event.ydata)
+            print(f"You clicked at: x={x}, y={y}")
+            coords.append((x, y))
+            plt.close()
+
+    fig.canvas.mpl_connect('button_press_event', onclick)
+    plt.show()
+    return coords[0] if coords else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pick the red dot location on the base globe')
+    parser.add_argument('--place', help="Place name or 'lat, lon' to snap to a pixel instead of clicking")
+    parser.add_argument('--pixel', type=int, nargs=2, metavar=('X', 'Y'), help='Print the lat/lon under a pixel and exit')
+    parser.add_argument('--dry-run', action='store_true', help='Print the snapped pixel without writing config.ini')
+    parser.add_argument('--table-dir', default=DEFAULT_TABLE_DIR, help=f'Inverse projection table cache (default: {DEFAULT_TABLE_DIR})')
+    args = parser.parse_args()
+
+    inverse = InverseProjection.for_image(IMG_PATH, args.table_dir)
+    if args.pixel:
+        x, y = args.pixel
+        print(f"x={x}, y={y}: {format_lat_lon(*(float(v) for v in inverse.lookup(x, y)))}")
+        return
+
+    if args.place:
+        try:
+            label, place_lat, place_lon, x, y, lat, lon = snap_place(inverse, args.place, configured_places())
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"{label} ({place_lat:.4f}, {place_lon:.4f}) -> pixel x={x}, y={y} ({format_lat_lon(lat, lon)})")
+        if not args.dry_run:
+            save_location(x, y, lat, lon)
+        return
+
+    picked = pick_with_mouse(inverse)
+    if picked:
+        x, y = picked
+        lat, lon = (float(v) for v in inverse.lookup(x, y))
+        save_location(x, y, lat, lon)
+    else:
+        print("No location selected.")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 import os
+import sys
 import math
 import re
-import subprocess
 from pathlib import Path
 import configparser
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from red_dot import DotSprite  # noqa: E402
 
 # --- Configuration ---
 IMAGE_DIR = 'src/images/intervals1m/blackGreenOverlay'  # Directory where your input images are located
@@ -31,9 +35,9 @@ else:
     INITIAL_VT_ABS_X = 638
     INITIAL_VT_ABS_Y = 873
 
-# Dot properties for ImageMagick
+# Dot properties
 DOT_RADIUS = 5         # Size of the central red dot
-DOT_COLOR = "red"
+DOT_COLOR = (255, 0, 0)
 GLOW_SIGMA = 4         # Intensity/spread of the glow (higher = more spread)
 GLOW_OPACITY = 60      # Opacity of the glow layer (0-100)
 
@@ -66,6 +70,9 @@ print(f"Calculated initial polar coordinates for Vermont (relative to center):")
 print(f"  Radius (R): {R:.2f} pixels")
 print(f"  Initial Angle (radians): {INITIAL_ANGLE_RAD:.2f} (approx {math.degrees(INITIAL_ANGLE_RAD):.2f} degrees)")
 print(f"  (Relative X: {INITIAL_VT_REL_X}, Relative Y: {INITIAL_VT_REL_Y})")
+# The glow sprite is built once and blended into each frame's dot box in memory
+sprite = DotSprite.gaussian(dot_radius=DOT_RADIUS, sigma=GLOW_SIGMA, glow_opacity=GLOW_OPACITY / 100.0, color=DOT_COLOR)
+
 print(f"Processing images. Output will be in '{OUTPUT_DIR}' directory.")
 
 # Get all relevant image files, sorted by time
@@ -115,56 +122,9 @@ for image_filename in image_files:
     print(f"Processing {image_filename} (Time: {current_hour:02d}:{current_minute:02d}):")
     print(f"  Rotation from base: {rotation_degrees:.2f} deg. Current Vermont at ({current_vt_abs_x}, {current_vt_abs_y})")
 
-    # ImageMagick command for adding the glowing dot (using 'convert' and mpr: for IM6)
-    magick_command = [
-        "convert",
-        str(input_path), # Load the original image FIRST to operate on it
-
-        # Create glow layer (transparent background) and store in memory register 'mpr:glow'
-        "(",
-            "-size", f"{IMAGE_WIDTH}x{IMAGE_HEIGHT}", "canvas:none", # Transparent canvas for glow
-            "-fill", f"rgba(255,255,255,{GLOW_OPACITY/100.0})", # Use RGBA for transparency
-            "-draw", f"circle {current_vt_abs_x},{current_vt_abs_y} {current_vt_abs_x},{current_vt_abs_y + DOT_RADIUS}",
-            "-blur", f"0x{GLOW_SIGMA}", # Apply blur
-            "+write", "mpr:glow", # Write to memory register 'glow'
-            "+delete", # Delete this temporary image from the current pipeline
-        ")",
-
-        # Now, composite the original image with the glow layer
-        "mpr:glow", # Recall glow from memory
-        "-composite", # Composite glow onto the original image (which is the current image in the pipeline)
-
-        # Create solid red dot layer (transparent background) and store in memory register 'mpr:dot'
-        "(",
-            "-size", f"{IMAGE_WIDTH}x{IMAGE_HEIGHT}", "canvas:none", # Transparent canvas for the dot
-            "-fill", DOT_COLOR, # Solid red
-            "-draw", f"circle {current_vt_abs_x},{current_vt_abs_y} {current_vt_abs_x},{current_vt_abs_y + DOT_RADIUS}",
-            "+write", "mpr:dot", # Write to memory register 'dot'
-            "+delete", # Delete this temporary image from the current pipeline
-        ")",
-
-        # Finally, composite the red dot onto the result (original + glow)
-        "mpr:dot", # Recall dot from memory
-        "-composite", # Composite dot onto the combined original+glow image
-
-        str(output_path) # Save final output
-    ]
-
-    try:
-        # Execute the ImageMagick command
-        subprocess.run(magick_command, check=True, capture_output=True, text=True)
-    except FileNotFoundError:
-        print("Error: 'convert' command not found. Please ensure ImageMagick is installed and in your system's PATH.")
-        break
-    except subprocess.CalledProcessError as e:
-        print(f"Error processing {image_filename}:")
-        print(f"Command: {' '.join(e.cmd)}")
-        print(f"Stderr: {e.stderr}")
-        print(f"Stdout: {e.stdout}")
-        break
-    except Exception as e:
-        print(f"An unexpected error occurred for {image_filename}: {e}")
-        break
+    image = Image.open(input_path)
+    sprite.stamp(image, current_vt_abs_x, current_vt_abs_y)
+    image.save(output_path)
 
 print("--- Script Finished ---")
 print(f"Processed images saved to '{OUTPUT_DIR}' directory.")
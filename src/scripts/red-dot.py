@@ -1,9 +1,13 @@
 import os
+import sys
 import math
 import re
-import subprocess
 from pathlib import Path
 import configparser
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from red_dot import DotSprite  # noqa: E402
 
 # --- Configuration ---
 CONFIG_PATH = 'config.ini'
@@ -54,9 +58,9 @@ CENTER_X = int(globe['center_x'])
 CENTER_Y = int(globe['center_y'])
 RADIUS = int(globe['radius'])
 
-# Dot properties for ImageMagick
+# Dot properties
 DOT_RADIUS = 5         # Size of the central red dot
-DOT_COLOR = "red"
+DOT_COLOR = (255, 0, 0)
 GLOW_SIGMA = 4         # Intensity/spread of the glow (higher = more spread)
 GLOW_OPACITY = 80      # Opacity of the glow layer (0-100)
 
@@ -94,6 +98,9 @@ user_rel_y = user_y - CENTER_Y
 user_r = math.sqrt(user_rel_x**2 + user_rel_y**2)
 user_theta = math.atan2(user_rel_y, user_rel_x)
 
+# The glow sprite is built once and blended into each frame's dot box in memory
+sprite = DotSprite.gaussian(dot_radius=DOT_RADIUS, sigma=GLOW_SIGMA, glow_opacity=GLOW_OPACITY / 100.0, color=DOT_COLOR)
+
 print(f"User pick ({clock_style} globe): x={user_x}, y={user_y}")
 print(f"  Polar: r={user_r:.2f}, theta={user_theta:.4f} radians ({math.degrees(user_theta):.2f} deg)")
 
@@ -150,38 +157,9 @@ for image_filename in image_files:
     print(f"Processing {image_filename} (Time: {current_hour:02d}:{current_minute:02d}):")
     print(f"  Rotation from base: {rotation_degrees:.2f} deg. Dot at ({current_abs_x}, {current_abs_y})")
 
-    # ImageMagick command for adding the glowing dot (using 'convert' for IM6)
-    temp_path = os.path.join(OUTPUT_DIR, f"temp_{image_filename}")
-    magick_command = [
-        "convert",
-        "-size", f"{IMAGE_WIDTH}x{IMAGE_HEIGHT}", "canvas:none",
-        "-fill", f"rgba(255,255,255,{GLOW_OPACITY/100.0})",
-        "-draw", f"circle {current_abs_x},{current_abs_y} {current_abs_x},{current_abs_y + DOT_RADIUS}",
-        "-blur", f"0x{GLOW_SIGMA}",
-        "-fill", DOT_COLOR,
-        "-draw", f"circle {current_abs_x},{current_abs_y} {current_abs_x},{current_abs_y + DOT_RADIUS}",
-        temp_path
-    ]
-    try:
-        subprocess.run(magick_command, check=True, capture_output=True, text=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error creating temporary image for {image_filename}: {e.stderr}")
-        continue
-
-    composite_command = [
-        "convert",
-        str(input_path),
-        temp_path,
-        "-composite",
-        str(output_path)
-    ]
-    try:
-        subprocess.run(composite_command, check=True, capture_output=True, text=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error compositing image for {image_filename}: {e.stderr}")
-        continue
-
-    os.remove(temp_path)
+    image = Image.open(input_path)
+    sprite.stamp(image, current_abs_x, current_abs_y)
+    image.save(output_path)
 
 print("--- Script Finished ---")
 print(f"Processed images saved to '{OUTPUT_DIR}' directory.")
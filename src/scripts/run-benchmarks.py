@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""Benchmark the render pipeline and the offline scripts, and compare against a stored baseline.
+
+Every stage runs in a fresh child process so its peak RSS is its own. Per stage this records
+wall and CPU time (median of --repeat runs, after one untimed warm-up), peak RSS, and from one
+extra run under tracemalloc the peak traced memory and the net number of allocated blocks.
+The first_frame stages launch black_mode.py the way the cron job does and measure the time
+from process launch to the first published frame against FIRST_FRAME_TARGETS_MS.
+The offline scripts run on a scratch workspace whose keyframes, masks and overlay are made
+from the bundled src/images assets, so no generated asset tree is needed.
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import runpy
+import shutil
+import platform
+import configparser
+import argparse
+import resource
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone, timedelta
+from PIL import Image
+import numpy as np
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(SRC_DIR)
+sys.path.insert(0, SRC_DIR)
+from black_mode import BlackModeGenerator  # noqa: E402
+from frame_output import FrameEncoder  # noqa: E402
+from overlay_builder import build_overlay_and_masks  # noqa: E402
+
+BASE_GLOBE = os.path.join(SRC_DIR, 'images', 'base_globe.png')
+OVERLAY = os.path.join(SRC_DIR, 'images', 'stationary_overlay.png')
+KEYFRAME_DIR = os.path.join('src', 'images', 'intervals15m', 'blackGlobeGreenOverlay')
+# A fixed instant so every run renders the same frames
+INSTANT = datetime(2026, 1, 1, 17, 7, tzinfo=timezone.utc)
+# Metrics compared against the baseline, with the smallest change worth reporting
+COMPARED_METRICS = {
+    'wall_ms': 5.0,
+    'cpu_ms': 5.0,
+    'peak_rss_mb': 5.0,
+    'traced_peak_mb': 1.0,
+    'first_frame_ms': 20.0,
+}
+# Start-to-first-frame targets on the reference machine (one core, png-fast --rgb output).
+# The warm run maps the decoded asset cache; the cold one decodes the PNGs.
+FIRST_FRAME_TARGETS_MS = {
+    'first_frame': 1000.0,
+    'first_frame_cold': 1300.0,
+}
+
+# name -> (setup(workspace) returning (run, operations per run), repeatable, traced).
+# run() may return a dict of extra per-run metrics, which are reported as medians.
+STAGES = {}
+
+
+def stage(name, repeatable=True, traced=True):
+    """Register a benchmark stage.
+
+    Scripts that only do work once per workspace are not repeatable; stages whose work
+    happens in another process are not traced.
+    """
+    def register(setup):
+        STAGES[name] = (setup, repeatable, traced)
+        return setup
+    return register
+
+
+def _generator(workspace):
+    return BlackModeGenerator(BASE_GLOBE, OVERLAY, os.path.join(workspace, 'temp'), save_debug=False)
+
+
+@stage('init')
+def bench_init(workspace):
+    return lambda: _generator(workspace), 1
+
+
+@stage('calculate_rotation')
+def bench_calculate_rotation(workspace):
+    generator = _generator(workspace)
+    instants = [INSTANT + timedelta(minutes=minute) for minute in range(1440)]
+    return lambda: [generator.calculate_rotation(instant) for instant in instants], len(instants)
+
+
+@stage('generate_frame')
+def bench_generate_frame(workspace):
+    generator = _generator(workspace)
+    times = [(hour, 7) for hour in range(0, 24, 3)]
+    return lambda: [generator.generate_frame(hour, minute) for hour, minute in times], len(times)
+
+
+@stage('add_red_dot')
+def bench_add_red_dot(workspace):
+    generator = _generator(workspace)
+    return lambda: generator.add_red_dot(639, 909), 1
+
+
+def _bench_save(output_format):
+    def setup(workspace):
+        frame = _generator(workspace).render_at(INSTANT).copy()
+        encoder = FrameEncoder(output_format)
+        path = os.path.join(workspace, encoder.filename('bench-frame'))
+        return lambda: encoder.save(frame, path), 1
+    return setup
+
+
+stage('save_png')(_bench_save('png'))
+stage('save_png_fast')(_bench_save('png-fast'))
+
+
+def _bench_first_frame(*flags):
+    def setup(workspace):
+        temp_dir = os.path.join(workspace, 'first-frame')
+        trace_path = os.path.join(temp_dir, 'spans.jsonl')
+        command = [
+            sys.executable, os.path.join(SRC_DIR, 'black_mode.py'), '--base-globe', BASE_GLOBE, '--overlay', OVERLAY,
+            '--temp-dir', temp_dir, '--output-format', 'png-fast', '--rgb', '--no-debug-frames',
+            '--asset-cache-dir', os.path.join(workspace, 'assets'), '--trace-file', trace_path, *flags
+        ]
+
+        def run():
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            launched = time.time()
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+            # The first publish span ends when current_frame is in place
+            with open(trace_path) as f:
+                published = next(entry['time'] for entry in map(json.loads, f) if entry['span'] == 'publish')
+            return {'first_frame_ms': (published - launched) * 1000}
+        return run, 1
+    return setup
+
+
+stage('first_frame', traced=False)(_bench_first_frame())
+stage('first_frame_cold', traced=False)(_bench_first_frame('--no-asset-cache'))
+
+
+def _run_script(name, workspace, *argv):
+    """Run a script from src/scripts in-process, with the workspace as its working directory."""
+    path = os.path.join(SRC_DIR, 'scripts', name)
+    saved_argv, saved_cwd = sys.argv, os.getcwd()
+    sys.argv = [path, *argv]
+    os.chdir(workspace)
+    try:
+        runpy.run_path(path, run_name='__main__')
+    finally:
+        sys.argv = saved_argv
+        os.chdir(saved_cwd)
+
+
+def _keyframe_count(workspace):
+    return len(os.listdir(os.path.join(workspace, KEYFRAME_DIR)))
+
+
+@stage('generate-masks', repeatable=False)
+def bench_generate_masks(workspace):
+    return lambda: _run_script('generate-masks.py', workspace, '--overwrite'), _keyframe_count(workspace)
+
+
+@stage('generate-frames', repeatable=False)
+def bench_generate_frames(workspace):
+    shutil.rmtree(os.path.join(workspace, 'src', 'images', 'intervals1m'), ignore_errors=True)
+    return lambda: _run_script('generate-frames.py', workspace, '--yes', '--workers', '1'), 15 * _keyframe_count(workspace)
+
+
+@stage('red-dot', repeatable=False)
+def bench_red_dot(workspace):
+    shutil.rmtree(os.path.join(workspace, 'src', 'images', 'intervals15m', 'blackGlobeGreenOverlayRedDot'), ignore_errors=True)
+    return lambda: _run_script('red-dot.py', workspace), _keyframe_count(workspace)
+
+
+def build_workspace(workspace, keyframes):
+    """Scratch asset tree for the offline scripts: keyframes rendered from the bundled globe, masks and overlay."""
+    keyframe_dir = os.path.join(workspace, KEYFRAME_DIR)
+    os.makedirs(keyframe_dir, exist_ok=True)
+    generator = _generator(workspace)
+    paths = []
+    for index in range(keyframes):
+        local = datetime(2026, 1, 1) + timedelta(minutes=15 * index)
+        path = os.path.join(keyframe_dir, f"{local.hour:02d}h{local.minute:02d}m.png")
+        generator.render_at(local.astimezone()).save(path)
+        paths.append(path)
+    masks_dir = os.path.join(workspace, 'src', 'images', 'masks')
+    overlays_dir = os.path.join(workspace, 'src', 'images', 'overlays')
+    os.makedirs(masks_dir, exist_ok=True)
+    os.makedirs(overlays_dir, exist_ok=True)
+    overlay = build_overlay_and_masks(paths, mask_paths=[os.path.join(masks_dir, os.path.basename(p)) for p in paths])
+    overlay.save(os.path.join(overlays_dir, 'stationary_overlay.png'))
+    # The repo config, pointed at the 15-minute black keyframes
+    config = configparser.ConfigParser()
+    config.read(os.path.join(REPO_DIR, 'config.ini'))
+    config['DEFAULT'].update({'image_style': 'black', 'interval': '15m'})
+    config['LOCATION'].setdefault('mode', 'black')
+    with open(os.path.join(workspace, 'config.ini'), 'w') as f:
+        config.write(f)
+
+
+def _cpu_seconds():
+    """CPU time of this process and its finished children (worker pools of the scripts)."""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def _peak_rss_mb():
+    """Peak resident set of this process or its largest child, in MB.
+
+    Linux carries ru_maxrss across exec, so a child would report its parent's peak;
+    VmHWM in /proc is reset by exec and is used where it exists.
+    """
+    scale = 1 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    try:
+        with open('/proc/self/status') as f:
+            own = next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmHWM:'))
+    except (OSError, StopIteration):
+        pass
+    return max(own, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale) / 1e6
+
+
+def measure(name, workspace, repeat):
+    """Run one stage in this process and return its metrics."""
+    setup, repeatable, traced = STAGES[name]
+    run, operations = setup(workspace)
+    rss_before = _peak_rss_mb()
+    if repeatable:
+        run()  # warm-up: lazy imports, first-touch allocations
+    else:
+        repeat = 1
+    walls, cpus, extras = [], [], {}
+    for _ in range(repeat):
+        gc.collect()
+        cpu_started, started = _cpu_seconds(), time.perf_counter()
+        extra = run()
+        walls.append(time.perf_counter() - started)
+        cpus.append(_cpu_seconds() - cpu_started)
+        for key, value in (extra if isinstance(extra, dict) else {}).items():
+            extras.setdefault(key, []).append(value)
+    metrics = {
+        'operations': operations,
+        'runs': repeat,
+        'wall_ms': statistics.median(walls) * 1000,
+        'cpu_ms': statistics.median(cpus) * 1000,
+        'peak_rss_mb': _peak_rss_mb(),
+        'setup_rss_mb': rss_before,
+    }
+    metrics.update({key: statistics.median(values) for key, values in extras.items()})
+    if repeatable and traced:
+        gc.collect()
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        run()
+        metrics['traced_peak_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        metrics['allocated_blocks'] = sys.getallocatedblocks() - blocks
+    return metrics
+
+
+def run_stage_in_child(name, workspace, repeat):
+    """Measure a stage in a fresh interpreter; returns its metrics or {'error': ...}."""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', name, '--workspace', workspace, '--repeat', str(repeat)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        return {'error': (result.stderr.strip().splitlines() or ['exit status %d' % result.returncode])[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def environment():
+    """Where the numbers came from; baselines are only comparable on the same machine."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pillow': Image.__version__,
+        'numpy': np.__version__,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print each compared metric against the baseline; returns the regressions as strings."""
+    regressions = []
+    print(f"{'stage':<20} {'metric':<15} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, metrics in results.items():
+        base = baseline['stages'].get(name)
+        if base is None or 'error' in base or 'error' in metrics:
+            continue
+        for metric, floor in COMPARED_METRICS.items():
+            if metric not in metrics or metric not in base:
+                continue
+            old, new = base[metric], metrics[metric]
+            change = (new - old) / old if old else 0.0
+            regressed = change > threshold and new - old > floor
+            flag = '  REGRESSION' if regressed else ''
+            print(f"{name:<20} {metric:<15} {old:>10.1f} {new:>10.1f} {change:>+8.1%}{flag}")
+            if regressed:
+                regressions.append(f"{name} {metric} {old:.1f} -> {new:.1f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the render pipeline against a stored baseline')
+    parser.add_argument('--stages', help=f"Comma-separated stages (default: all of {', '.join(STAGES)})")
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per repeatable stage; the median is kept (default: 5)')
+    parser.add_argument('--keyframes', type=int, default=1, help='Keyframes in the scratch workspace for the offline scripts (default: 1)')
+    parser.add_argument('--workspace', help='Scratch workspace for the offline scripts (default: a temporary directory)')
+    parser.add_argument('--save', metavar='PATH', help='Write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='Compare against a JSON baseline; exit status 1 on regression')
+    parser.add_argument('--threshold', type=float, default=15.0, help='Relative increase counted as a regression, in percent (default: 15)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.workspace, args.repeat)))
+        return
+
+    names = args.stages.split(',') if args.stages else list(STAGES)
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stage(s) {', '.join(unknown)}, expected some of {', '.join(STAGES)}")
+    if args.repeat < 1 or args.keyframes < 1:
+        parser.error('--repeat and --keyframes must be at least 1')
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    workspace = args.workspace or tempfile.mkdtemp(prefix='randall-clock-bench-')
+    try:
+        if any(not STAGES[name][1] for name in names) and not os.path.isdir(os.path.join(workspace, KEYFRAME_DIR)):
+            print(f"Building scratch workspace with {args.keyframes} keyframe(s) in {workspace}")
+            build_workspace(workspace, args.keyframes)
+
+        results = {}
+        print(f"{'stage':<20} {'ops':>5} {'wall ms':>10} {'cpu ms':>10} {'ms/op':>9} {'peak MB':>8} {'traced MB':>9} {'blocks':>8}")
+        for name in names:
+            metrics = results[name] = run_stage_in_child(name, workspace, args.repeat)
+            if 'error' in metrics:
+                print(f"{name:<20} failed: {metrics['error']}")
+                continue
+            traced = f"{metrics['traced_peak_mb']:.1f}" if 'traced_peak_mb' in metrics else '-'
+            blocks = str(metrics['allocated_blocks']) if 'allocated_blocks' in metrics else '-'
+            print(f"{name:<20} {metrics['operations']:>5} {metrics['wall_ms']:>10.1f} {metrics['cpu_ms']:>10.1f} "
+                  f"{metrics['wall_ms'] / metrics['operations']:>9.3f} {metrics['peak_rss_mb']:>8.1f} {traced:>9} {blocks:>8}")
+    finally:
+        if not args.workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    missed = []
+    for name, target in FIRST_FRAME_TARGETS_MS.items():
+        first_frame = results.get(name, {}).get('first_frame_ms')
+        if first_frame is not None:
+            print(f"{name}: {first_frame:.0f} ms from launch to first frame, target {target:.0f} ms"
+                  f"{'' if first_frame <= target else '  MISSED'}")
+            if first_frame > target:
+                missed.append(name)
+
+    report = {'environment': environment(), 'repeat': args.repeat, 'keyframes': args.keyframes, 'stages': results}
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved baseline to {args.save}")
+
+    failed = [name for name, metrics in results.items() if 'error' in metrics]
+    if baseline is not None:
+        print()
+        if baseline.get('environment', {}).get('host') != report['environment']['host']:
+            print(f"Warning: baseline was recorded on {baseline.get('environment', {}).get('host')!r}; timings may not be comparable")
+        regressions = compare(results, baseline, args.threshold / 100.0)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:g}%:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:g}%")
+    if failed:
+        sys.exit(f"Failed stages: {', '.join(failed)}")
+    if missed:
+        sys.exit(f"Missed start-to-first-frame target: {', '.join(missed)}")
+
+if __name__ == "__main__":
+    main()
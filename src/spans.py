@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import logging
+import resource
+import threading
+import contextlib
+import tracemalloc
+
+METRIC_PREFIX = 'randall_clock_span'
+
+
+class SpanRecorder:
+    """Named render stages timed with a monotonic clock, kept as per-stage totals.
+
+    ``span(name)`` times a block with ``time.perf_counter_ns``. With trace_path every
+    finished span is appended to that file as one JSON line; with metrics_path ``flush``
+    rewrites it in the Prometheus textfile-collector format (node_exporter
+    ``--collector.textfile.directory``). Without either it only keeps the totals, which
+    costs about a microsecond per span. Spans may finish on several threads. While
+    tracemalloc is tracing (``--profile``) each span also records how far traced memory
+    rose above its starting point.
+    """
+
+    def __init__(self, trace_path=None, metrics_path=None):
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.stages = {}  # name -> [count, total ns, last ns, max ns]
+        self.memory = {}  # name -> largest traced peak in bytes, only under tracemalloc
+        self.traced_peak = 0  # overall traced peak, which the per-span resets hide from tracemalloc
+        self._lock = threading.Lock()
+        self._trace = None
+        if trace_path:
+            os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+            self._trace = open(trace_path, 'a', buffering=1)
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """Time the enclosed block as one span of stage name; attributes go to the JSON line."""
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # Nested spans reset the peak too, so an outer span only sees the rise after its last inner one
+            base, peak = tracemalloc.get_traced_memory()
+            self.traced_peak = max(self.traced_peak, peak)
+            tracemalloc.reset_peak()
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter_ns() - started
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.traced_peak = max(self.traced_peak, peak)
+                attributes['traced_peak_bytes'] = max(peak - base, 0)
+            self.record(name, started, duration, attributes)
+
+    def record(self, name, started_ns, duration_ns, attributes=None):
+        """Add a finished span; started_ns is on the perf_counter_ns clock."""
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = [0, 0, 0, 0]
+            stats[0] += 1
+            stats[1] += duration_ns
+            stats[2] = duration_ns
+            stats[3] = max(stats[3], duration_ns)
+            if attributes and 'traced_peak_bytes' in attributes:
+                self.memory[name] = max(self.memory.get(name, 0), attributes['traced_peak_bytes'])
+            if self._trace is not None:
+                entry = {'time': round(time.time(), 6), 'span': name, 'start_ns': started_ns,
+                         'duration_ms': round(duration_ns / 1e6, 3), 'pid': os.getpid()}
+                entry.update(attributes or {})
+                self._trace.write(json.dumps(entry) + '\n')
+
+    def snapshot(self):
+        """Per-stage count and total/last/max seconds, in first-seen order."""
+        with self._lock:
+            return {
+                name: {'count': count, 'total_seconds': total / 1e9, 'last_seconds': last / 1e9, 'max_seconds': peak / 1e9}
+                for name, (count, total, last, peak) in self.stages.items()
+            }
+
+    def prometheus(self):
+        """The totals as Prometheus text exposition: a summary plus last and max gauges per stage."""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_seconds Time spent in each render stage.",
+            f"# TYPE {METRIC_PREFIX}_seconds summary",
+        ]
+        for name, stats in snapshot.items():
+            lines.append(f'{METRIC_PREFIX}_seconds_sum{{stage="{name}"}} {stats["total_seconds"]:.9f}')
+            lines.append(f'{METRIC_PREFIX}_seconds_count{{stage="{name}"}} {stats["count"]}')
+        for key, help_text in (('last', 'Duration of the latest span of each render stage.'),
+                               ('max', 'Longest span of each render stage since the process started.')):
+            lines.append(f"# HELP {METRIC_PREFIX}_{key}_seconds {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{key}_seconds gauge")
+            for name, stats in snapshot.items():
+                lines.append(f'{METRIC_PREFIX}_{key}_seconds{{stage="{name}"}} {stats[f"{key}_seconds"]:.9f}')
+        lines.append(f"# HELP {METRIC_PREFIX}_exported_timestamp_seconds When these metrics were written.")
+        lines.append(f"# TYPE {METRIC_PREFIX}_exported_timestamp_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_exported_timestamp_seconds {time.time():.3f}")
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """Rewrite the metrics file (atomically, so the collector never reads half of it)."""
+        if not self.metrics_path:
+            return
+        tmp_path = f"{self.metrics_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(self.prometheus())
+            os.replace(tmp_path, self.metrics_path)
+        except OSError as e:
+            logging.warning(f"Could not write span metrics to {self.metrics_path}: {e}")
+
+    def summary(self):
+        """Table of the stage totals for humans."""
+        memory = dict(self.memory)
+        lines = [f"{'stage':<16} {'count':>6} {'total ms':>10} {'mean ms':>9} {'last ms':>9} {'max ms':>9}"
+                 + (f" {'traced MB':>9}" if memory else '')]
+        for name, stats in self.snapshot().items():
+            line = (f"{name:<16} {stats['count']:>6} {stats['total_seconds'] * 1000:>10.1f} "
+                    f"{stats['total_seconds'] * 1000 / stats['count']:>9.2f} "
+                    f"{stats['last_seconds'] * 1000:>9.2f} {stats['max_seconds'] * 1000:>9.2f}")
+            if memory:
+                line += f" {memory.get(name, 0) / 1e6:>9.1f}"
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def close(self):
+        self.flush()
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+
+
+@contextlib.contextmanager
+def profiled(stats_path, spans=None, top=15):
+    """Run the enclosed block under cProfile and tracemalloc and print where the time and memory went.
+
+    The raw profile is written to stats_path (open it with ``python -m pstats`` or snakeviz).
+    tracemalloc sees Python and NumPy allocations but not Pillow's image buffers, which only
+    show in the peak RSS. It also slows allocation-heavy code down, so timings run high.
+    """
+    # Imported here so that normal runs do not pay for the profilers
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        if spans is not None:
+            peak = max(peak, spans.traced_peak)
+        tracemalloc.stop()
+        os.makedirs(os.path.dirname(os.path.abspath(stats_path)), exist_ok=True)
+        profiler.dump_stats(stats_path)
+
+        # ru_maxrss is in KB on Linux
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / 1e6
+        print(f"\n=== Profile: {elapsed:.2f}s wall, peak RSS {rss:.0f} MB, traced memory {current / 1e6:.1f} MB now, "
+              f"{peak / 1e6:.1f} MB peak ===")
+        if spans is not None and spans.stages:
+            print(spans.summary())
+        print(f"\nTop {top} functions by cumulative time:")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
+        print(f"Full profile written to {stats_path}")
+        logging.info(f"Profile ({elapsed:.2f}s, {peak / 1e6:.1f} MB traced peak) written to {stats_path}")
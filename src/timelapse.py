@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+import io
+import sys
+import queue
+import struct
+import zlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from PIL import Image
+import numpy as np
+
+# Frames rendered ahead of the encoders; with the encoders' own frames this bounds memory
+DEFAULT_PREFETCH = 2
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def frame_instants(start, end, step):
+    """Instants from start (inclusive) to end (exclusive), step apart, e.g. 1440 for a day at one minute."""
+    if step.total_seconds() <= 0:
+        raise ValueError('The timelapse step must be positive')
+    instant = start
+    while instant < end:
+        yield instant
+        instant += step
+
+
+def frame_count(start, end, step):
+    """Number of frames frame_instants yields, without generating them."""
+    return max(-(-(end - start) // step), 0)
+
+
+def render_stream(renderer, instants, prefetch=DEFAULT_PREFETCH):
+    """Lazily yield (instant, RGBA array) for each instant, rendered on a background thread.
+
+    The renderer reuses one canvas, so every frame is copied before it is handed over, and
+    at most ``prefetch`` copies wait in the queue: memory does not grow with the range.
+    Closing the iterator early stops the render thread.
+    """
+    frames = queue.Queue(maxsize=max(prefetch, 1))
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for instant in instants:
+                if not put((instant, np.array(renderer.render_at(instant)))):
+                    return
+        except BaseException as e:  # handed to the consumer, which re-raises it
+            put(e)
+            return
+        put(done)
+
+    thread = threading.Thread(target=produce, name='timelapse-render', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = frames.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def flatten(pixels):
+    """An RGBA array composited onto black as RGB, the way the desktop shows it."""
+    image = Image.new('RGB', (pixels.shape[1], pixels.shape[0]))
+    frame = Image.fromarray(pixels, 'RGBA')
+    image.paste(frame, (0, 0), frame)
+    return image
+
+
+def _chunks(data, offset):
+    """(type, payload) of each chunk in a PNG (length-first) stream."""
+    while offset < len(data):
+        length, kind = struct.unpack('>I4s', data[offset:offset + 8])
+        yield kind, data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+
+
+def _riff_chunks(data, offset):
+    """(type, payload) of each chunk in a RIFF (little-endian, even-padded) stream."""
+    while offset < len(data):
+        kind, length = struct.unpack('<4sI', data[offset:offset + 8])
+        yield kind, data[offset + 8:offset + 8 + length]
+        offset += 8 + length + (length & 1)
+
+
+def _png_chunk(kind, payload):
+    return struct.pack('>I', len(payload)) + kind + payload + struct.pack('>I', zlib.crc32(kind + payload))
+
+
+def _riff_chunk(kind, payload):
+    return kind + struct.pack('<I', len(payload)) + payload + (b'\x00' if len(payload) & 1 else b'')
+
+
+class TimelapseWriter:
+    """Shared state of the timelapse writers (ApngWriter, WebpWriter, RawWriter).
+
+    Each writer has ``encode(index, pixels)``, which is thread-safe, and ``write(encoded)``,
+    which export_timelapse calls with the results in frame order.
+
+    After the first frame only ``box`` (left, top, right, bottom) is encoded, when given:
+    the generator's frames only ever change inside the globe mask, so the animation keeps
+    the previous frame outside it.
+    """
+
+    def __init__(self, fp, size, count, fps, loop=0, rgb=False, box=None):
+        self.fp = fp
+        self.size = size
+        self.count = count
+        self.fps = fps
+        self.loop = loop
+        self.rgb = rgb
+        self.box = box
+        self.written = 0
+
+    def region(self, index, pixels):
+        """(box, image) to encode for frame index: the whole frame first, then only the changing box."""
+        box = (0, 0) + self.size
+        if index and self.box:
+            box = self.box
+            pixels = pixels[box[1]:box[3], box[0]:box[2]]
+        return box, flatten(pixels) if self.rgb else Image.fromarray(pixels, 'RGBA')
+
+    def close(self):
+        self.fp.flush()
+
+
+class ApngWriter(TimelapseWriter):
+    """Animated PNG written frame by frame.
+
+    Each frame is encoded by Pillow as a standalone PNG and its IDAT data moved into the
+    animation's fcTL/fdAT chunks, so nothing but the current frame is held (Pillow's own
+    ``save_all`` keeps every frame until the end).
+    """
+
+    def __init__(self, fp, size, count, fps, loop=0, rgb=False, box=None, compress_level=6):
+        super().__init__(fp, size, count, fps, loop, rgb, box)
+        self.compress_level = compress_level
+        self.delay = (1 / Fraction(fps).limit_denominator(1000)).limit_denominator(65535)
+        self.sequence = 0
+        color_type = 2 if rgb else 6
+        self.fp.write(PNG_SIGNATURE)
+        self.fp.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', size[0], size[1], 8, color_type, 0, 0, 0)))
+        self.fp.write(_png_chunk(b'acTL', struct.pack('>II', count, loop)))
+
+    def encode(self, index, pixels):
+        box, image = self.region(index, pixels)
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG', compress_level=self.compress_level)
+        data = b''.join(payload for kind, payload in _chunks(buffer.getvalue(), len(PNG_SIGNATURE)) if kind == b'IDAT')
+        return index, box, data
+
+    def write(self, encoded):
+        index, (left, top, right, bottom), data = encoded
+        # Source blending: the box replaces what was there, alpha included
+        self.fp.write(_png_chunk(b'fcTL', struct.pack(
+            '>IIIIIHHBB', self.sequence, right - left, bottom - top, left, top,
+            self.delay.numerator, self.delay.denominator, 0, 0)))
+        self.sequence += 1
+        if index == 0:
+            self.fp.write(_png_chunk(b'IDAT', data))
+        else:
+            self.fp.write(_png_chunk(b'fdAT', struct.pack('>I', self.sequence) + data))
+            self.sequence += 1
+        self.written += 1
+
+    def close(self):
+        if self.written != self.count:
+            raise ValueError(f"APNG declared {self.count} frames but {self.written} were written")
+        self.fp.write(_png_chunk(b'IEND', b''))
+        super().close()
+
+
+class WebpWriter(TimelapseWriter):
+    """Animated WebP written frame by frame into ANMF chunks.
+
+    Frames are encoded by Pillow as standalone WebP images (lossy with lossless alpha, or
+    lossless). The RIFF header carries the file size, so it is patched in on close and the
+    output must be seekable.
+    """
+
+    def __init__(self, fp, size, count, fps, loop=0, rgb=False, box=None, quality=90, lossless=False):
+        if box:
+            # ANMF offsets are stored halved, so the box must start on even coordinates
+            box = (box[0] & ~1, box[1] & ~1) + tuple(box[2:])
+        super().__init__(fp, size, count, fps, loop, rgb, box)
+        if not fp.seekable():
+            raise ValueError('Animated WebP needs a seekable output file, not a pipe')
+        self.quality = quality
+        self.lossless = lossless
+        self.duration = round(1000 / fps)
+        self.start = fp.tell()
+        flags = 0x02 | (0 if rgb else 0x10)  # animation, alpha
+        vp8x = struct.pack('<I', flags) + (size[0] - 1).to_bytes(3, 'little') + (size[1] - 1).to_bytes(3, 'little')
+        # Background black, opaque; viewers may ignore it
+        anim = struct.pack('<4BH', 0, 0, 0, 255, loop)
+        self.fp.write(b'RIFF' + b'\x00\x00\x00\x00' + b'WEBP' + _riff_chunk(b'VP8X', vp8x) + _riff_chunk(b'ANIM', anim))
+
+    def encode(self, index, pixels):
+        box, image = self.region(index, pixels)
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=self.quality, alpha_quality=100, lossless=self.lossless, method=4)
+        data = b''.join(_riff_chunk(kind, payload) for kind, payload in _riff_chunks(buffer.getvalue(), 12)
+                        if kind in (b'ALPH', b'VP8 ', b'VP8L'))
+        return index, box, data
+
+    def write(self, encoded):
+        index, (left, top, right, bottom), data = encoded
+        header = (
+            (left // 2).to_bytes(3, 'little') + (top // 2).to_bytes(3, 'little')
+            + (right - left - 1).to_bytes(3, 'little') + (bottom - top - 1).to_bytes(3, 'little')
+            + self.duration.to_bytes(3, 'little')
+            + bytes([0x02])  # do not blend, do not dispose: the box replaces what was there
+        )
+        self.fp.write(_riff_chunk(b'ANMF', header + data))
+        self.written += 1
+
+    def close(self):
+        end = self.fp.tell()
+        self.fp.seek(self.start + 4)
+        self.fp.write(struct.pack('<I', end - self.start - 8))
+        self.fp.seek(end)
+        super().close()
+
+
+class RawWriter(TimelapseWriter):
+    """Raw RGB24 frames back to back, for piping into an external encoder such as ffmpeg."""
+
+    def __init__(self, fp, size, count, fps, loop=0, rgb=True, box=None):
+        # Always whole RGB frames: a raw stream has no way to say what changed
+        super().__init__(fp, size, count, fps, loop, True, None)
+
+    def encode(self, index, pixels):
+        return flatten(pixels).tobytes()
+
+    def write(self, encoded):
+        self.fp.write(encoded)
+        self.written += 1
+
+
+# name -> (writer class, file extension)
+TIMELAPSE_FORMATS = {
+    'apng': (ApngWriter, 'png'),
+    'webp': (WebpWriter, 'webp'),
+    'raw': (RawWriter, 'rgb'),
+}
+
+
+def export_timelapse(renderer, instants, writer, workers=1, prefetch=DEFAULT_PREFETCH, progress=None):
+    """Render instants and stream them through writer, overlapping rendering and encoding.
+
+    One thread renders (the renderer's canvas is not thread-safe) while ``workers`` threads
+    encode; Pillow releases the GIL in rotation and compression, so the stages overlap.
+    Results are written in order, so only the prefetched frames and about two per encoder
+    are alive at any time. progress, if given, is called with the count after each write.
+    """
+    pending = deque()
+
+    def write_oldest():
+        writer.write(pending.popleft().result())
+        if progress:
+            progress(writer.written)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='timelapse-encode') as executor:
+        for index, (_, pixels) in enumerate(render_stream(renderer, instants, prefetch)):
+            pending.append(executor.submit(writer.encode, index, pixels))
+            while len(pending) > workers:
+                write_oldest()
+        while pending:
+            write_oldest()
+    writer.close()
+    logging.info(f"Exported {writer.written} timelapse frames with {type(writer).__name__}")
+    return writer.written
+
+
+def open_output(path):
+    """The binary file to write to; '-' is stdout."""
+    if path == '-':
+        return sys.stdout.buffer
+    return open(path, 'wb')
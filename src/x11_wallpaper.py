@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+
+import os
+import glob
+import math
+import ctypes
+import ctypes.util
+import logging
+import numpy as np
+from PIL import Image
+
+# Xlib constants
+_ZPIXMAP = 2
+_LSB_FIRST = 0
+_PROP_MODE_REPLACE = 0
+_RETAIN_PERMANENT = 1
+_XA_PIXMAP = 20
+_ANY_PROPERTY_TYPE = 0
+_SUCCESS = 0
+
+# System V shared memory constants
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+
+
+class _XImage(ctypes.Structure):
+    """Leading fields of Xlib's XImage (enough to read the pixel layout)."""
+    _fields_ = [
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p),
+        ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int),
+        ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int),
+        ('bits_per_pixel', ctypes.c_int),
+        ('red_mask', ctypes.c_ulong),
+        ('green_mask', ctypes.c_ulong),
+        ('blue_mask', ctypes.c_ulong),
+    ]
+
+
+class _XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('display', ctypes.c_void_p),
+        ('resourceid', ctypes.c_ulong),
+        ('serial', ctypes.c_ulong),
+        ('error_code', ctypes.c_ubyte),
+        ('request_code', ctypes.c_ubyte),
+        ('minor_code', ctypes.c_ubyte),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong),
+        ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p),
+        ('readOnly', ctypes.c_int),
+    ]
+
+
+_XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(_XErrorEvent))
+_xlib = None
+_xext = None
+_libc = None
+_x_errors = []
+
+
+@_XErrorHandler
+def _record_x_error(display, event):
+    """Collect X protocol errors instead of letting Xlib exit the process."""
+    _x_errors.append((event.contents.error_code, event.contents.request_code))
+    return 0
+
+
+def _load_libraries():
+    """Load libX11 (required), libXext (for MIT-SHM) and libc, declaring the functions used."""
+    global _xlib, _xext, _libc
+    if _xlib is not None:
+        return
+    path = ctypes.util.find_library('X11')
+    if path is None:
+        raise RuntimeError("libX11 not found; install it or use --publish-command with feh")
+    xlib = ctypes.cdll.LoadLibrary(path)
+    c_ulong, c_int, c_uint, c_void_p = ctypes.c_ulong, ctypes.c_int, ctypes.c_uint, ctypes.c_void_p
+    signatures = {
+        'XInitThreads': (c_int, []),
+        'XOpenDisplay': (c_void_p, [ctypes.c_char_p]),
+        'XCloseDisplay': (c_int, [c_void_p]),
+        'XDefaultScreen': (c_int, [c_void_p]),
+        'XRootWindow': (c_ulong, [c_void_p, c_int]),
+        'XDisplayWidth': (c_int, [c_void_p, c_int]),
+        'XDisplayHeight': (c_int, [c_void_p, c_int]),
+        'XDefaultDepth': (c_int, [c_void_p, c_int]),
+        'XDefaultVisual': (c_void_p, [c_void_p, c_int]),
+        'XDefaultGC': (c_void_p, [c_void_p, c_int]),
+        'XCreatePixmap': (c_ulong, [c_void_p, c_ulong, c_uint, c_uint, c_uint]),
+        'XInternAtom': (c_ulong, [c_void_p, ctypes.c_char_p, c_int]),
+        'XGetWindowProperty': (c_int, [c_void_p, c_ulong, c_ulong, ctypes.c_long, ctypes.c_long, c_int, c_ulong,
+                                       ctypes.POINTER(c_ulong), ctypes.POINTER(c_int), ctypes.POINTER(c_ulong),
+                                       ctypes.POINTER(c_ulong), ctypes.POINTER(c_void_p)]),
+        'XChangeProperty': (c_int, [c_void_p, c_ulong, c_ulong, c_ulong, c_int, c_int, c_void_p, c_int]),
+        'XSetWindowBackgroundPixmap': (c_int, [c_void_p, c_ulong, c_ulong]),
+        'XClearWindow': (c_int, [c_void_p, c_ulong]),
+        'XClearArea': (c_int, [c_void_p, c_ulong, c_int, c_int, c_uint, c_uint, c_int]),
+        'XKillClient': (c_int, [c_void_p, c_ulong]),
+        'XSetCloseDownMode': (c_int, [c_void_p, c_int]),
+        'XCreateImage': (ctypes.POINTER(_XImage), [c_void_p, c_void_p, c_uint, c_int, c_int, c_void_p,
+                                                   c_uint, c_uint, c_int, c_int]),
+        'XPutImage': (c_int, [c_void_p, c_ulong, c_void_p, ctypes.POINTER(_XImage), c_int, c_int, c_int, c_int,
+                              c_uint, c_uint]),
+        'XFlush': (c_int, [c_void_p]),
+        'XSync': (c_int, [c_void_p, c_int]),
+        'XFree': (c_int, [c_void_p]),
+        'XSetErrorHandler': (c_void_p, [_XErrorHandler]),
+    }
+    for name, (restype, argtypes) in signatures.items():
+        func = getattr(xlib, name)
+        func.restype = restype
+        func.argtypes = argtypes
+
+    xext = None
+    xext_path = ctypes.util.find_library('Xext')
+    if xext_path is not None:
+        xext = ctypes.cdll.LoadLibrary(xext_path)
+        shm_signatures = {
+            'XShmQueryExtension': (c_int, [c_void_p]),
+            'XShmCreateImage': (ctypes.POINTER(_XImage), [c_void_p, c_void_p, c_uint, c_int, c_void_p,
+                                                          ctypes.POINTER(_XShmSegmentInfo), c_uint, c_uint]),
+            'XShmAttach': (c_int, [c_void_p, ctypes.POINTER(_XShmSegmentInfo)]),
+            'XShmDetach': (c_int, [c_void_p, ctypes.POINTER(_XShmSegmentInfo)]),
+            'XShmPutImage': (c_int, [c_void_p, c_ulong, c_void_p, ctypes.POINTER(_XImage), c_int, c_int, c_int,
+                                     c_int, c_uint, c_uint, c_int]),
+        }
+        for name, (restype, argtypes) in shm_signatures.items():
+            func = getattr(xext, name)
+            func.restype = restype
+            func.argtypes = argtypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.shmget.restype = c_int
+    libc.shmget.argtypes = [c_int, ctypes.c_size_t, c_int]
+    libc.shmat.restype = c_void_p
+    libc.shmat.argtypes = [c_int, c_void_p, c_int]
+    libc.shmdt.restype = c_int
+    libc.shmdt.argtypes = [c_void_p]
+    libc.shmctl.restype = c_int
+    libc.shmctl.argtypes = [c_int, c_int, c_void_p]
+
+    xlib.XInitThreads()
+    _xlib, _xext, _libc = xlib, xext, libc
+
+
+def pick_display():
+    """Return a usable display name: $DISPLAY if its socket exists, else the first local X socket.
+
+    After GPU/driver changes X may be on :1 instead of :0.
+    """
+    display = os.environ.get('DISPLAY')
+    if display and (not display.startswith(':') or os.path.exists(f"/tmp/.X11-unix/X{display[1:].split('.')[0]}")):
+        return display
+    for sock in sorted(glob.glob('/tmp/.X11-unix/X[0-9]*')):
+        return ':' + sock.rsplit('X', 1)[1]
+    return display
+
+
+def pick_xauthority():
+    """Point XAUTHORITY at the first existing cookie file (GDM keeps it under /run/user/<uid>)."""
+    for candidate in (f"/run/user/{os.getuid()}/gdm/Xauthority", os.path.expanduser('~/.Xauthority')):
+        if os.path.isfile(candidate):
+            os.environ['XAUTHORITY'] = candidate
+            return candidate
+    return os.environ.get('XAUTHORITY')
+
+
+def fit_rect(image_size, screen_size):
+    """Placement (x, y, width, height) of an image scaled to fit the screen and centered, like feh --bg-max."""
+    scale = min(screen_size[0] / image_size[0], screen_size[1] / image_size[1])
+    width = max(int(image_size[0] * scale), 1)
+    height = max(int(image_size[1] * scale), 1)
+    return ((screen_size[0] - width) // 2, (screen_size[1] - height) // 2, width, height)
+
+
+def scaled_patch(frame, rect, placement, resample=Image.BILINEAR):
+    """Scale the part of frame inside rect to its on-screen pixels, flattened onto black.
+
+    Returns (x, y, rgb array) in placement coordinates. The source box is chosen so the
+    patch matches a full-frame resize at that position (to within one level of rounding).
+    """
+    fw, fh = frame.size
+    dw, dh = placement[2:]
+    sx, sy = dw / fw, dh / fh
+    left, top, right, bottom = rect
+    x0, y0 = int(math.floor(left * sx)), int(math.floor(top * sy))
+    x1, y1 = min(int(math.ceil(right * sx)), dw), min(int(math.ceil(bottom * sy)), dh)
+    box = (x0 / sx, y0 / sy, x1 / sx, y1 / sy)
+
+    # Crop with enough margin for the filter support so the scaled pixels see the same inputs
+    margin = int(math.ceil(max(1 / sx, 1 / sy, 1.0))) * 3
+    crop = (max(int(box[0]) - margin, 0), max(int(box[1]) - margin, 0),
+            min(int(math.ceil(box[2])) + margin, fw), min(int(math.ceil(box[3])) + margin, fh))
+    region = frame.crop(crop)
+    flat = Image.new('RGB', region.size)
+    flat.paste(region, (0, 0), region if region.mode == 'RGBA' else None)
+    local_box = (box[0] - crop[0], box[1] - crop[1], box[2] - crop[0], box[3] - crop[1])
+    scaled = flat.resize((x1 - x0, y1 - y0), resample, box=local_box)
+    return x0, y0, np.asarray(scaled)
+
+
+class X11RootWallpaper:
+    """Set the X root window background in-process, keeping one pixmap across updates.
+
+    The backend owns the root pixmap advertised through ``_XROOTPMAP_ID`` and
+    ``ESETROOT_PMAP_ID`` (so compositors and pseudo-transparent terminals pick it up) and
+    retains it after exit, like feh and Esetroot. The first frame is uploaded whole; later
+    frames upload only the changed rectangle, through MIT-SHM when the server is local and
+    supports it. Frames are scaled to fit the screen on black, matching ``feh --image-bg
+    black --bg-max``.
+    """
+
+    def __init__(self, display_name=None, use_shm=True):
+        _load_libraries()
+        pick_xauthority()
+        self.display_name = display_name or pick_display()
+        self.display = _xlib.XOpenDisplay(self.display_name.encode() if self.display_name else None)
+        if not self.display:
+            raise RuntimeError(f"Cannot open X display {self.display_name!r}")
+        _xlib.XSetErrorHandler(_record_x_error)
+
+        screen = _xlib.XDefaultScreen(self.display)
+        self.root = _xlib.XRootWindow(self.display, screen)
+        self.screen_size = (_xlib.XDisplayWidth(self.display, screen), _xlib.XDisplayHeight(self.display, screen))
+        self.depth = _xlib.XDefaultDepth(self.display, screen)
+        self._visual = _xlib.XDefaultVisual(self.display, screen)
+        self._gc = _xlib.XDefaultGC(self.display, screen)
+        if self.depth not in (24, 32):
+            raise RuntimeError(f"Unsupported X root depth {self.depth}; only TrueColor 24/32-bit displays are handled")
+
+        self._shm_info = None
+        self._image = None
+        self.pixels = None
+        self.shm = use_shm and self._create_shm_image()
+        if not self.shm:
+            self._create_plain_image()
+        self._channel_offsets = self._rgb_offsets()
+
+        self._placement = None
+        self._full_shown = False
+        self.pixmap = self._take_root_pixmap()
+        logging.info(f"X11 wallpaper on {self.display_name}: {self.screen_size[0]}x{self.screen_size[1]}, "
+                     f"depth {self.depth}, MIT-SHM {'on' if self.shm else 'off'}")
+
+    def _create_shm_image(self):
+        """Allocate the screen-sized upload image in shared memory; False if MIT-SHM is unusable."""
+        if _xext is None or not _xext.XShmQueryExtension(self.display):
+            return False
+        width, height = self.screen_size
+        info = _XShmSegmentInfo()
+        image = _xext.XShmCreateImage(self.display, self._visual, self.depth, _ZPIXMAP, None,
+                                      ctypes.byref(info), width, height)
+        if not image:
+            return False
+        size = image.contents.bytes_per_line * height
+        info.shmid = _libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+        if info.shmid < 0:
+            _xlib.XFree(image)
+            return False
+        info.shmaddr = _libc.shmat(info.shmid, None, 0)
+        info.readOnly = 0
+        image.contents.data = info.shmaddr
+
+        # Attaching fails (asynchronously) on remote displays; sync to see the error
+        del _x_errors[:]
+        attached = _xext.XShmAttach(self.display, ctypes.byref(info))
+        _xlib.XSync(self.display, 0)
+        # The segment is freed once both sides detach
+        _libc.shmctl(info.shmid, _IPC_RMID, None)
+        if not attached or _x_errors:
+            del _x_errors[:]
+            _libc.shmdt(info.shmaddr)
+            image.contents.data = None
+            _xlib.XFree(image)
+            logging.info("MIT-SHM attach failed, falling back to XPutImage")
+            return False
+
+        self._shm_info = info
+        self._image = image
+        buffer = (ctypes.c_uint8 * size).from_address(info.shmaddr)
+        self.pixels = np.frombuffer(buffer, dtype=np.uint8).reshape(height, image.contents.bytes_per_line)
+        return True
+
+    def _create_plain_image(self):
+        """Allocate the screen-sized upload image in process memory for XPutImage."""
+        width, height = self.screen_size
+        self._buffer = np.zeros((height, width * 4), dtype=np.uint8)
+        self._image = _xlib.XCreateImage(self.display, self._visual, self.depth, _ZPIXMAP, 0,
+                                         self._buffer.ctypes.data, width, height, 32, width * 4)
+        if not self._image or self._image.contents.bits_per_pixel != 32:
+            raise RuntimeError("X server does not use 32 bits per pixel for the root depth")
+        self.pixels = self._buffer
+
+    def _rgb_offsets(self):
+        """Byte offsets of R, G and B within a 32-bit pixel of the upload image."""
+        image = self._image.contents
+        if image.bits_per_pixel != 32:
+            raise RuntimeError("X server does not use 32 bits per pixel for the root depth")
+        offsets = []
+        for mask in (image.red_mask, image.green_mask, image.blue_mask):
+            shift = (mask & -mask).bit_length() - 1
+            byte = shift // 8
+            offsets.append(byte if image.byte_order == _LSB_FIRST else 3 - byte)
+        return tuple(offsets)
+
+    def _get_pixmap_property(self, atom):
+        actual_type = ctypes.c_ulong()
+        actual_format = ctypes.c_int()
+        nitems = ctypes.c_ulong()
+        bytes_after = ctypes.c_ulong()
+        data = ctypes.c_void_p()
+        status = _xlib.XGetWindowProperty(self.display, self.root, atom, 0, 1, 0, _ANY_PROPERTY_TYPE,
+                                          ctypes.byref(actual_type), ctypes.byref(actual_format),
+                                          ctypes.byref(nitems), ctypes.byref(bytes_after), ctypes.byref(data))
+        if status != _SUCCESS or not data.value:
+            return None
+        try:
+            if actual_type.value != _XA_PIXMAP or nitems.value != 1:
+                return None
+            return ctypes.cast(data, ctypes.POINTER(ctypes.c_ulong)).contents.value
+        finally:
+            _xlib.XFree(data)
+
+    def _take_root_pixmap(self):
+        """Create our root pixmap, free the previous setter's retained one, and advertise ours."""
+        xrootpmap = _xlib.XInternAtom(self.display, b'_XROOTPMAP_ID', 0)
+        esetroot = _xlib.XInternAtom(self.display, b'ESETROOT_PMAP_ID', 0)
+
+        # Esetroot convention: when both properties name the same pixmap, its owner retained it for us to kill
+        previous = self._get_pixmap_property(xrootpmap)
+        if previous is not None and previous == self._get_pixmap_property(esetroot):
+            del _x_errors[:]
+            _xlib.XKillClient(self.display, previous)
+            _xlib.XSync(self.display, 0)
+            del _x_errors[:]
+
+        width, height = self.screen_size
+        pixmap = _xlib.XCreatePixmap(self.display, self.root, width, height, self.depth)
+        value = ctypes.c_ulong(pixmap)
+        for atom in (xrootpmap, esetroot):
+            _xlib.XChangeProperty(self.display, self.root, atom, _XA_PIXMAP, 32, _PROP_MODE_REPLACE,
+                                  ctypes.byref(value), 1)
+        _xlib.XSetWindowBackgroundPixmap(self.display, self.root, pixmap)
+        # Keep the pixmap after this connection closes, so the wallpaper outlives the daemon
+        _xlib.XSetCloseDownMode(self.display, _RETAIN_PERMANENT)
+        _xlib.XSync(self.display, 0)
+        return pixmap
+
+    def prepare(self, frame, rect=None):
+        """Scale the changed part of a frame for the screen; safe to call off the X thread.
+
+        rect is the changed (left, top, right, bottom) region in frame pixels; the whole
+        frame is used for the first upload or when the frame size changes.
+        """
+        placement = fit_rect(frame.size, self.screen_size)
+        full = rect is None or not self._full_shown or placement != self._placement
+        if full:
+            rect = (0, 0) + frame.size
+        x, y, rgb = scaled_patch(frame, rect, placement)
+        return (placement, full, x + placement[0], y + placement[1], rgb)
+
+    def apply(self, patch):
+        """Copy a prepared patch into the root pixmap and repaint that part of the root window."""
+        placement, full, x, y, rgb = patch
+        height, width = rgb.shape[:2]
+        pixels = self.pixels.reshape(self.screen_size[1], -1, 4)
+        if full:
+            # Everything outside the fitted frame is the black border
+            pixels[...] = 0
+        target = pixels[y:y + height, x:x + width]
+        for channel, offset in enumerate(self._channel_offsets):
+            target[..., offset] = rgb[..., channel]
+
+        if full:
+            x, y, width, height = 0, 0, self.screen_size[0], self.screen_size[1]
+        if self.shm:
+            _xext.XShmPutImage(self.display, self.pixmap, self._gc, self._image, x, y, x, y, width, height, 0)
+        else:
+            _xlib.XPutImage(self.display, self.pixmap, self._gc, self._image, x, y, x, y, width, height)
+        _xlib.XClearArea(self.display, self.root, x, y, width, height, 0)
+        # The shared buffer must not be rewritten until the server has read it
+        _xlib.XSync(self.display, 0)
+        if _x_errors:
+            logging.warning(f"X errors during wallpaper upload (error, request): {_x_errors[:]}")
+            del _x_errors[:]
+        self._placement = placement
+        self._full_shown = self._full_shown or full
+        logging.info(f"Uploaded {width}x{height} wallpaper rectangle at ({x}, {y})")
+
+    def show(self, frame, rect=None):
+        """Prepare and apply a frame in one step."""
+        self.apply(self.prepare(frame, rect))
+
+    def close(self):
+        """Detach shared memory and disconnect; the retained pixmap stays on the root window."""
+        if self.display is None:
+            return
+        if self._shm_info is not None:
+            _xext.XShmDetach(self.display, ctypes.byref(self._shm_info))
+            _xlib.XSync(self.display, 0)
+            _libc.shmdt(self._shm_info.shmaddr)
+            self._shm_info = None
+        if self._image is not None:
+            # The pixel buffer is not Xlib's to free
+            self._image.contents.data = None
+            _xlib.XFree(self._image)
+            self._image = None
+        _xlib.XCloseDisplay(self.display)
+        self.display = None
@@ -0,0 +1,38 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(REPO_DIR, 'src')
+sys.path.insert(0, SRC_DIR)
+
+from frame_output import FrameEncoder  # noqa: E402
+from spans import SpanRecorder  # noqa: E402
+
+
+class FakeGenerator:
+    """Stands in for BlackModeGenerator: small solid frames whose colour encodes the render count."""
+
+    def __init__(self, output_format='ppm', size=(16, 12)):
+        self.output = FrameEncoder(output_format)
+        self.spans = SpanRecorder()
+        self.size = size
+        self.roi = (0, 0) + size
+        self.rotation_engine = SimpleNamespace(radius=100)
+        self.rendered = []
+
+    def calculate_rotation(self, instant=None):
+        seconds = instant.hour * 3600 + instant.minute * 60 + instant.second
+        return -(seconds * 360 / 86400 + 195)
+
+    def render_at(self, instant):
+        self.rendered.append(instant)
+        return Image.new('RGBA', self.size, (len(self.rendered) % 256, 0, 0, 255))
+
+
+@pytest.fixture
+def fake_generator():
+    return FakeGenerator()
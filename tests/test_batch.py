@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from batch import BatchFrame, UserFrameStores
+from frame_output import FrameEncoder
+from frame_store import FrameStore
+
+NAMES = [f"user{index}" for index in range(8)]
+
+
+def user_frames(round_index, size=(320, 240)):
+    """A BatchFrame whose patch covers each user's whole frame in a colour of its own."""
+    base = np.zeros((size[1], size[0], 4), dtype=np.uint8)
+    patches = {}
+    for index, name in enumerate(NAMES):
+        region = np.empty_like(base)
+        region[...] = (30 * index, round_index, 255 - 30 * index, 255)
+        patches[name] = ((0, 0), region)
+    return BatchFrame(base, patches)
+
+
+@pytest.mark.parametrize('output_format, rgb', [('ppm', False), ('bmp', False), ('png-fast', True)])
+def test_concurrent_publish_keeps_each_users_frame(tmp_path, output_format, rgb):
+    encoder = FrameEncoder(output_format, rgb=rgb)
+    stores = UserFrameStores(FrameStore(str(tmp_path), encoder), NAMES, workers=4)
+    for round_index in range(5):
+        paths = stores.publish(user_frames(round_index))
+        for index, path in enumerate(paths):
+            with Image.open(path) as image:
+                colours = image.convert('RGB').getcolors()
+            assert colours == [(320 * 240, (30 * index, round_index, 255 - 30 * index))], path
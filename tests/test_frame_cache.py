@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from frame_cache import FrameCache, config_digest, quantize_angle
+
+
+def frame(value, size=(32, 32)):
+    return Image.new('RGBA', size, (value, 255 - value, 0, 255))
+
+
+def test_quantize_angle_wraps_into_a_turn():
+    assert quantize_angle(-0.1, 0.25) == 0.0
+    assert quantize_angle(-90.1, 0.25) == 270.0
+    assert quantize_angle(361.3, 0.25) == 1.25
+
+
+def test_config_digest_depends_on_every_part():
+    assert config_digest(globe='a', dot=1) == config_digest(dot=1, globe='a')
+    assert config_digest(globe='a', dot=1) != config_digest(globe='a', dot=2)
+
+
+def test_round_trip_and_miss(tmp_path):
+    cache = FrameCache(str(tmp_path))
+    assert cache.get('ns', 10.0) is None
+    cache.put('ns', 10.0, frame(7))
+    assert np.array_equal(np.asarray(cache.get('ns', 10.0)), np.asarray(frame(7)))
+    assert cache.get('other', 10.0) is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_entries_survive_a_restart(tmp_path):
+    FrameCache(str(tmp_path)).put('ns', 1.25, frame(3))
+    cache = FrameCache(str(tmp_path))
+    assert cache.stats()['entries'] == 1
+    assert np.array_equal(np.asarray(cache.get('ns', 1.25)), np.asarray(frame(3)))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = FrameCache(str(tmp_path))
+    for angle in (1.0, 2.0, 3.0):
+        cache.put('ns', angle, frame(int(angle)))
+    # Give the entries distinct ages, then make 1.0 the most recently used
+    for age, angle in enumerate((1.0, 2.0, 3.0)):
+        path = cache._path('ns', angle)
+        os.utime(path, (1000 + age, 1000 + age))
+        cache._index[path] = (cache._index[path][0], 1000 + age)
+    assert cache.get('ns', 1.0) is not None
+    cache.max_bytes = cache.stats()['bytes'] - 1
+    cache._evict()
+    assert cache.get('ns', 2.0) is None
+    assert cache.get('ns', 1.0) is not None and cache.get('ns', 3.0) is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_memory_tier_returns_copies(tmp_path):
+    cache = FrameCache(str(tmp_path), memory_entries=1)
+    cache.put('ns', 5.0, frame(9))
+    os.unlink(cache._path('ns', 5.0))  # served from memory, not disk
+    first = cache.get('ns', 5.0)
+    first.paste((0, 0, 0, 0), (0, 0, 32, 32))
+    assert np.array_equal(np.asarray(cache.get('ns', 5.0)), np.asarray(frame(9)))
+
+
+def test_unreadable_entry_is_dropped(tmp_path):
+    cache = FrameCache(str(tmp_path))
+    cache.put('ns', 4.0, frame(1))
+    with open(cache._path('ns', 4.0), 'wb') as f:
+        f.write(b'not a png')
+    assert cache.get('ns', 4.0) is None
+    assert cache.stats()['entries'] == 0
+    assert not os.path.exists(cache._path('ns', 4.0))
@@ -0,0 +1,122 @@
+import http.client
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from frame_server import FrameServer
+
+INSTANT = datetime(2026, 6, 21, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def server():
+    server = FrameServer(port=0, names=('left', 'right'))
+    server.start()
+    yield server
+    server.stop()
+
+
+def request(server, path, method='GET', headers=None):
+    connection = http.client.HTTPConnection(*server.address, timeout=10)
+    try:
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def publish(server, left=b'P6 left', right=b'P6 right', instant=INSTANT):
+    server.publish([left, right], 'image/x-portable-pixmap', instant, instant + timedelta(minutes=1))
+
+
+def test_503_before_the_first_frame(server):
+    status, headers, _ = request(server, '/frame')
+    assert status == 503
+    assert headers['Retry-After'] == '1'
+
+
+def test_serves_each_output(server):
+    publish(server)
+    status, headers, body = request(server, '/frame')
+    assert (status, body) == (200, b'P6 left')
+    assert headers['Content-Type'] == 'image/x-portable-pixmap'
+    assert headers['Last-Modified'] == format_datetime(INSTANT, usegmt=True)
+    assert request(server, '/frame/right')[2] == b'P6 right'
+    status, headers, body = request(server, '/frame/right', method='HEAD')
+    assert (status, body, headers['Content-Length']) == (200, b'', '8')
+
+
+@pytest.mark.parametrize('path', ['/', '/frames', '/frame/middle', '/frame/left/later', '/frame/left/next/more'])
+def test_unknown_paths_are_404(server, path):
+    publish(server)
+    assert request(server, path)[0] == 404
+
+
+def test_conditional_requests(server):
+    publish(server)
+    etag = request(server, '/frame')[1]['ETag']
+    assert request(server, '/frame', headers={'If-None-Match': etag})[0] == 304
+    assert request(server, '/frame', headers={'If-None-Match': f'"other", W/{etag}'})[0] == 304
+    assert request(server, '/frame', headers={'If-None-Match': '"other"'})[0] == 200
+    since = format_datetime(INSTANT, usegmt=True)
+    assert request(server, '/frame', headers={'If-Modified-Since': since})[0] == 304
+    earlier = format_datetime(INSTANT - timedelta(minutes=1), usegmt=True)
+    assert request(server, '/frame', headers={'If-Modified-Since': earlier})[0] == 200
+    # If-None-Match wins over If-Modified-Since
+    assert request(server, '/frame', headers={'If-None-Match': '"other"', 'If-Modified-Since': since})[0] == 200
+    assert server.stats()['not_modified'] == 3
+
+
+def test_long_poll_wakes_on_publish(server):
+    publish(server)
+    etag = request(server, '/frame')[1]['ETag']
+    later = INSTANT + timedelta(minutes=1)
+    timer = threading.Timer(0.2, publish, (server, b'P6 new left', b'P6 new right', later))
+    timer.start()
+    try:
+        started = time.monotonic()
+        status, headers, body = request(server, '/frame/next?timeout=10', headers={'If-None-Match': etag})
+    finally:
+        timer.join()
+    assert (status, body) == (200, b'P6 new left')
+    assert time.monotonic() - started < 5
+    assert headers['ETag'] != etag
+
+
+@pytest.mark.parametrize('headers, query', [
+    ({}, ''),
+    ({'If-None-Match': 'ETAG'}, ''),
+    ({}, '&after=ETAG'),
+    ({}, '&after=BARE'),
+])
+def test_long_poll_times_out_with_304(server, headers, query):
+    publish(server)
+    etag = request(server, '/frame/right')[1]['ETag']
+    headers = {key: value.replace('ETAG', etag) for key, value in headers.items()}
+    query = query.replace('ETAG', etag).replace('BARE', etag.strip('"'))
+    status, response_headers, body = request(server, f'/frame/right/next?timeout=0.1{query}', headers=headers)
+    assert (status, body) == (304, b'')
+    assert response_headers['ETag'] == etag
+
+
+def test_long_poll_after_an_old_frame_answers_at_once(server):
+    publish(server)
+    status, _, body = request(server, '/frame/next?timeout=10&after="old"')
+    assert (status, body) == (200, b'P6 left')
+
+
+@pytest.mark.parametrize('timeout', ['soon', 'nan', 'inf', '-inf', '1e999'])
+def test_bad_poll_timeout_is_400(server, timeout):
+    publish(server)
+    assert request(server, f'/frame/next?timeout={timeout}')[0] == 400
+
+
+def test_negative_poll_timeout_answers_at_once(server):
+    publish(server)
+    started = time.monotonic()
+    assert request(server, '/frame/next?timeout=-5')[0] == 304
+    assert time.monotonic() - started < 5
@@ -0,0 +1,165 @@
+import http.client
+import ipaddress
+import json
+import os
+import re
+import threading
+
+import pytest
+
+import geo_service
+from conftest import REPO_DIR
+from geo_service import GeoHTTPServer, GeoService, LookupCache, RangeDatabase
+
+EXAMPLE_CSV = os.path.join(REPO_DIR, 'web', 'deploy', 'geo-ranges.example.csv')
+GEO_JS = os.path.join(REPO_DIR, 'web', 'js', 'geo.js')
+
+
+@pytest.fixture(scope='module')
+def database():
+    return RangeDatabase(EXAMPLE_CSV)
+
+
+@pytest.fixture
+def service():
+    return GeoService(EXAMPLE_CSV)
+
+
+@pytest.mark.parametrize('ip, city', [
+    ('192.0.2.0', 'Montpelier'),
+    ('192.0.2.127', 'Montpelier'),
+    ('192.0.2.128', 'London'),
+    ('198.51.100.42', 'Tokyo'),
+    ('203.0.113.255', 'Sydney'),
+    ('2001:db8::1', 'Buenos Aires'),
+    ('2001:db8:ffff:ffff:ffff:ffff:ffff:ffff', 'Buenos Aires'),
+])
+def test_lookup_finds_the_range(database, ip, city):
+    assert database.lookup(ipaddress.ip_address(ip))[2] == city
+
+
+@pytest.mark.parametrize('ip', ['0.0.0.0', '192.0.1.255', '192.0.3.0', '198.51.101.0', '255.255.255.255',
+                                '::', '2001:db7:ffff::', '2001:db9::'])
+def test_lookup_misses_gaps_and_ends(database, ip):
+    assert database.lookup(ipaddress.ip_address(ip)) is None
+
+
+def test_database_layouts_and_order(tmp_path, database):
+    # DB-IP's 8-column layout, shuffled, with the families mixed
+    path = tmp_path / 'dbip.csv'
+    path.write_text(
+        '2001:db8::,2001:db8::ffff,SA,AR,Buenos Aires,Buenos Aires,-34.6037,-58.3816\n'
+        '203.0.113.0,203.0.113.255,OC,AU,New South Wales,Sydney,-33.8688,151.2093\n'
+        '192.0.2.0,192.0.2.127,NA,US,Vermont,Montpelier,44.2601,-72.5754\n'
+    )
+    shuffled = RangeDatabase(str(path))
+    assert shuffled.ranges == 3
+    assert shuffled.lookup(ipaddress.ip_address('192.0.2.5')) == database.lookup(ipaddress.ip_address('192.0.2.5'))
+    assert shuffled.lookup(ipaddress.ip_address('203.0.113.9'))[2] == 'Sydney'
+    assert shuffled.lookup(ipaddress.ip_address('2001:db8::1:0')) is None
+
+
+@pytest.mark.parametrize('row', ['192.0.2.0,192.0.2.9,US,Vermont,Montpelier,44.26',
+                                 '192.0.2.9,192.0.2.0,US,Vermont,Montpelier,44.26,-72.57',
+                                 '192.0.2.0,2001:db8::,US,Vermont,Montpelier,44.26,-72.57'])
+def test_bad_rows_are_rejected(tmp_path, row):
+    path = tmp_path / 'bad.csv'
+    path.write_text('192.0.2.128,192.0.2.255,GB,England,London,51.5072,-0.1276\n' + row + '\n')
+    with pytest.raises(ValueError, match='bad.csv:2'):
+        RangeDatabase(str(path))
+
+
+def test_answers(service):
+    assert service.answer('192.0.2.5') == {
+        'ip': '192.0.2.5', 'success': True, 'type': 'IPv4', 'country': 'US', 'country_code': 'US',
+        'region': 'Vermont', 'city': 'Montpelier', 'latitude': 44.2601, 'longitude': -72.5754,
+    }
+    assert service.answer('2001:db8::1')['type'] == 'IPv6'
+    # Dual-stack listeners see IPv4 clients as mapped addresses
+    mapped = service.answer('::ffff:198.51.100.7')
+    assert (mapped['ip'], mapped['type'], mapped['city']) == ('198.51.100.7', 'IPv4', 'Tokyo')
+    assert service.answer('10.1.2.3') == {'ip': '10.1.2.3', 'success': False, 'type': 'IPv4', 'message': 'Reserved range'}
+    assert service.answer('fe80::1')['message'] == 'Reserved range'
+    assert service.answer('8.8.8.8')['message'] == 'IP address not found'
+    assert service.answer('not-an-ip') == {'ip': 'not-an-ip', 'success': False, 'message': 'Invalid IP address'}
+
+
+def test_answer_has_what_parse_ip_who_reads(service):
+    source = open(GEO_JS).read()
+    body = re.search(r'function parseIpWho\(data\) \{(.*?)\n  \}', source, re.S).group(1)
+    fields = set(re.findall(r'data\.(\w+)', body))
+    assert fields == {'success', 'message', 'latitude', 'longitude', 'city', 'region', 'country'}
+    found = json.loads(service.encoded('203.0.113.1'))
+    assert found['success'] is True
+    assert isinstance(found['latitude'], float) and isinstance(found['longitude'], float)
+    assert all(isinstance(found[field], str) for field in ('city', 'region', 'country'))
+    missing = json.loads(service.encoded('8.8.4.4'))
+    assert missing['success'] is False and missing['message']
+
+
+def test_cache_evicts_least_recently_used():
+    cache = LookupCache(max_entries=2, ttl=60)
+    cache.put('a', b'1')
+    cache.put('b', b'2')
+    assert cache.get('a') == b'1'
+    cache.put('c', b'3')
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (b'1', b'3')
+    assert cache.stats() == {'entries': 2, 'hits': 3, 'misses': 1}
+
+
+def test_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(geo_service.time, 'monotonic', lambda: now[0])
+    cache = LookupCache(max_entries=10, ttl=60)
+    cache.put('a', b'1')
+    now[0] += 59
+    cache.put('b', b'2')
+    assert cache.get('a') == b'1'
+    now[0] += 1
+    assert cache.get('a') is None
+    assert cache.get('b') == b'2'
+    assert cache.stats()['entries'] == 1
+
+
+def test_cache_can_be_disabled(service):
+    service.cache = LookupCache(max_entries=0)
+    assert service.encoded('192.0.2.5') == service.encoded('192.0.2.5')
+    assert service.cache.stats() == {'entries': 0, 'hits': 0, 'misses': 2}
+
+
+def test_encoded_answers_come_from_the_cache(service):
+    first = service.encoded('192.0.2.200')
+    assert service.encoded('192.0.2.200') is first
+    assert service.cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1}
+    service.reload()
+    assert service.cache.stats()['entries'] == 0
+
+
+@pytest.mark.parametrize('trust_proxy, path, headers, city', [
+    (False, '/198.51.100.7', {}, 'Tokyo'),
+    (False, '/api/geo/2001:db8::5', {}, 'Buenos Aires'),
+    (True, '/json', {'X-Forwarded-For': '8.8.8.8, 192.0.2.130'}, 'London'),
+    (True, '/', {'X-Real-IP': '203.0.113.4'}, 'Sydney'),
+    (False, '/', {'X-Real-IP': '203.0.113.4'}, None),
+])
+def test_http_answers(service, trust_proxy, path, headers, city):
+    server = GeoHTTPServer(('127.0.0.1', 0), service, trust_proxy=trust_proxy)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        answer = json.loads(response.read())
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert response.status == 200
+    assert response.getheader('Cache-Control') == f"private, max-age={service.cache.ttl}"
+    if city is None:
+        # Without --trust-proxy the headers are ignored and the loopback peer is reserved
+        assert answer == {'ip': '127.0.0.1', 'success': False, 'type': 'IPv4', 'message': 'Reserved range'}
+    else:
+        assert answer['city'] == city
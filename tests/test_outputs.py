@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import pytest
+from PIL import Image, ImageDraw
+
+from black_mode import BlackModeGenerator
+from conftest import SRC_DIR
+from frame_output import FrameEncoder
+from frame_store import FrameStore
+from outputs import AssetPyramid, MultiOutputRenderer, OutputFrameStores, parse_outputs
+from render_daemon import RenderDaemon
+
+SIZE = (96, 80)
+
+
+@pytest.fixture
+def generator(tmp_path):
+    globe_path = str(tmp_path / 'globe.png')
+    overlay_path = str(tmp_path / 'overlay.png')
+    globe = Image.new('RGBA', SIZE)
+    ImageDraw.Draw(globe).ellipse((18, 10, 78, 70), fill=(40, 90, 200, 255))
+    ImageDraw.Draw(globe).rectangle((44, 12, 52, 40), fill=(220, 220, 40, 255))
+    globe.save(globe_path)
+    Image.new('RGBA', SIZE, (0, 160, 0, 255)).save(overlay_path)
+    return BlackModeGenerator(globe_path, overlay_path, str(tmp_path / 'frames'), save_debug=False,
+                              output=FrameEncoder('ppm'))
+
+
+@pytest.fixture
+def renderer(generator, tmp_path):
+    return MultiOutputRenderer(generator, parse_outputs('small=48x40,wide=120x60:fill'),
+                               AssetPyramid(str(tmp_path / 'pyramid')))
+
+
+def test_renderer_delegates_rotation(generator, renderer):
+    instant = datetime(2026, 6, 21, 6, 30, tzinfo=timezone.utc)
+    assert renderer.calculate_rotation(instant) == generator.calculate_rotation(instant)
+    assert renderer.rotation_engine.radius > 0
+
+
+def test_smooth_step_renders_every_output(renderer, tmp_path):
+    directory = str(tmp_path / 'frames')
+    stores = OutputFrameStores(FrameStore(directory, renderer.output), renderer.targets)
+    daemon = RenderDaemon(renderer, directory, frame_store=stores, smooth=True)
+    first = datetime(2026, 6, 21, 6, 30, tzinfo=timezone.utc)
+
+    daemon.smooth_step_once(first)
+    assert daemon._published_angle == renderer.calculate_rotation(first)
+    assert [Image.open(path).size for path in daemon.current_path] == [(48, 40), (120, 60)]
+    assert all(os.path.dirname(path).endswith(name) for path, name in zip(daemon.current_path, ['small', 'wide']))
+
+    # A second later the edge of a 30-pixel globe has barely moved, so the step is skipped
+    daemon.smooth_step_once(first.replace(second=1))
+    assert daemon._skipped_small == 1
+
+
+def test_cache_dir_is_rejected_with_outputs(tmp_path):
+    result = subprocess.run(
+        [sys.executable, os.path.join(SRC_DIR, 'black_mode.py'), '--base-globe', 'globe.png', '--overlay', 'overlay.png',
+         '--temp-dir', str(tmp_path), '--outputs', '320x200', '--cache-dir', str(tmp_path / 'cache')],
+        capture_output=True, text=True)
+    assert result.returncode == 2
+    assert '--outputs cannot use --cache-dir' in result.stderr
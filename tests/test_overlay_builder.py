@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import overlay_builder
+from overlay_builder import build_overlay_and_masks, kth_smallest, median_uint8
+
+
+@pytest.mark.parametrize('n', [1, 4, 7, 96])
+def test_median_matches_numpy(n):
+    stack = np.random.default_rng(n).integers(0, 256, (n, 500), dtype=np.uint8)
+    assert np.array_equal(median_uint8(stack), np.median(stack, axis=0).astype(np.uint8))
+
+
+def test_kth_smallest_matches_sort():
+    stack = np.random.default_rng(0).integers(0, 256, (9, 300), dtype=np.uint8)
+    for k in (0, 4, 8):
+        assert np.array_equal(kth_smallest(stack, k), np.sort(stack, axis=0)[k])
+
+
+def write_frames(directory, count=5, size=(24, 16)):
+    """Frames sharing a background, each with a bright square at a different place."""
+    background = np.random.default_rng(1).integers(0, 100, (size[1], size[0], 4), dtype=np.uint8)
+    background[..., 3] = 255
+    paths = []
+    for i in range(count):
+        pixels = background.copy()
+        pixels[2:6, 3 * i:3 * i + 4, :3] = 250
+        path = os.path.join(directory, f"{i:02d}.png")
+        Image.fromarray(pixels, 'RGBA').save(path)
+        paths.append(path)
+    return background, paths
+
+
+def test_overlay_and_masks_in_small_tiles(tmp_path):
+    background, paths = write_frames(str(tmp_path))
+    mask_paths = [str(tmp_path / 'masks' / os.path.basename(path)) for path in paths]
+    overlay = build_overlay_and_masks(paths, mask_paths, tile_mb=0, scratch_dir=str(tmp_path / 'scratch'))
+    assert np.array_equal(np.asarray(overlay), background)
+    for i, mask_path in enumerate(mask_paths):
+        mask = np.asarray(Image.open(mask_path))
+        assert set(zip(*np.nonzero(mask))) == {(y, x) for y in range(2, 6) for x in range(3 * i, 3 * i + 4)}
+    assert os.listdir(tmp_path / 'scratch') == []
+
+
+def test_memory_backed_scratch_dir_warns(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(overlay_builder, 'filesystem_type', lambda path: 'tmpfs')
+    assert overlay_builder.scratch_directory(str(tmp_path)) == str(tmp_path)
+    assert 'tmpfs' in caplog.text
+
+
+def test_default_scratch_dir_is_not_the_temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(overlay_builder, 'DEFAULT_SCRATCH_DIR', str(tmp_path / 'cache'))
+    assert overlay_builder.scratch_directory() == str(tmp_path / 'cache')
+    assert os.path.isdir(tmp_path / 'cache')
@@ -0,0 +1,49 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from conftest import SRC_DIR
+from places import snap_place
+from projection import GlobeGeometry, InverseProjection
+
+# The script's name has a hyphen, so it is loaded from its path
+spec = importlib.util.spec_from_file_location('pick_location_script', os.path.join(SRC_DIR, 'scripts', 'pick-location.py'))
+pick_location = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(pick_location)
+
+SIZE = 201
+CENTER = SIZE // 2
+RADIUS = 90
+
+
+def marker_centroid(image):
+    ys, xs = np.nonzero(np.asarray(image.getchannel('R')) > 127)
+    return xs.mean(), ys.mean()
+
+
+@pytest.mark.parametrize('lat, lon', [(-30.0, 0.0), (10.0, -72.6), (45.0, 139.7)])
+def test_keyframe_lon0_matches_rotated_base_globe(lat, lon):
+    # Mark a place on a base globe, turn it as the generator does at 00:00 UTC and find the mark
+    base = GlobeGeometry(CENTER, CENTER, RADIUS)
+    x, y = (float(v) for v in base.project(lat, lon))
+    image = Image.new('RGBA', (SIZE, SIZE))
+    ImageDraw.Draw(image).ellipse((x - 3, y - 3, x + 3, y + 3), fill=(255, 0, 0, 255))
+    keyframe = image.rotate(pick_location.KEYFRAME_ROTATION, resample=Image.BICUBIC, center=(CENTER, CENTER))
+    found_x, found_y = marker_centroid(keyframe)
+
+    expected_x, expected_y = GlobeGeometry(CENTER, CENTER, RADIUS, pick_location.KEYFRAME_LON0).project(lat, lon)
+    assert found_x == pytest.approx(float(expected_x), abs=1.5)
+    assert found_y == pytest.approx(float(expected_y), abs=1.5)
+
+
+def test_place_snaps_to_keyframe_pixel(tmp_path):
+    inverse = InverseProjection(GlobeGeometry(CENTER, CENTER, RADIUS, pick_location.KEYFRAME_LON0), (SIZE, SIZE), str(tmp_path))
+    label, lat, lon, x, y, pixel_lat, pixel_lon = snap_place(inverse, '10, -72.6')
+    expected_x, expected_y = GlobeGeometry(CENTER, CENTER, RADIUS).project(lat, lon)
+    # The snapped pixel is not where the unrotated base globe has the place
+    assert np.hypot(x - float(expected_x), y - float(expected_y)) > 10
+    assert pixel_lat == pytest.approx(lat, abs=2)
+    assert pixel_lon == pytest.approx(lon, abs=2)
@@ -0,0 +1,83 @@
+import os
+import signal
+import threading
+
+import pytest
+
+from render_daemon import RenderDaemon, send_control_command
+
+
+@pytest.fixture
+def daemon(tmp_path, fake_generator):
+    daemon = RenderDaemon(fake_generator, str(tmp_path), socket_path=str(tmp_path / 'control.sock'))
+    daemon._start_control_server()
+    yield daemon
+    daemon._stop_control_server()
+
+
+def test_status_over_socket(daemon):
+    response = send_control_command(daemon.socket_path, 'status', timeout=5)
+    assert response['ok']
+    assert response['status']['frames_rendered'] == 0
+    assert response['status']['pid'] == os.getpid()
+
+
+def test_render_publishes_a_frame(daemon, fake_generator):
+    response = send_control_command(daemon.socket_path, 'render', timeout=5)
+    assert response['ok']
+    assert response['status']['frames_rendered'] == 1
+    assert len(fake_generator.rendered) == 1
+    assert os.path.exists(daemon.current_path)
+
+
+def test_unknown_command_is_rejected(daemon):
+    response = send_control_command(daemon.socket_path, 'reboot', timeout=5)
+    assert not response['ok']
+    assert 'unknown command' in response['error']
+
+
+def test_socket_is_private(daemon):
+    assert os.stat(daemon.socket_path).st_mode & 0o777 == 0o600
+
+
+def test_second_daemon_refuses_a_live_socket(daemon, tmp_path, fake_generator):
+    other = RenderDaemon(fake_generator, str(tmp_path), socket_path=daemon.socket_path)
+    with pytest.raises(RuntimeError, match='already listening'):
+        other._start_control_server()
+
+
+def test_stale_socket_is_replaced(tmp_path, fake_generator):
+    socket_path = str(tmp_path / 'control.sock')
+    open(socket_path, 'w').close()
+    daemon = RenderDaemon(fake_generator, str(tmp_path), socket_path=socket_path)
+    daemon._start_control_server()
+    try:
+        assert send_control_command(socket_path, 'status', timeout=5)['ok']
+    finally:
+        daemon._stop_control_server()
+    assert not os.path.exists(socket_path)
+
+
+def test_run_renders_then_shuts_down_on_command(tmp_path, fake_generator):
+    socket_path = str(tmp_path / 'control.sock')
+    daemon = RenderDaemon(fake_generator, str(tmp_path), socket_path=socket_path)
+    responses = []
+
+    def control():
+        # Wait for the first render, then stop the daemon through its socket
+        while daemon._frames_rendered == 0:
+            threading.Event().wait(0.01)
+        responses.append(send_control_command(socket_path, 'shutdown', timeout=5))
+
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+    thread = threading.Thread(target=control)
+    thread.start()
+    try:
+        daemon.run()  # signal handlers can only be installed from the main thread
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+    thread.join(5)
+    assert responses == [{'ok': True}]
+    assert daemon._frames_rendered == 1
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from rotation import PilRotationEngine, PolarRotationEngine, create_rotation_engine
+
+SIZE = (161, 151)
+CENTER = (SIZE[0] // 2, SIZE[1] // 2)
+
+
+@pytest.fixture(scope='module')
+def globe_only():
+    """A hard-edged disk with stripes: every edge pixel blends opaque taps with transparent ones."""
+    image = Image.new('RGBA', SIZE)
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((CENTER[0] - 60, CENTER[1] - 60, CENTER[0] + 60, CENTER[1] + 60), fill=(20, 60, 200, 255))
+    for x in range(CENTER[0] - 60, CENTER[0] + 60, 24):
+        draw.rectangle((x, 0, x + 11, SIZE[1]), fill=(255, 255, 255, 255))
+    mask = Image.new('L', SIZE)
+    ImageDraw.Draw(mask).ellipse((CENTER[0] - 60, CENTER[1] - 60, CENTER[0] + 60, CENTER[1] + 60), fill=255)
+    globe = Image.new('RGBA', SIZE)
+    globe.paste(image, (0, 0), mask)
+    return globe
+
+
+@pytest.fixture(scope='module')
+def engines(globe_only):
+    return PilRotationEngine(globe_only, CENTER), PolarRotationEngine(globe_only, CENTER)
+
+
+def premultiplied(pixels):
+    pixels = pixels.astype(np.float64)
+    return np.concatenate([pixels[..., :3] * pixels[..., 3:] / 255, pixels[..., 3:]], axis=-1)
+
+
+def test_gather_weights_are_a_partition_of_256(engines):
+    weights = engines[1].gather_weight[..., 0].astype(np.int64)
+    assert weights.min() >= 0
+    assert weights.max() <= 256
+    assert (weights.sum(axis=0) == 256).all()
+
+
+def test_polar_blend_does_not_wrap(globe_only):
+    # The uint16 blend must equal the same fixed-point sum in int64: a weight wrapped below
+    # zero only comes out right modulo 65536 (taps 0, 0, 0, 255 then give 255 instead of 0)
+    polar = PolarRotationEngine(globe_only, CENTER)
+    polar.polar[...] = np.random.default_rng(4).integers(0, 256, polar.polar.shape, dtype=np.uint8)
+    output = polar.rotate_array(0.0).reshape(-1, 4)[polar.disk_index]
+    taps = polar.polar.reshape(-1, 4)[polar.gather_index].astype(np.int64)
+    expected = ((taps * polar.gather_weight.astype(np.int64)).sum(axis=0) + 128) >> 8
+    assert (output == expected).all()
+    assert (taps.min(axis=0) <= expected).all() and (expected <= taps.max(axis=0)).all()
+
+
+@pytest.mark.parametrize('angle', [0.0, 17.25, 90.0, -195.0, 311.5])
+def test_polar_matches_pil(engines, angle):
+    pil, polar = engines
+    assert polar.box == pil.box
+    difference = np.abs(premultiplied(polar.rotate_array(angle)) - premultiplied(pil.rotate_array(angle)))
+    # Polar resamples twice and snaps to 0.05 degrees, so sharp edges differ by some levels,
+    # but no pixel may be off by most of the range as a wrapped weight would make it
+    assert difference.mean() < 2.0
+    assert difference.max() < 128
+
+
+def test_polar_output_is_transparent_outside_the_disk(engines):
+    polar = engines[1]
+    alpha = polar.rotate_array(33.0)[..., 3]
+    left, top = polar.box[:2]
+    ys, xs = np.nonzero(alpha)
+    assert np.hypot(xs + left + 0.5 - CENTER[0], ys + top + 0.5 - CENTER[1]).max() < polar.radius
+
+
+def test_unknown_engine(globe_only):
+    with pytest.raises(ValueError, match='Unknown rotation engine'):
+        create_rotation_engine('nearest', globe_only, CENTER)
@@ -0,0 +1,134 @@
+import io
+import struct
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from timelapse import (PNG_SIGNATURE, ApngWriter, RawWriter, WebpWriter, _chunks, _riff_chunks, export_timelapse,
+                       flatten, frame_count, frame_instants)
+
+SIZE = (40, 30)
+# An odd left edge, so WebP has to round the box outward to even offsets
+BOX = (5, 7, 29, 23)
+START = datetime(2026, 6, 21, tzinfo=timezone.utc)
+STEP = timedelta(minutes=5)
+
+
+class BoxRenderer:
+    """Frames that only change inside BOX, like the generator's, with partly transparent pixels."""
+
+    def __init__(self):
+        self.background = np.zeros(SIZE[::-1] + (4,), dtype=np.uint8)
+        self.background[...] = (10, 20, 30, 255)
+
+    def frame(self, instant):
+        index = int((instant - START) / STEP)
+        pixels = self.background.copy()
+        ys, xs = np.mgrid[BOX[1]:BOX[3], BOX[0]:BOX[2]]
+        pixels[BOX[1]:BOX[3], BOX[0]:BOX[2]] = np.stack(
+            [(xs * 9 + index * 40) % 256, (ys * 13) % 256, np.full_like(xs, index * 60 % 256),
+             128 + (xs + ys + index) % 128], axis=-1)
+        return pixels
+
+    def render_at(self, instant):
+        return Image.fromarray(self.frame(instant), 'RGBA')
+
+
+def export(writer_class, count=4, workers=2, **options):
+    renderer = BoxRenderer()
+    instants = list(frame_instants(START, START + count * STEP, STEP))
+    fp = io.BytesIO()
+    writer = writer_class(fp, SIZE, len(instants), 24.0, box=BOX, **options)
+    written = export_timelapse(renderer, iter(instants), writer, workers=workers, prefetch=2)
+    assert written == len(instants)
+    return fp.getvalue(), [renderer.frame(instant) for instant in instants]
+
+
+def decoded_frames(data, mode='RGBA'):
+    frames = []
+    with Image.open(io.BytesIO(data)) as image:
+        for index in range(image.n_frames):
+            image.seek(index)
+            frames.append(np.asarray(image.convert(mode)))
+    return frames
+
+
+def test_frame_instants():
+    end = START + timedelta(hours=1, minutes=2)
+    instants = list(frame_instants(START, end, STEP))
+    assert len(instants) == frame_count(START, end, STEP) == 13
+    assert instants[0] == START and instants[-1] == START + 12 * STEP
+    assert frame_count(end, START, STEP) == 0
+    with pytest.raises(ValueError):
+        next(frame_instants(START, end, timedelta(0)))
+
+
+@pytest.mark.parametrize('rgb', [False, True])
+def test_apng_round_trips(rgb):
+    data, expected = export(ApngWriter, rgb=rgb, compress_level=1)
+    assert data.startswith(PNG_SIGNATURE)
+    chunks = list(_chunks(data, len(PNG_SIGNATURE)))
+    kinds = [kind for kind, _ in chunks]
+    assert kinds[:2] == [b'IHDR', b'acTL'] and kinds[-1] == b'IEND'
+    assert struct.unpack('>II', chunks[1][1]) == (4, 0)
+    assert struct.unpack('>IIBBBBB', chunks[0][1])[2:4] == (8, 2 if rgb else 6)
+
+    # fcTL and fdAT share one sequence, counting up from 0 in file order
+    sequence = [struct.unpack('>I', payload[:4])[0] for kind, payload in chunks if kind in (b'fcTL', b'fdAT')]
+    assert sequence == list(range(len(sequence))) == list(range(7))
+    controls = [struct.unpack('>IIIIIHHBB', payload) for kind, payload in chunks if kind == b'fcTL']
+    assert [control[1:5] for control in controls] == [SIZE + (0, 0)] + [
+        (BOX[2] - BOX[0], BOX[3] - BOX[1], BOX[0], BOX[1])] * 3
+    assert {control[5:] for control in controls} == {(1, 24, 0, 0)}
+
+    mode = 'RGB' if rgb else 'RGBA'
+    decoded = decoded_frames(data, mode)
+    assert len(decoded) == 4
+    for frame, pixels in zip(decoded, expected):
+        want = np.asarray(flatten(pixels)) if rgb else pixels
+        assert np.array_equal(frame, want)
+
+
+def test_apng_frame_count_must_match():
+    writer = ApngWriter(io.BytesIO(), SIZE, 2, 24.0)
+    writer.write(writer.encode(0, BoxRenderer().frame(START)))
+    with pytest.raises(ValueError, match='declared 2 frames but 1'):
+        writer.close()
+
+
+def test_webp_round_trips():
+    data, expected = export(WebpWriter, lossless=True)
+    assert data[:4] == b'RIFF' and data[8:12] == b'WEBP'
+    # The RIFF size is patched in on close
+    assert struct.unpack('<I', data[4:8])[0] == len(data) - 8
+    chunks = list(_riff_chunks(data, 12))
+    assert [kind for kind, _ in chunks] == [b'VP8X', b'ANIM'] + [b'ANMF'] * 4
+    assert struct.unpack('<I', chunks[0][1][:4])[0] == 0x12
+
+    frames = []
+    for _, payload in chunks[2:]:
+        x, y, width, height = (int.from_bytes(payload[i:i + 3], 'little') for i in range(0, 12, 3))
+        frames.append((2 * x, 2 * y, width + 1, height + 1, payload[15]))
+    even_box = (BOX[0] & ~1, BOX[1] & ~1, BOX[2] - (BOX[0] & ~1), BOX[3] - (BOX[1] & ~1))
+    assert frames == [(0, 0) + SIZE + (0x02,)] + [even_box + (0x02,)] * 3
+
+    decoded = decoded_frames(data)
+    assert len(decoded) == 4
+    for frame, pixels in zip(decoded, expected):
+        assert np.array_equal(frame, pixels)
+
+
+def test_webp_needs_a_seekable_output():
+    class Pipe(io.BytesIO):
+        def seekable(self):
+            return False
+
+    with pytest.raises(ValueError, match='seekable'):
+        WebpWriter(Pipe(), SIZE, 1, 24.0)
+
+
+def test_raw_frames_are_whole_rgb():
+    data, expected = export(RawWriter, workers=3)
+    assert data == b''.join(flatten(pixels).tobytes() for pixels in expected)
@@ -0,0 +1,106 @@
+import os
+import ctypes
+import ctypes.util
+import shutil
+import subprocess
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import x11_wallpaper
+from x11_wallpaper import X11RootWallpaper, fit_rect, scaled_patch
+
+SCREEN = (64, 48)
+
+
+def random_frame(size, seed):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (size[1], size[0], 4), dtype=np.uint8), 'RGBA')
+
+
+def flattened(frame):
+    flat = Image.new('RGB', frame.size)
+    flat.paste(frame, (0, 0), frame)
+    return np.asarray(flat)
+
+
+def test_fit_rect_centers_like_feh_bg_max():
+    assert fit_rect((1980, 1977), (1920, 1080)) == (419, 0, 1081, 1080)
+    assert fit_rect((100, 50), (200, 200)) == (0, 50, 200, 100)
+
+
+def test_scaled_patch_matches_a_full_resize():
+    frame = random_frame((200, 150), 1)
+    placement = fit_rect(frame.size, (120, 90))
+    full = Image.new('RGB', frame.size)
+    full.paste(frame, (0, 0), frame)
+    full = np.asarray(full.resize(placement[2:], Image.BILINEAR)).astype(int)
+    x, y, patch = scaled_patch(frame, (50, 40, 130, 110), placement)
+    region = full[y:y + patch.shape[0], x:x + patch.shape[1]]
+    assert np.abs(region - patch.astype(int)).max() <= 1
+
+
+def test_missing_display_is_reported():
+    if ctypes.util.find_library('X11') is None:
+        pytest.skip('libX11 is not installed')
+    with pytest.raises(RuntimeError, match='Cannot open X display'):
+        X11RootWallpaper(':4242')
+
+
+@pytest.fixture
+def xvfb():
+    """A private Xvfb server, e.g. ':97'; skips when Xvfb is not installed."""
+    if shutil.which('Xvfb') is None:
+        pytest.skip('Xvfb is not installed')
+    number = next(n for n in range(97, 200) if not os.path.exists(f"/tmp/.X11-unix/X{n}")
+                  and not os.path.exists(f"/tmp/.X{n}-lock"))
+    server = subprocess.Popen(['Xvfb', f":{number}", '-screen', '0', f"{SCREEN[0]}x{SCREEN[1]}x24", '-nolisten', 'tcp'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while not os.path.exists(f"/tmp/.X11-unix/X{number}"):
+        if server.poll() is not None or time.monotonic() > deadline:
+            server.kill()
+            pytest.skip('Xvfb did not start')
+        time.sleep(0.05)
+    yield f":{number}"
+    server.terminate()
+    server.wait(5)
+
+
+def read_pixmap(wallpaper):
+    """The root pixmap's pixels as an RGB array, read back with XGetImage."""
+    xlib = x11_wallpaper._xlib
+    xlib.XGetImage.restype = ctypes.POINTER(x11_wallpaper._XImage)
+    xlib.XGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int, ctypes.c_uint,
+                               ctypes.c_uint, ctypes.c_ulong, ctypes.c_int]
+    image = xlib.XGetImage(wallpaper.display, wallpaper.pixmap, 0, 0, SCREEN[0], SCREEN[1],
+                           0xFFFFFFFF, x11_wallpaper._ZPIXMAP)
+    contents = image.contents
+    raw = ctypes.string_at(contents.data, contents.bytes_per_line * SCREEN[1])
+    pixels = np.frombuffer(raw, np.uint8).reshape(SCREEN[1], -1)[:, :SCREEN[0] * 4].reshape(SCREEN[1], SCREEN[0], 4)
+    xlib.XFree(contents.data)
+    xlib.XFree(image)
+    return pixels[..., list(wallpaper._channel_offsets)]
+
+
+@pytest.mark.parametrize('use_shm', [True, False])
+def test_frames_reach_the_root_pixmap(xvfb, use_shm):
+    wallpaper = X11RootWallpaper(xvfb, use_shm=use_shm)
+    try:
+        first = random_frame(SCREEN, 2)
+        wallpaper.show(first)
+        assert np.array_equal(read_pixmap(wallpaper), flattened(first))
+        atom = x11_wallpaper._xlib.XInternAtom(wallpaper.display, b'_XROOTPMAP_ID', 0)
+        assert wallpaper._get_pixmap_property(atom) == wallpaper.pixmap
+
+        # Only the changed rectangle is uploaded; the rest of the pixmap keeps the first frame
+        second = random_frame(SCREEN, 3)
+        rect = (8, 8, 40, 32)
+        wallpaper.show(second, rect)
+        expected = flattened(first).copy()
+        expected[8:32, 8:40] = flattened(second)[8:32, 8:40]
+        assert np.array_equal(read_pixmap(wallpaper), expected)
+    finally:
+        wallpaper.close()
@@ -12,25 +12,15 @@ LOG_FILE="$FRAME_DIR/update_background.log"
 # Log the start of the update
 echo "$(date): Starting background update" >> "$LOG_FILE"
 
-# Create timestamped filename
-TIMESTAMP=$(date +%Y%m%d_%H%M%S)
-NEW_FRAME="$FRAME_DIR/frame_${TIMESTAMP}.png"
-
 # Generate new frame
 echo "Generating new frame..." >> "$LOG_FILE"
-"$SCRIPT_DIR/venv/bin/python3" "$SCRIPT_DIR/src/black_mode.py" --base-globe "$SCRIPT_DIR/src/images/base_globe_with_dot.png" --overlay "$SCRIPT_DIR/src/images/stationary_overlay.png" --temp-dir "$FRAME_DIR" --update-interval 5 >> "$LOG_FILE" 2>&1
-
-# Log the current frame
-echo "Current frame exists: $(test -f "$FRAME_DIR/current_frame.png" && echo 'yes' || echo 'no')" >> "$LOG_FILE"
-echo "Current frame size: $(ls -l "$FRAME_DIR/current_frame.png" 2>/dev/null || echo 'not found')" >> "$LOG_FILE"
-
-# Copy the current frame to a new timestamped file
-cp "$FRAME_DIR/current_frame.png" "$NEW_FRAME"
-echo "Created new frame: $NEW_FRAME" >> "$LOG_FILE"
-
-# Update the symlink
-ln -sf "$NEW_FRAME" "$FRAME_DIR/current_frame.png"
-echo "Updated symlink" >> "$LOG_FILE"
+"$SCRIPT_DIR/venv/bin/python3" "$SCRIPT_DIR/src/black_mode.py" --base-globe "$SCRIPT_DIR/src/images/base_globe_with_dot.png" --overlay "$SCRIPT_DIR/src/images/stationary_overlay.png" --temp-dir "$FRAME_DIR" --update-interval 5 --cache-dir "${XDG_CACHE_HOME:-$HOME/.cache}/randall-clock/frames" --output-format png-fast --rgb --no-debug-frames >> "$LOG_FILE" 2>&1
+status=$?
+if [ "$status" -eq 75 ]; then
+    # Another render (or the daemon) holds the frame store lock; leave the background alone
+    echo "$(date): Render already in progress, skipping" >> "$LOG_FILE"
+    exit 0
+fi
 
 # Update the background using feh. After GPU/driver changes, X may be :1 instead of :0.
 pick_display() {
@@ -67,7 +57,7 @@ pick_xauthority() {
     return 1
 }
 pick_xauthority || true
-feh --image-bg black --bg-max "$NEW_FRAME"
+feh --image-bg black --bg-max "$FRAME_DIR/current_frame.png"
 echo "Updated background using feh" >> "$LOG_FILE"
 
 echo "$(date): Background update complete" >> "$LOG_FILE"
@@ -7,6 +7,14 @@
 
   var ROTATION_OFFSET_DEG = 195;
   var VERTICAL_OFFSET = 10;
+  // Redraw once the disk edge has moved this many pixels (it moves about 0.036 px/s at radius 491)
+  var MIN_DISPLACEMENT_PX = 0.5;
+  // Distinct dot brightnesses per pulse; each change of level is one redraw
+  var PULSE_LEVELS = 8;
+  // Longest wait between checks
+  var MAX_IDLE_MS = 60000;
+  // Layout of assets/build/manifest.json written by src/scripts/build-web-assets.py
+  var BUILD_MANIFEST_VERSION = 1;
   var DOT_LAYERS = [
     { radius: 20, alpha: 40 },
     { radius: 15, alpha: 80 },
@@ -51,6 +59,63 @@
     return (Math.sin(2 * Math.PI * t) + 1) / 2;
   }
 
+  /** Pulse brightness snapped to one of `levels` steps (a steady 1 when levels < 2). */
+  function quantizePulse(phase, levels) {
+    if (levels < 2) {
+      return 1;
+    }
+    return Math.round(phase * (levels - 1)) / (levels - 1);
+  }
+
+  /**
+   * Milliseconds from date until quantizePulse(dotPulsePhase(...), levels) next changes.
+   *
+   * The level changes where the phase crosses a midpoint between two levels, which
+   * happens twice per second for each midpoint, at t and 0.5 - t for sin(2πt) = 2m - 1.
+   */
+  function nextPulseChangeMs(date, levels) {
+    var t = date.getUTCMilliseconds() / 1000;
+    var soonest = 1;
+    for (var k = 0; k < levels - 1; k++) {
+      var crossing = Math.asin(2 * (k + 0.5) / (levels - 1) - 1) / (2 * Math.PI);
+      var candidates = [crossing, 0.5 - crossing];
+      for (var i = 0; i < candidates.length; i++) {
+        var delta = ((candidates[i] - t) % 1 + 1) % 1;
+        if (delta < soonest) {
+          soonest = delta;
+        }
+      }
+    }
+    return Math.max(Math.ceil(soonest * 1000), 1);
+  }
+
+  /** Smallest angle between two rotations in degrees, across the midnight wrap. */
+  function rotationDelta(a, b) {
+    return Math.abs(((a - b) % 360 + 540) % 360 - 180);
+  }
+
+  /** First of the manifest's formats whose 1x1 probe this browser decodes (PNG always works). */
+  function pickFormat(manifest) {
+    var formats = manifest.formats.slice();
+    function next() {
+      var format = formats.shift();
+      if (!format || format === 'png' || !manifest.probes[format]) {
+        return Promise.resolve(format || 'png');
+      }
+      return loadImage(manifest.probes[format]).then(function () {
+        return format;
+      }, next);
+    }
+    return next();
+  }
+
+  function createCanvas(width, height) {
+    var canvas = document.createElement('canvas');
+    canvas.width = width;
+    canvas.height = height;
+    return canvas;
+  }
+
   /**
    * Build inverted globe alpha mask matching black_mode.py overlay_mask.
    * Overlay is drawn only where the base globe image is transparent.
@@ -58,9 +123,7 @@
   function createOverlayMaskCanvas(globeImage) {
     var width = globeImage.naturalWidth || globeImage.width;
     var height = globeImage.naturalHeight || globeImage.height;
-    var maskCanvas = document.createElement('canvas');
-    maskCanvas.width = width;
-    maskCanvas.height = height;
+    var maskCanvas = createCanvas(width, height);
     var maskCtx = maskCanvas.getContext('2d');
 
     maskCtx.drawImage(globeImage, 0, 0);
@@ -78,20 +141,28 @@
     return maskCanvas;
   }
 
-  function drawOverlayWithMask(ctx, overlayImage, maskCanvas) {
-    var width = ctx.canvas.width;
-    var height = ctx.canvas.height;
-    var tempCanvas = document.createElement('canvas');
-    tempCanvas.width = width;
-    tempCanvas.height = height;
-    var tempCtx = tempCanvas.getContext('2d');
-
-    tempCtx.drawImage(overlayImage, 0, 0);
-    tempCtx.globalCompositeOperation = 'destination-in';
-    tempCtx.drawImage(maskCanvas, 0, 0);
-    ctx.drawImage(tempCanvas, 0, 0);
+  /** Overlay with the globe area cut out, built once instead of on every frame. */
+  function createMaskedOverlayCanvas(overlayImage, maskCanvas, width, height) {
+    var overlayCanvas = createCanvas(width, height);
+    var overlayCtx = overlayCanvas.getContext('2d');
+    overlayCtx.drawImage(overlayImage, 0, 0);
+    overlayCtx.globalCompositeOperation = 'destination-in';
+    overlayCtx.drawImage(maskCanvas, 0, 0);
+    return overlayCanvas;
   }
 
+  /**
+   * Canvas clock that only redraws when the picture would change.
+   *
+   * The masked overlay and the globe are drawn into canvases once; the dot is
+   * stamped onto the globe canvas only when its position or brightness changes.
+   * Each animation frame just compares the rotation and pulse level with the
+   * last drawn ones, and a frame is drawn only when the disk edge has moved
+   * `minDisplacement` pixels or the dot reached another of `pulseLevels`
+   * brightness steps. Between draws the loop sleeps until the next one is due
+   * (the next pulse level, or the edge crossing minDisplacement) instead of
+   * waking 60 times a second.
+   */
   function ClockRenderer(options) {
     this.canvas = options.canvas;
     this.ctx = this.canvas.getContext('2d');
@@ -99,29 +170,90 @@
     this.globeImage = null;
     this.overlayImage = null;
     this.overlayMaskCanvas = null;
+    this.maskedOverlayCanvas = null;
+    this.globeCanvas = null;
+    this.globeCtx = null;
     this.globeGeometry = null;
     this.location = null;
     this.animationId = null;
+    this.timeoutId = null;
+    this.tick = null;
     this.verticalOffset = options.verticalOffset != null ? options.verticalOffset : VERTICAL_OFFSET;
+    this.minDisplacement = options.minDisplacement != null ? options.minDisplacement : MIN_DISPLACEMENT_PX;
+    this.pulseLevels = options.pulseLevels != null ? options.pulseLevels : PULSE_LEVELS;
+    // What the canvas currently shows; null forces the next update to draw
+    this.drawnRotation = null;
+    this.drawnPulse = null;
+    this.stampedDot = null; // {x, y, pulse} of the dot on globeCanvas
+    this.framesDrawn = 0;
   }
 
+  /** Load the plain PNGs and mask and measure them in the browser (the fallback when there is no build). */
   ClockRenderer.prototype.loadAssets = function (globeSrc, overlaySrc) {
     var self = this;
     return Promise.all([
       loadImage(globeSrc),
       loadImage(overlaySrc)
     ]).then(function (images) {
-      self.globeImage = images[0];
       self.overlayImage = images[1];
-      self.overlayMaskCanvas = createOverlayMaskCanvas(self.globeImage);
-      self.globeGeometry = global.RandallProjection.globeGeometryFromImage(self.globeImage);
-      self.canvas.width = self.overlayImage.naturalWidth || self.overlayImage.width;
-      self.canvas.height = self.overlayImage.naturalHeight || self.overlayImage.height;
+      self.overlayMaskCanvas = createOverlayMaskCanvas(images[0]);
+      var width = self.overlayImage.naturalWidth || self.overlayImage.width;
+      var height = self.overlayImage.naturalHeight || self.overlayImage.height;
+      self.useAssets(
+        images[0],
+        createMaskedOverlayCanvas(self.overlayImage, self.overlayMaskCanvas, width, height),
+        global.RandallProjection.globeGeometryFromImage(images[0])
+      );
+    });
+  };
+
+  /**
+   * Load the output of src/scripts/build-web-assets.py: the globe and the already
+   * masked overlay in the best format this browser decodes, and the globe geometry
+   * from the manifest, so no pixel is read back in JavaScript.
+   */
+  ClockRenderer.prototype.loadBuiltAssets = function (manifestUrl) {
+    var self = this;
+    var base;
+    return fetch(manifestUrl, { cache: 'no-cache' }).then(function (response) {
+      if (!response.ok) {
+        throw new Error('Failed to load ' + manifestUrl);
+      }
+      base = new URL(manifestUrl, document.baseURI);
+      return response.json();
+    }).then(function (manifest) {
+      if (manifest.version !== BUILD_MANIFEST_VERSION) {
+        throw new Error('Unsupported asset manifest version ' + manifest.version);
+      }
+      return pickFormat(manifest).then(function (format) {
+        return Promise.all([
+          loadImage(new URL(manifest.images.globe[format].file, base).href),
+          loadImage(new URL(manifest.images.overlay[format].file, base).href)
+        ]);
+      }).then(function (images) {
+        self.overlayImage = images[1];
+        self.useAssets(images[0], images[1], manifest.geometry);
+      });
     });
   };
 
+  ClockRenderer.prototype.useAssets = function (globeImage, maskedOverlay, geometry) {
+    this.globeImage = globeImage;
+    this.maskedOverlayCanvas = maskedOverlay;
+    this.globeGeometry = geometry;
+    this.canvas.width = maskedOverlay.naturalWidth || maskedOverlay.width;
+    this.canvas.height = maskedOverlay.naturalHeight || maskedOverlay.height;
+    this.globeCanvas = createCanvas(geometry.width, geometry.height);
+    this.globeCtx = this.globeCanvas.getContext('2d');
+    this.globeCtx.drawImage(globeImage, 0, 0);
+    this.stampedDot = null;
+    this.invalidate();
+  };
+
   ClockRenderer.prototype.setLocation = function (location) {
     this.location = location;
+    this.invalidate();
+    this.wake();
     if (this.statusEl && location && location.label) {
       this.statusEl.textContent = location.label;
       this.statusEl.hidden = false;
@@ -135,16 +267,60 @@
     }
   };
 
+  /** Make the next update() draw, e.g. after the location changed. */
+  ClockRenderer.prototype.invalidate = function () {
+    this.drawnRotation = null;
+    this.drawnPulse = null;
+  };
+
+  ClockRenderer.prototype.dotPixel = function () {
+    var globe = this.globeGeometry;
+    var point = global.RandallProjection.latLonToGlobePixel(this.location.lat, this.location.lon, globe);
+    return global.RandallProjection.clampToGlobe(point.x, point.y, globe);
+  };
+
+  /** Bring the dot on the cached globe canvas up to date, repainting only the dot's square. */
+  ClockRenderer.prototype.stampDot = function (pulse) {
+    var dot = this.location ? this.dotPixel() : null;
+    var stamped = this.stampedDot;
+    if (dot && stamped && dot.x === stamped.x && dot.y === stamped.y && pulse === stamped.pulse) {
+      return;
+    }
+    if (!dot && !stamped) {
+      return;
+    }
+    var ctx = this.globeCtx;
+    var reach = DOT_LAYERS[0].radius + 2;
+    if (stamped) {
+      // The dot layers are translucent, so restore the globe under the old dot before stamping
+      var left = Math.floor(stamped.x - reach);
+      var top = Math.floor(stamped.y - reach);
+      var size = reach * 2 + 1;
+      ctx.clearRect(left, top, size, size);
+      ctx.drawImage(this.globeImage, left, top, size, size, left, top, size, size);
+    }
+    if (dot) {
+      drawRedDot(ctx, dot.x, dot.y, pulse);
+      this.stampedDot = { x: dot.x, y: dot.y, pulse: pulse };
+    } else {
+      this.stampedDot = null;
+    }
+  };
+
+  /** Draw the frame for a date unconditionally. */
   ClockRenderer.prototype.renderFrame = function (date) {
-    if (!this.globeImage || !this.overlayImage || !this.overlayMaskCanvas) {
+    if (!this.globeCanvas || !this.maskedOverlayCanvas) {
       return;
     }
+    date = date || new Date();
+    this.draw(calculateRotationDegrees(date), quantizePulse(dotPulsePhase(date), this.pulseLevels));
+  };
 
+  ClockRenderer.prototype.draw = function (rotationDeg, pulse) {
     var ctx = this.ctx;
     var globe = this.globeGeometry;
     var globeW = globe.width;
     var globeH = globe.height;
-    var rotationDeg = calculateRotationDegrees(date);
     // PIL rotate() uses negative angles for clockwise; canvas uses positive for clockwise.
     var rotationRad = -rotationDeg * Math.PI / 180;
     var pasteX = Math.round((this.canvas.width - globeW) / 2);
@@ -155,47 +331,82 @@
       pasteY = this.verticalOffset;
     }
 
-    ctx.clearRect(0, 0, this.canvas.width, this.canvas.height);
-
-    var globeCanvas = document.createElement('canvas');
-    globeCanvas.width = globeW;
-    globeCanvas.height = globeH;
-    var globeCtx = globeCanvas.getContext('2d');
-
-    globeCtx.drawImage(this.globeImage, 0, 0);
-
-    if (this.location) {
-      var point = global.RandallProjection.latLonToGlobePixel(
-        this.location.lat,
-        this.location.lon,
-        globe
-      );
-      var clamped = global.RandallProjection.clampToGlobe(point.x, point.y, globe);
-      drawRedDot(globeCtx, clamped.x, clamped.y, dotPulsePhase(date));
-    }
+    this.stampDot(pulse);
 
+    ctx.clearRect(0, 0, this.canvas.width, this.canvas.height);
     ctx.save();
     ctx.translate(pasteX + globeW / 2, pasteY + globeH / 2);
     ctx.rotate(rotationRad);
-    ctx.drawImage(globeCanvas, -globeW / 2, -globeH / 2);
+    ctx.drawImage(this.globeCanvas, -globeW / 2, -globeH / 2);
     ctx.restore();
+    ctx.drawImage(this.maskedOverlayCanvas, 0, 0);
 
-    drawOverlayWithMask(ctx, this.overlayImage, this.overlayMaskCanvas);
+    this.drawnRotation = rotationDeg;
+    this.drawnPulse = this.location ? pulse : null;
+    this.framesDrawn++;
   };
 
-  ClockRenderer.prototype.start = function () {
-    var self = this;
-    if (this.animationId) {
-      cancelAnimationFrame(this.animationId);
+  /** Edge pixels the disk has turned since the drawn frame. */
+  ClockRenderer.prototype.displacement = function (rotationDeg) {
+    if (this.drawnRotation === null) {
+      return Infinity;
     }
+    return rotationDelta(rotationDeg, this.drawnRotation) * Math.PI / 180 * this.globeGeometry.radius;
+  };
 
-    function tick(now) {
-      self.renderFrame(new Date());
-      self.animationId = requestAnimationFrame(tick);
+  /** Draw the frame for a date only if it differs visibly from the one shown; returns whether it drew. */
+  ClockRenderer.prototype.update = function (date) {
+    if (!this.globeCanvas || !this.maskedOverlayCanvas) {
+      return false;
+    }
+    date = date || new Date();
+    var rotationDeg = calculateRotationDegrees(date);
+    var pulse = this.location ? quantizePulse(dotPulsePhase(date), this.pulseLevels) : null;
+    if (this.displacement(rotationDeg) < this.minDisplacement && pulse === this.drawnPulse) {
+      return false;
     }
+    this.draw(rotationDeg, pulse === null ? 1 : pulse);
+    return true;
+  };
+
+  /** Milliseconds until the edge will have moved minDisplacement pixels, for the idle sleep. */
+  ClockRenderer.prototype.idleDelay = function () {
+    var pxPerSecond = (360 / 86400) * Math.PI / 180 * this.globeGeometry.radius;
+    var remaining = this.minDisplacement - this.displacement(calculateRotationDegrees(new Date()));
+    // The rotation only changes on whole UTC seconds
+    var delay = Math.max(remaining / pxPerSecond * 1000, 1000 - new Date().getUTCMilliseconds());
+    return Math.min(delay, MAX_IDLE_MS);
+  };
 
-    this.renderFrame(new Date());
-    this.animationId = requestAnimationFrame(tick);
+  ClockRenderer.prototype.start = function () {
+    var self = this;
+    this.stop();
+
+    this.tick = function () {
+      self.animationId = null;
+      self.update(new Date());
+      var delay = self.idleDelay();
+      if (self.location && self.pulseLevels >= 2) {
+        // A pulsing dot changes level 2 * (pulseLevels - 1) times a second; wake only for those
+        delay = Math.min(delay, nextPulseChangeMs(new Date(), self.pulseLevels));
+      }
+      self.timeoutId = setTimeout(function () {
+        self.timeoutId = null;
+        self.animationId = requestAnimationFrame(self.tick);
+      }, delay);
+    };
+
+    this.invalidate();
+    this.animationId = requestAnimationFrame(this.tick);
+  };
+
+  /** Cut an idle sleep short so a change (e.g. a new location) shows on the next frame. */
+  ClockRenderer.prototype.wake = function () {
+    if (this.tick && this.timeoutId) {
+      clearTimeout(this.timeoutId);
+      this.timeoutId = null;
+      this.animationId = requestAnimationFrame(this.tick);
+    }
   };
 
   ClockRenderer.prototype.stop = function () {
@@ -203,11 +414,17 @@
       cancelAnimationFrame(this.animationId);
       this.animationId = null;
     }
+    if (this.timeoutId) {
+      clearTimeout(this.timeoutId);
+      this.timeoutId = null;
+    }
+    this.tick = null;
   };
 
   global.RandallClock = {
     ClockRenderer: ClockRenderer,
     calculateRotationDegrees: calculateRotationDegrees,
-    createOverlayMaskCanvas: createOverlayMaskCanvas
+    createOverlayMaskCanvas: createOverlayMaskCanvas,
+    createMaskedOverlayCanvas: createMaskedOverlayCanvas
   };
 })(typeof window !== 'undefined' ? window : this);
@@ -47,7 +47,9 @@
     {
       url: 'api/geo',
       parse: parseIpWho,
-      sameOrigin: true
+      sameOrigin: true,
+      // src/geo_service.py answers in milliseconds; a proxied provider well within this
+      timeoutMs: 2500
     },
     {
       url: 'https://ipwho.is/',
@@ -133,7 +135,7 @@
         return Promise.reject(new Error('All IP geolocation providers failed'));
       }
       var endpoint = IP_ENDPOINTS[index];
-      return fetchJson(endpoint.url, 8000).then(function (data) {
+      return fetchJson(endpoint.url, endpoint.timeoutMs || 8000).then(function (data) {
         return normalizeLocation(endpoint.parse(data), 'ip');
       }).catch(function () {
         return attempt(index + 1);
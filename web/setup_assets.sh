@@ -43,9 +43,25 @@ if [[ "${OVERLAY_OK}" -eq 0 ]]; then
   echo "  Run the desktop Black Mode install first, or place stationary_overlay.png manually in web/assets/."
 fi
 
-if [[ "${GLOBE_OK}" -eq 1 && "${OVERLAY_OK}" -eq 1 ]]; then
-  echo "Assets ready in ${ASSETS_DIR}"
-  exit 0
+if [[ "${GLOBE_OK}" -eq 0 || "${OVERLAY_OK}" -eq 0 ]]; then
+  exit 1
 fi
 
-exit 1
+# Precompute the overlay mask and globe geometry and emit hashed AVIF/WebP/PNG variants.
+# Without them the page still works from the plain PNGs, but masks and measures in the browser.
+PYTHON="${REPO_ROOT}/venv/bin/python3"
+if [[ ! -x "${PYTHON}" ]]; then
+  PYTHON="python3"
+fi
+if "${PYTHON}" "${REPO_ROOT}/src/scripts/build-web-assets.py" \
+    --base-globe "${ASSETS_DIR}/base_globe.png" \
+    --overlay "${ASSETS_DIR}/stationary_overlay.png" \
+    --out-dir "${ASSETS_DIR}/build"; then
+  echo "Built web assets in ${ASSETS_DIR}/build"
+else
+  echo "Warning: could not build web assets (needs Python 3 with Pillow and NumPy)."
+  echo "  The page falls back to the plain PNGs in ${ASSETS_DIR}."
+fi
+
+echo "Assets ready in ${ASSETS_DIR}"
+exit 0